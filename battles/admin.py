@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pokemon, Scenario, Battle
+from .models import Pokemon, Scenario, Battle, PokemonRating
 
 @admin.register(Pokemon)
 class PokemonAdmin(admin.ModelAdmin):
@@ -16,3 +16,8 @@ class BattleAdmin(admin.ModelAdmin):
     list_display = ("id","pokemon_a","pokemon_b","scenario","status","winner","created_at")
     list_filter = ("status","scenario")
     search_fields = ("pokemon_a__name","pokemon_b__name")
+
+@admin.register(PokemonRating)
+class PokemonRatingAdmin(admin.ModelAdmin):
+    list_display = ("pokemon","rating","wins","losses","battles","last_played_at")
+    search_fields = ("pokemon__name",)
@@ -5,3 +5,8 @@ class BattlesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'battles'
     verbose_name = "Battles"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra los receivers)
+        from .profiling import connect_task_signals
+        connect_task_signals()
@@ -0,0 +1,45 @@
+# battles/bulk.py
+"""Ejecución masiva: un group de Celery por lote y progreso agregado en un hash de Redis."""
+import time
+
+from celery import group
+from django.conf import settings
+
+from .events import get_redis
+
+
+def _key(group_id: str) -> str:
+    return f"battles:bulk:{group_id}"
+
+
+def dispatch(battle_ids: list[int], mode: str | None = None, source: str = "manual") -> str:
+    """Encola todos los combates como un único group y devuelve su id."""
+    from .tasks import run_battle
+
+    now = time.time()
+    job = group(run_battle.s(battle_id, source=source, mode=mode, enqueued_at=now) for battle_id in battle_ids)
+    group_id = job.freeze().id
+    # el contador se crea antes de encolar para que ningún task termine sin hash
+    get_redis().pipeline(transaction=False) \
+        .hset(_key(group_id), mapping={"total": len(battle_ids), "finished": 0, "failed": 0, "skipped": 0}) \
+        .expire(_key(group_id), getattr(settings, "BATTLE_BULK_PROGRESS_TTL", 24 * 3600)) \
+        .execute()
+    job.apply_async()
+    return group_id
+
+
+def mark(group_id: str | None, field: str):
+    """Lo llama run_battle al terminar; fuera de un group no hace nada."""
+    if group_id:
+        get_redis().hincrby(_key(group_id), field, 1)
+
+
+def progress(group_id: str) -> dict | None:
+    raw = get_redis().hgetall(_key(group_id))
+    if not raw:
+        return None
+    data = {k.decode(): int(v) for k, v in raw.items()}
+    data["done"] = data["finished"] + data["failed"] + data["skipped"]
+    data["pending"] = max(0, data["total"] - data["done"])
+    data["complete"] = data["pending"] == 0
+    return data
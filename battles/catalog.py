@@ -0,0 +1,72 @@
+# battles/catalog.py
+"""
+Versión del catálogo (Pokémon + Escenarios) y caché de respuestas de sus listados.
+La versión sube en cada save/delete (battles.signals); las entradas viejas quedan
+huérfanas y caducan solas, así que no hace falta borrar claves.
+Todo vive en el alias de caché "catalog" (Redis), no en la caché por defecto.
+"""
+import hashlib
+import logging
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "catalog:version"
+CACHE_ALIAS = "catalog"
+
+
+def _cache():
+    # se resuelve en cada uso: override_settings(CACHES=...) cambia el backend en los tests
+    return caches[CACHE_ALIAS]
+
+
+def version() -> int:
+    cache = _cache()
+    value = cache.get(VERSION_KEY)
+    if value is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        value = cache.get(VERSION_KEY, 1)
+    return int(value)
+
+
+def bump():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # aún no existía: cualquier valor nuevo invalida lo anterior
+        cache.add(VERSION_KEY, 2, timeout=None)
+    except Exception as exc:
+        logger.warning("No se pudo subir la versión del catálogo: %s", exc)
+
+
+def cached_value(name: str, build):
+    """
+    Valor cacheado bajo (versión, name) o construido con `build()`.
+    Si la caché falla se sirve sin ella.
+    """
+    cache = _cache()
+    try:
+        key = f"catalog:{version()}:{name}"
+        data = cache.get(key)
+    except Exception as exc:
+        logger.warning("Caché del catálogo no disponible: %s", exc)
+        return build()
+    if data is None:
+        data = build()
+        try:
+            cache.set(key, data, timeout=getattr(settings, "CATALOG_CACHE_TTL", 3600))
+        except Exception as exc:
+            logger.warning("No se pudo guardar en la caché del catálogo: %s", exc)
+    return data
+
+
+def cached(scope: str, request, build):
+    """Respuesta de un listado cacheada por versión + host + query params."""
+    # el host entra en la clave porque next/previous son URLs absolutas
+    params = urlencode(sorted((k, v) for k, vs in request.query_params.lists() for v in vs))
+    digest = hashlib.sha1(f"{request.get_host()}?{params}".encode()).hexdigest()
+    return cached_value(f"{scope}:{digest}", build)
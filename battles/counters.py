@@ -0,0 +1,161 @@
+# battles/counters.py
+"""
+Índice de counters (PokemonCounter): para cada Pokémon X y escenario S, los
+COUNTERS_INDEX_K rivales que le ganan en menos turnos (desempate: más hp restante, id).
+Un rival cuenta como counter si gana con X como pokemon_a, es decir, aun cediendo
+el empate de velocidad.
+
+Se calcula con el mismo kernel vectorizado que el round-robin (battles.tournament) y
+se mantiene por filas: al guardar un Pokémon se recalcula su fila y solo las filas de
+los rivales a los que ahora gana o en cuya lista ya estaba; al cambiar un escenario,
+sus filas. Solo se reescriben las filas cuya lista cambia. Las señales lo programan
+tras el commit (COUNTERS_REFRESH: "async" en Celery, "sync" en el propio proceso u "off");
+manage.py rebuild_counters lo reconstruye entero.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import tournament
+from .models import PokemonCounter
+
+logger = logging.getLogger(__name__)
+
+
+def top_k() -> int:
+    return getattr(settings, "COUNTERS_INDEX_K", 20)
+
+
+def schedule(**job):
+    """Programa apply(**job) tras el commit según COUNTERS_REFRESH (best-effort si es async)."""
+    mode = getattr(settings, "COUNTERS_REFRESH", "async")
+    if mode == "off":
+        return
+
+    def run():
+        if mode == "sync":
+            apply(**job)
+            return
+        try:
+            from .tasks import refresh_counters
+            refresh_counters.delay(**job)
+        except Exception as exc:
+            logger.warning("Counters: no se pudo encolar la actualización %s: %s", job, exc)
+
+    transaction.on_commit(run)
+
+
+def apply(pokemon_id: int | None = None, scenario_id: int | None = None,
+          rows: list[int] | None = None, full: bool = False) -> int:
+    """Punto de entrada de la tarea; devuelve cuántas listas (pokemon, escenario) se reescribieron."""
+    if full:
+        return rebuild()
+    if scenario_id is not None:
+        return rebuild(scenario_ids=[scenario_id])
+    changed = 0
+    if pokemon_id is not None:
+        changed += refresh_pokemon(pokemon_id)
+    if rows:
+        changed += refresh_rows(rows)
+    return changed
+
+
+# ------- cálculo -------
+
+def _top(cat, result: dict, row: int, pokemon_index: int, k: int) -> list[tuple[int, int, int]]:
+    """(rival, turnos, hp restante) de los k que ganan a la fila `row`, del más rápido al más lento."""
+    beaten = ~result["a_wins"][row]
+    beaten[pokemon_index] = False  # el espejo no cuenta
+    idx = beaten.nonzero()[0]
+    turns, hp_left = result["turns"][row, idx], result["hp_b"][row, idx]
+    ids = cat.pokemon_ids[idx]
+    order = np.lexsort((ids, -hp_left, turns))[:k]
+    return [(int(ids[o]), int(turns[o]), int(hp_left[o])) for o in order]
+
+
+def _lists(cat, s: int, rows, k: int, block_rows: int = 512) -> dict[int, list[tuple[int, int, int]]]:
+    """Listas nuevas de las filas `rows` (índices del catálogo) en el escenario s, por bloques."""
+    out = {}
+    for start in range(0, len(rows), block_rows):
+        chunk = rows[start:start + block_rows]
+        result = tournament.resolve_pairs(cat, s, chunk, slice(None))
+        for r, i in enumerate(chunk):
+            out[int(cat.pokemon_ids[i])] = _top(cat, result, r, i, k)
+    return out
+
+
+def _write(scenario_id: int, lists: dict[int, list[tuple[int, int, int]]], only_changed: bool = True) -> int:
+    """Sustituye las listas dadas (pokemon_id → counters) de un escenario; omite las que no cambian."""
+    if only_changed and lists:
+        # con rank: tras un CASCADE la lista puede ser la misma pero con huecos en los rangos
+        current: dict[int, list] = {pid: [] for pid in lists}
+        for pid, rank, opp, turns, hp in (PokemonCounter.objects
+                                          .filter(scenario_id=scenario_id, pokemon_id__in=list(lists))
+                                          .order_by("pokemon_id", "rank")
+                                          .values_list("pokemon_id", "rank", "opponent_id", "turns", "hp_left")):
+            current[pid].append((rank, opp, turns, hp))
+        lists = {pid: items for pid, items in lists.items()
+                 if current[pid] != [(rank, *item) for rank, item in enumerate(items)]}
+    if not lists:
+        return 0
+    with transaction.atomic():
+        PokemonCounter.objects.filter(scenario_id=scenario_id, pokemon_id__in=list(lists)).delete()
+        PokemonCounter.objects.bulk_create([
+            PokemonCounter(pokemon_id=pid, scenario_id=scenario_id, rank=rank,
+                           opponent_id=opp, turns=turns, hp_left=hp)
+            for pid, items in lists.items()
+            for rank, (opp, turns, hp) in enumerate(items)
+        ], batch_size=2000)
+    return len(lists)
+
+
+def rebuild(scenario_ids=None) -> int:
+    """Índice completo (o de esos escenarios), recalculado desde el catálogo."""
+    cat = tournament.load_catalog()
+    k, changed = top_k(), 0
+    for s, scenario_id in enumerate(cat.scenario_ids.tolist()):
+        if scenario_ids is not None and scenario_id not in scenario_ids:
+            continue
+        lists = _lists(cat, s, np.arange(cat.size), k)
+        with transaction.atomic():
+            # también desaparecen las filas de Pokémon que ya no existen
+            PokemonCounter.objects.filter(scenario_id=scenario_id).delete()
+            changed += _write(scenario_id, lists, only_changed=False)
+    return changed
+
+
+def refresh_pokemon(pokemon_id: int) -> int:
+    """
+    Tras crear o editar un Pokémon P: su propia lista y las de los rivales que P
+    ahora gana o en cuya lista ya estaba (el resto no puede cambiar).
+    """
+    cat = tournament.load_catalog()
+    try:
+        p = cat.pokemon_index(pokemon_id)
+    except KeyError:
+        return 0  # borrado: el CASCADE ya quitó sus filas y las señales recalculan los afectados
+    k, changed = top_k(), 0
+    for s, scenario_id in enumerate(cat.scenario_ids.tolist()):
+        # P como B contra todos como A: ¿a quién gana ahora?
+        column = tournament.resolve_pairs(cat, s, slice(None), [p])
+        beats = ~column["a_wins"][:, 0]
+        beats[p] = False
+        listed = set(PokemonCounter.objects.filter(scenario_id=scenario_id, opponent_id=pokemon_id)
+                     .values_list("pokemon_id", flat=True))
+        affected = beats | np.isin(cat.pokemon_ids, list(listed))
+        affected[p] = True
+        changed += _write(scenario_id, _lists(cat, s, affected.nonzero()[0], k))
+    return changed
+
+
+def refresh_rows(pokemon_ids) -> int:
+    """Recalcula las listas de esos Pokémon en todos los escenarios (p. ej. tras borrar un counter suyo)."""
+    cat = tournament.load_catalog()
+    rows = np.flatnonzero(np.isin(cat.pokemon_ids, list(pokemon_ids)))
+    if not len(rows):
+        return 0
+    k = top_k()
+    return sum(_write(scenario_id, _lists(cat, s, rows, k))
+               for s, scenario_id in enumerate(cat.scenario_ids.tolist()))
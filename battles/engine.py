@@ -0,0 +1,128 @@
+# battles/engine.py
+"""Reglas puras del combate (sin DB ni Redis), compartidas por todos los modos de ejecución."""
+import math
+import random
+from dataclasses import dataclass
+
+# El bucle original corta en `turn < 10000`, es decir, como mucho 9999 turnos
+MAX_TURNS = 10000
+# Modelo estocástico: cada golpe hace entre el 85% y el 100% del daño base
+DAMAGE_ROLL_MIN = 0.85
+
+
+@dataclass(frozen=True)
+class Fighter:
+    name: str
+    hp: int
+    atk: float
+    deff: float
+    spd: float
+
+
+@dataclass(frozen=True)
+class Turn:
+    n: int
+    a_attacks: bool
+    damage: int
+    hp_a: int
+    hp_b: int
+
+    @property
+    def hp_defender(self) -> int:
+        return self.hp_b if self.a_attacks else self.hp_a
+
+
+@dataclass(frozen=True)
+class Outcome:
+    a_wins: bool
+    turns: int
+    hp_a: int
+    hp_b: int
+
+
+def fighter(pokemon, scenario) -> Fighter:
+    """Stats efectivas de un Pokémon dentro de un escenario."""
+    return Fighter(
+        name=pokemon.name,
+        hp=pokemon.hp,
+        atk=pokemon.attack * scenario.attack_modifier,
+        deff=pokemon.defense * scenario.defense_modifier,
+        spd=pokemon.speed * scenario.speed_modifier,
+    )
+
+
+def damage(attacker: Fighter, defender: Fighter) -> int:
+    return max(1, round(attacker.atk - defender.deff))
+
+
+def a_starts(a: Fighter, b: Fighter) -> bool:
+    # empate comienza A
+    return a.spd >= b.spd
+
+
+def resolve(a: Fighter, b: Fighter, max_turns: int = MAX_TURNS) -> Outcome:
+    """
+    Resultado analítico del combate: turnos hasta KO sin recorrer el bucle.
+    El daño por golpe es constante para cada lado, así que basta con contar golpes.
+    """
+    dmg_a, dmg_b = damage(a, b), damage(b, a)
+    if a.hp <= 0 or b.hp <= 0:
+        turns = 0
+    else:
+        ko_by_a = math.ceil(b.hp / dmg_a)  # golpes que necesita A
+        ko_by_b = math.ceil(a.hp / dmg_b)  # golpes que necesita B
+        if a_starts(a, b):
+            turns = 2 * ko_by_a - 1 if ko_by_a <= ko_by_b else 2 * ko_by_b
+        else:
+            turns = 2 * ko_by_b - 1 if ko_by_b <= ko_by_a else 2 * ko_by_a
+    turns = min(turns, max_turns - 1)
+
+    first_hits, second_hits = (turns + 1) // 2, turns // 2
+    hits_a, hits_b = (first_hits, second_hits) if a_starts(a, b) else (second_hits, first_hits)
+    hp_a = max(0, a.hp - hits_b * dmg_b)
+    hp_b = max(0, b.hp - hits_a * dmg_a)
+    return Outcome(a_wins=hp_a > 0, turns=turns, hp_a=hp_a, hp_b=hp_b)
+
+
+def turn_sequence(a: Fighter, b: Fighter, max_turns: int = MAX_TURNS):
+    """Genera los turnos uno a uno (misma secuencia que el bucle en tiempo real)."""
+    dmg_a, dmg_b = damage(a, b), damage(b, a)
+    hp_a, hp_b = a.hp, b.hp
+    attacker_is_a = a_starts(a, b)
+    n = 1
+    while hp_a > 0 and hp_b > 0 and n < max_turns:
+        if attacker_is_a:
+            dmg = dmg_a
+            hp_b = max(0, hp_b - dmg)
+        else:
+            dmg = dmg_b
+            hp_a = max(0, hp_a - dmg)
+        yield Turn(n=n, a_attacks=attacker_is_a, damage=dmg, hp_a=hp_a, hp_b=hp_b)
+        attacker_is_a = not attacker_is_a
+        n += 1
+
+
+def rolled_damage(attacker: Fighter, defender: Fighter, roll: float) -> int:
+    """Daño con tirada (roll en [DAMAGE_ROLL_MIN, 1]); con roll=1 es damage()."""
+    return max(1, round((attacker.atk - defender.deff) * roll))
+
+
+def stochastic_sequence(a: Fighter, b: Fighter, rng: random.Random,
+                        roll_min: float = DAMAGE_ROLL_MIN, max_turns: int = MAX_TURNS):
+    """
+    Como turn_sequence pero con varianza: tirada de daño uniforme en [roll_min, 1] en
+    cada golpe y empate de velocidad a cara o cruz. El mismo rng (semilla) da los mismos turnos.
+    """
+    hp_a, hp_b = a.hp, b.hp
+    attacker_is_a = a.spd > b.spd or (a.spd == b.spd and rng.random() < 0.5)
+    n = 1
+    while hp_a > 0 and hp_b > 0 and n < max_turns:
+        if attacker_is_a:
+            dmg = rolled_damage(a, b, rng.uniform(roll_min, 1.0))
+            hp_b = max(0, hp_b - dmg)
+        else:
+            dmg = rolled_damage(b, a, rng.uniform(roll_min, 1.0))
+            hp_a = max(0, hp_a - dmg)
+        yield Turn(n=n, a_attacks=attacker_is_a, damage=dmg, hp_a=hp_a, hp_b=hp_b)
+        attacker_is_a = not attacker_is_a
+        n += 1
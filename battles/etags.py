@@ -0,0 +1,60 @@
+# battles/etags.py
+"""
+ETags fuertes y GET condicional para el detalle y el listado de combates.
+
+La versión sale de una consulta mínima (updated_at del combate) o, en el listado, de
+las filas de la página que ya se leen para responder (ids + updated_at, más el total
+si la paginación lo devuelve), y de la versión del catálogo (nombres de Pokémon/
+escenarios que aparecen en la respuesta), así que un sondeo sin cambios no serializa nada.
+"""
+import hashlib
+import logging
+
+from rest_framework.response import Response
+
+from . import catalog
+
+logger = logging.getLogger(__name__)
+
+
+def make(*parts) -> str | None:
+    """ETag entre comillas a partir de las partes; None si falta la versión del catálogo."""
+    try:
+        parts = (*parts, catalog.version())
+    except Exception as exc:
+        logger.warning("ETag: versión del catálogo no disponible: %s", exc)
+        return None
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def for_battle(queryset, pk) -> str | None:
+    """Detalle: una consulta a updated_at; None si el combate no existe (que responda el 404)."""
+    updated_at = queryset.filter(pk=pk).values_list("updated_at", flat=True).first()
+    return None if updated_at is None else make("battle", pk, updated_at.isoformat())
+
+
+def for_list(rows, request, total: int | None = None) -> str | None:
+    """Listado: ids y updated_at de las filas devueltas + total (si lo hay) + query params."""
+    page = [(b.pk, b.updated_at.isoformat() if b.updated_at else "") for b in rows]
+    params = sorted((k, v) for k, vs in request.query_params.lists() for v in vs)
+    return make("battles", total, page, params)
+
+
+def matches(request, etag: str | None) -> bool:
+    if not etag:
+        return False
+    header = request.headers.get("If-None-Match", "")
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+
+def not_modified(etag: str) -> Response:
+    return tag(Response(status=304), etag)
+
+
+def tag(response, etag: str | None):
+    if etag and response.status_code in (200, 304):
+        response["ETag"] = etag
+        # el navegador revalida siempre (If-None-Match) en vez de servir de su caché
+        response["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,185 @@
+# battles/events.py
+"""Eventos de combate sobre Redis: un pool de conexiones por proceso y un emisor con buffer."""
+import json
+import threading
+import time
+
+from django.conf import settings
+from redis import BlockingConnectionPool, ConnectionPool, Redis
+
+from . import metrics
+
+_pool: ConnectionPool | None = None
+_stream_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_redis() -> Redis:
+    """
+    Cliente sobre el pool compartido del proceso (emit, métricas, cachés, bulk).
+    Con REDIS_MAX_CONNECTIONS en uso espera hasta REDIS_POOL_TIMEOUT segundos en vez de fallar.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # redis-py detecta el fork (prefork de Celery) y rehace las conexiones por pid
+                _pool = BlockingConnectionPool.from_url(
+                    getattr(settings, "REDIS_URL", "redis://redis:6379/0"),
+                    max_connections=getattr(settings, "REDIS_MAX_CONNECTIONS", 50),
+                    timeout=getattr(settings, "REDIS_POOL_TIMEOUT", 5.0),
+                )
+    return Redis(connection_pool=_pool)
+
+
+def get_stream_redis() -> Redis:
+    """
+    Cliente para las suscripciones pub/sub del SSE síncrono: cada espectador retiene una
+    conexión mientras dura el stream, así que van en un pool aparte (límite SSE_MAX_STREAMS,
+    None = sin límite) y no agotan el compartido.
+    """
+    global _stream_pool
+    if _stream_pool is None:
+        with _pool_lock:
+            if _stream_pool is None:
+                _stream_pool = ConnectionPool.from_url(
+                    getattr(settings, "REDIS_URL", "redis://redis:6379/0"),
+                    max_connections=getattr(settings, "SSE_MAX_STREAMS", None),
+                )
+    return Redis(connection_pool=_stream_pool)
+
+
+def channel(battle_id: int) -> str:
+    return f"battle:{battle_id}:events"
+
+
+def stream_key(battle_id: int) -> str:
+    return f"battle:{battle_id}:stream"
+
+
+# XADD + PUBLISH atómicos: el mensaje pub/sub lleva el id del Stream ("<id>\n<json>")
+# para que los espectadores en vivo y los que reproducen compartan la misma numeración.
+_PUBLISH_LUA = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[2], id .. '\\n' .. ARGV[2])
+return id
+"""
+
+
+def split_message(raw: str) -> tuple[str | None, str]:
+    """Separa "<id>\n<json>"; los mensajes sin id se devuelven tal cual."""
+    event_id, sep, data = raw.partition("\n")
+    return (event_id, data) if sep else (None, raw)
+
+
+def parse_event_id(value: str | None) -> tuple[int, int] | None:
+    """'1712345678901-3' -> (1712345678901, 3); None si no es un id de Stream válido."""
+    try:
+        ms, _, seq = (value or "").strip().partition("-")
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return None
+
+
+def replay_args(battle_id: int, after_id: str) -> dict:
+    """Argumentos de XRANGE para los eventos con id estrictamente mayor que `after_id`."""
+    return {
+        "name": stream_key(battle_id),
+        "min": f"({after_id}",
+        "max": "+",
+        "count": getattr(settings, "BATTLE_EVENTS_STREAM_MAXLEN", 20000),
+    }
+
+
+def decode_entries(entries) -> list[tuple[str, str]]:
+    return [(_text(eid), _text(fields.get(b"data", fields.get("data", b"")))) for eid, fields in entries]
+
+
+def replay(redis: Redis, battle_id: int, after_id: str) -> list[tuple[str, str]]:
+    return decode_entries(redis.xrange(**replay_args(battle_id, after_id)))
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class EventEmitter:
+    """
+    Acumula eventos y los publica en un único pipeline; cada evento se añade además
+    al Stream acotado del combate para poder reproducirlo (Last-Event-ID).
+    Con flush_interval=0 publica en el acto; si no, un timer vacía el buffer
+    como mucho `flush_interval` segundos después del primer evento pendiente.
+    Con flush_interval=None solo se vacía al llamar a flush().
+    """
+
+    def __init__(self, flush_interval: float | None = 0.0, max_buffer: int = 500, redis: Redis | None = None):
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._redis = redis
+        self._buffer: list[tuple[int, str]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # conserva el orden entre flushes concurrentes
+        self._timer: threading.Timer | None = None
+        self._script = None
+        self.published = 0
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis or get_redis()
+
+    def emit(self, battle_id: int, payload: dict, flush: bool = False):
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append((battle_id, data))
+            manual = self.flush_interval is None
+            immediate = flush or (not manual and self.flush_interval <= 0) or len(self._buffer) >= self.max_buffer
+            if not immediate and not manual and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if immediate:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return
+            redis = self.redis
+            if self._script is None:
+                self._script = redis.register_script(_PUBLISH_LUA)
+            maxlen = getattr(settings, "BATTLE_EVENTS_STREAM_MAXLEN", 20000)
+            ttl = getattr(settings, "BATTLE_EVENTS_STREAM_TTL", 24 * 3600)
+            pipe = redis.pipeline(transaction=False)
+            for battle_id, data in batch:
+                self._script(keys=[stream_key(battle_id), channel(battle_id)], args=[maxlen, data, ttl], client=pipe)
+            t0 = time.perf_counter()
+            pipe.execute()
+            metrics.EVENT_PUBLISH_SECONDS.observe(time.perf_counter() - t0)
+            metrics.EVENTS_PUBLISHED.inc(len(batch))
+            self.published += len(batch)
+
+
+_emitter: EventEmitter | None = None
+
+
+def emitter() -> EventEmitter:
+    """Emisor compartido del proceso, configurado con BATTLE_EVENTS_FLUSH_INTERVAL."""
+    global _emitter
+    if _emitter is None:
+        with _pool_lock:
+            if _emitter is None:
+                _emitter = EventEmitter(
+                    flush_interval=getattr(settings, "BATTLE_EVENTS_FLUSH_INTERVAL", 0.0),
+                    max_buffer=getattr(settings, "BATTLE_EVENTS_MAX_BUFFER", 500),
+                )
+    return _emitter
+
+
+def emit(battle_id: int, payload: dict, flush: bool = False):
+    emitter().emit(battle_id, payload, flush=flush)
@@ -0,0 +1,109 @@
+# battles/export.py
+"""
+Exportación en streaming del histórico de combates (NDJSON o CSV).
+
+Recorre Battle por id con .iterator(chunk_size=BATTLE_EXPORT_CHUNK) sobre un
+values_list con los nombres ya unidos, y emite un trozo de texto por cada lote de
+filas: la memoria no depende de cuántas filas salgan. Bajo ASGI el iterador se
+consume lote a lote en el hilo de la petición (una respuesta síncrona se leería
+entera antes de enviarse).
+"""
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from . import turnlog
+
+COLUMNS = [
+    "id", "name", "status", "mode", "pokemon_a", "pokemon_b", "scenario", "winner",
+    "run_count_total", "run_count_cron", "turns", "hp_a", "hp_b", "created_at", "updated_at",
+]
+_VALUES = [
+    "id", "name", "status", "mode", "pokemon_a__name", "pokemon_b__name", "scenario__name", "winner__name",
+    "run_count_total", "run_count_cron", "turn_log", "state", "created_at", "updated_at",
+]
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Solo para la negociación (?format=ndjson / Accept); los datos salen en streaming."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # respuestas de error (dict): una fila por clave
+        out = io.StringIO()
+        csv.writer(out).writerows((k, v) for k, v in (data or {}).items())
+        return out.getvalue()
+
+
+def _row(values) -> dict:
+    *head, blob, state, created_at, updated_at = values
+    state = state or {}
+    return {
+        **dict(zip(COLUMNS, head)),
+        "turns": turnlog.turn_count(blob) if blob else None,
+        "hp_a": state.get("hp_a"),
+        "hp_b": state.get("hp_b"),
+        "created_at": created_at.isoformat(),
+        "updated_at": updated_at.isoformat(),
+    }
+
+
+def _chunks(queryset, fmt: str, chunk_size: int):
+    """Un str por cada `chunk_size` filas (cabecera incluida en CSV)."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=COLUMNS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    pending = 0
+    for values in queryset.values_list(*_VALUES).iterator(chunk_size=chunk_size):
+        row = _row(values)
+        if writer:
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(row, ensure_ascii=False))
+            buf.write("\n")
+        pending += 1
+        if pending >= chunk_size:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+async def _aiter(iterator):
+    """Consume `iterator` lote a lote con sync_to_async, en el hilo de la petición (misma conexión)."""
+    pull = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (part := await pull(iterator, done)) is not done:
+        yield part
+
+
+def stream(request, queryset, fmt: str) -> StreamingHttpResponse:
+    """Respuesta en streaming de `queryset` (Battle) en NDJSON o CSV."""
+    chunks = _chunks(queryset.order_by("id"), fmt, getattr(settings, "BATTLE_EXPORT_CHUNK", 2000))
+    if isinstance(request, ASGIRequest):
+        chunks = _aiter(chunks)
+    renderer = CSVRenderer if fmt == "csv" else NDJSONRenderer
+    resp = StreamingHttpResponse(chunks, content_type=f"{renderer.media_type}; charset=utf-8")
+    resp["Content-Disposition"] = f'attachment; filename="battles.{fmt}"'
+    resp["X-Accel-Buffering"] = "no"
+    return resp
@@ -0,0 +1,163 @@
+# battles/imports.py
+"""
+Importación masiva del catálogo (Pokémon / Escenarios) desde CSV o NDJSON.
+
+La entrada se lee en streaming, línea a línea, y se procesa por lotes de
+CATALOG_IMPORT_BATCH filas. Cada lote se valida con el serializer de importación
+(sin el UniqueValidator, que costaría una consulta por fila) y se hace upsert por
+nombre con bulk_create(update_conflicts=True), un lote por transacción, así que la
+memoria no crece con el tamaño del fichero. Cada fila es el registro completo: los
+campos que falten toman su valor por defecto.
+
+bulk_create no emite señales: al terminar se sube la versión del catálogo y se
+invalida la outcome cache de las filas que ya existían (lo que hace battles.signals).
+"""
+import csv
+import itertools
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import catalog
+from .models import Pokemon, Scenario
+from .outcomes import get_cache
+from .serializers import PokemonImportSerializer, ScenarioImportSerializer
+
+FORMATS = ("csv", "ndjson")
+KINDS = {
+    "pokemon": (Pokemon, PokemonImportSerializer),
+    "scenario": (Scenario, ScenarioImportSerializer),
+}
+# errores detallados que se devuelven; el resto solo se cuentan
+MAX_ERRORS = 50
+
+
+@dataclass
+class Result:
+    created: int = 0
+    updated: int = 0
+    invalid: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def error(self, line: int, detail):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self) -> dict:
+        return {"created": self.created, "updated": self.updated,
+                "invalid": self.invalid, "errors": self.errors}
+
+
+def detect_format(name: str | None = None, content_type: str | None = None) -> str | None:
+    """Formato a partir de la extensión del fichero o del Content-Type."""
+    name, content_type = (name or "").lower(), (content_type or "").split(";")[0].strip().lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in (
+            "application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+
+def _lines(stream):
+    """Líneas de texto de un fichero/petición binario sin leerlo entero."""
+    for i, raw in enumerate(stream):
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        yield line.lstrip("\ufeff") if i == 0 else line
+
+
+def _rows(stream, fmt: str):
+    """(línea, fila) o (línea, error de formato) por cada registro de la entrada."""
+    lines = _lines(stream)
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # celdas vacías = campo ausente (valor por defecto); columnas de más (None) fuera
+            yield reader.line_num, {k: v for k, v in row.items() if k is not None and v not in ("", None)}
+        return
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield n, f"JSON inválido: {exc}"
+            continue
+        yield n, row if isinstance(row, dict) else "Cada línea debe ser un objeto JSON"
+
+
+def import_catalog(kind: str, stream, fmt: str, batch_size: int | None = None) -> Result:
+    """Importa `stream` (iterable de líneas, bytes o str) como filas de `kind`."""
+    model, serializer_class = KINDS[kind]
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    batch_size = batch_size or getattr(settings, "CATALOG_IMPORT_BATCH", 2000)
+    validator = serializer_class()
+    update_fields = [f for f in serializer_class.Meta.fields if f != "name"]
+    result, existing_ids = Result(), []
+
+    rows = _rows(stream, fmt)
+    while chunk := list(itertools.islice(rows, batch_size)):
+        valid: dict[str, dict] = {}
+        for line, row in chunk:
+            if isinstance(row, str):
+                result.error(line, {"non_field_errors": [row]})
+                continue
+            try:
+                data = validator.run_validation(row)
+            except serializers.ValidationError as exc:
+                result.error(line, exc.detail)
+                continue
+            valid[data["name"]] = data  # el mismo nombre repetido: gana la última fila
+        if not valid:
+            continue
+        with transaction.atomic():
+            existing = dict(model.objects.filter(name__in=list(valid)).values_list("name", "id"))
+            model.objects.bulk_create(
+                [model(**data) for data in valid.values()],
+                update_conflicts=True, unique_fields=["name"], update_fields=update_fields,
+            )
+        result.updated += len(existing)
+        result.created += len(valid) - len(existing)
+        existing_ids.extend(existing.values())
+
+    if result.created or result.updated:
+        transaction.on_commit(catalog.bump)
+        transaction.on_commit(lambda: get_cache().invalidate_many(kind, existing_ids))
+        # bulk_create no emite post_save: el índice de counters se reconstruye entero
+        from . import counters
+        counters.schedule(full=True)
+    return result
+
+
+def from_request(request) -> tuple[object, str | None]:
+    """
+    Entrada y formato de una petición: fichero multipart `file` (formato por extensión)
+    o el cuerpo tal cual con Content-Type text/csv / application/x-ndjson, leído en streaming.
+    """
+    if request.content_type.startswith("multipart/"):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return None, None
+        return upload, detect_format(upload.name, upload.content_type)
+    return request.stream or (), detect_format(content_type=request.content_type)
+
+
+class ImportViewMixin:
+    """POST <listado>/import/ en los viewsets del catálogo; `import_kind` elige el modelo."""
+    import_kind = ""
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        stream, fmt = from_request(request)
+        if fmt is None:
+            return Response({"detail": "Envía CSV (text/csv) o NDJSON (application/x-ndjson), "
+                                       "en el cuerpo o como fichero `file`"}, status=415)
+        result = import_catalog(self.import_kind, stream, fmt)
+        return Response(result.as_dict(), status=200)
@@ -0,0 +1,249 @@
+# battles/live.py
+"""
+Motor asyncio para combates en tiempo real (BATTLE_ENGINE="asyncio").
+
+Un solo proceso reproduce muchos combates a la vez: el ritmo entre turnos sale de
+temporizadores del event loop en lugar de time.sleep, y las escrituras de todos
+los combates se agrupan en un flush periódico (una transacción de DB y un
+pipeline de Redis por ciclo). Si la transacción falla se repite combate a combate,
+y solo fallan los combates cuyas escrituras no entran. Al parar el runner, los
+combates a medias quedan como fallidos en vez de RUNNING.
+"""
+import asyncio
+import json
+import logging
+import signal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk, metrics, outcomes
+from .events import EventEmitter, get_redis
+from .models import Battle, BattleTurn
+from .tasks import START_APPEND, _Run, _begin, _fail
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "battles:live:queue"
+
+
+def enqueue(battle_id: int, source: str = "manual", mode: str | None = None, group: str | None = None):
+    """Cede un combate al runner asyncio (lo llama run_battle)."""
+    get_redis().rpush(QUEUE_KEY, json.dumps({
+        "battle_id": battle_id, "source": source, "mode": mode, "group": group,
+    }))
+
+
+class LiveRunner:
+    def __init__(self, max_battles: int | None = None, flush_interval: float | None = None,
+                 tick: float | None = None, redis=None):
+        self.max_battles = max_battles or getattr(settings, "BATTLE_LIVE_MAX_BATTLES", 500)
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else getattr(settings, "BATTLE_LIVE_FLUSH_INTERVAL", 0.2))
+        self.tick = tick if tick is not None else getattr(settings, "BATTLE_TICK_SLEEP", 0.4)
+        # los eventos solo salen en flush(), todos los combates en el mismo pipeline
+        self.emitter = EventEmitter(flush_interval=None, max_buffer=10**6, redis=redis)
+        self.active = 0
+        self._slots = asyncio.Semaphore(self.max_battles)
+        self._turns: list[BattleTurn] = []
+        self._states: dict[int, dict] = {}
+        self._finals: list[tuple["_Run", dict, asyncio.Future]] = []
+        self._broken: dict[int, Exception] = {}  # combates cuyas escrituras falló el flush
+
+    # ---- un combate ----
+
+    async def play(self, battle_id: int, source: str = "manual", mode: str | None = None,
+                   group: str | None = None):
+        run = await sync_to_async(_begin)(battle_id, mode)
+        if run is None:
+            metrics.BATTLES.inc(status="skipped")
+            await sync_to_async(bulk.mark)(group, "skipped")
+            return
+        self.active += 1
+        started = asyncio.get_running_loop().time()
+        finishing = False
+        try:
+            battle = run.battle
+            memo = await sync_to_async(outcomes.simulate)(battle.pokemon_a, battle.pokemon_b, battle.scenario)
+            hpA, hpB = run.fa.hp, run.fb.hp
+            seq = 0
+            for line in run.header():
+                self._turns.append(BattleTurn(battle_id=battle_id, seq=seq, line=line))
+                seq += 1
+            self._states[battle_id] = {"hp_a": hpA, "hp_b": hpB}
+            self.emitter.emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":START_APPEND})
+
+            for t in memo.turns:
+                hpA, hpB = t.hp_a, t.hp_b
+                line = run.line(t)
+                self._turns.append(BattleTurn(battle_id=battle_id, seq=seq, turn=t.n, line=line))
+                seq += 1
+                self._states[battle_id] = {"hp_a": hpA, "hp_b": hpB}
+                self.emitter.emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":line})
+                if hpA == 0 or hpB == 0:
+                    break
+                await asyncio.sleep(self.tick)
+                self._check(battle_id)
+            self._check(battle_id)
+
+            _, fields, done = run.finish(hpA, hpB, source, memo.turns)
+            # el "done" sale después de que el update final esté confirmado
+            finished = asyncio.get_running_loop().create_future()
+            self._finals.append((run, fields, finished))
+            finishing = True
+            await finished
+            self.emitter.emit(battle_id, done)
+            metrics.BATTLE_DURATION_SECONDS.observe(asyncio.get_running_loop().time() - started, mode=run.mode)
+            metrics.BATTLES.inc(status="finished", mode=run.mode)
+            await sync_to_async(bulk.mark)(group, "finished")
+        except asyncio.CancelledError:
+            # runner detenido: el update final ya encolado lo aplica el último flush
+            if not finishing:
+                logger.warning("Live battle %s interrumpida al parar el runner", battle_id)
+                self._discard(battle_id)
+                await sync_to_async(_fail)(battle_id, RuntimeError("Runner detenido con el combate en curso"))
+                metrics.BATTLES.inc(status="failed", mode=run.mode)
+                await sync_to_async(bulk.mark)(group, "failed")
+            raise
+        except Exception as exc:
+            logger.exception("Live battle %s falló", battle_id)
+            self._discard(battle_id)
+            await sync_to_async(_fail)(battle_id, exc)
+            metrics.BATTLES.inc(status="failed", mode=run.mode)
+            await sync_to_async(bulk.mark)(group, "failed")
+        finally:
+            self._broken.pop(battle_id, None)
+            self.active -= 1
+
+    def _discard(self, battle_id: int):
+        """Descarta lo pendiente de un combate que falla: un flush posterior no debe reescribir su log."""
+        self._turns = [t for t in self._turns if t.battle_id != battle_id]
+        self._states.pop(battle_id, None)
+
+    def _check(self, battle_id: int):
+        """Corta el combate si un flush no pudo guardar sus turnos (el log tendría huecos)."""
+        exc = self._broken.pop(battle_id, None)
+        if exc is not None:
+            raise exc
+
+    # ---- escrituras agrupadas ----
+
+    @staticmethod
+    def _apply(turns: list[BattleTurn], states: dict[int, dict], finals: list[tuple["_Run", dict, asyncio.Future]]):
+        finished = {run.battle.id for run, _, _ in finals}
+        # las filas de combates que terminan en este ciclo no se insertan: su log va en turn_log
+        BattleTurn.objects.bulk_create([t for t in turns if t.battle_id not in finished], batch_size=500)
+        for battle_id, state in states.items():
+            if battle_id not in finished:
+                Battle.objects.filter(id=battle_id).update(state=state, updated_at=timezone.now())
+        for run, fields, _ in finals:
+            run.finalize(fields)
+
+    @classmethod
+    def _write(cls, turns: list[BattleTurn], states: dict[int, dict],
+               finals: list[tuple["_Run", dict, asyncio.Future]]) -> dict[int, Exception]:
+        """Aplica el ciclo en una transacción; si falla, combate a combate. Devuelve los que fallaron."""
+        try:
+            with transaction.atomic():
+                cls._apply(turns, states, finals)
+            return {}
+        except Exception:
+            pass
+        # repetir por combate, como BatchWriter: el error de uno no se lleva los turnos del resto
+        by_battle: dict[int, tuple[list, dict, list]] = {}
+        for t in turns:
+            by_battle.setdefault(t.battle_id, ([], {}, []))[0].append(t)
+        for battle_id, state in states.items():
+            by_battle.setdefault(battle_id, ([], {}, []))[1][battle_id] = state
+        for final in finals:
+            by_battle.setdefault(final[0].battle.id, ([], {}, []))[2].append(final)
+        failed = {}
+        for battle_id, ops in by_battle.items():
+            try:
+                with transaction.atomic():
+                    cls._apply(*ops)
+            except Exception as exc:
+                logger.warning("Escrituras del combate %s fallaron: %s", battle_id, exc)
+                failed[battle_id] = exc
+        return failed
+
+    async def flush(self):
+        turns, self._turns = self._turns, []
+        states, self._states = self._states, {}
+        finals, self._finals = self._finals, []
+        if turns or states or finals:
+            try:
+                failed = await sync_to_async(self._write)(turns, states, finals)
+            except Exception as exc:
+                logger.exception("Flush del live runner falló")
+                failed = {bid: exc for bid in {t.battle_id for t in turns} | set(states)
+                          | {run.battle.id for run, _, _ in finals}}
+            for run, _, fut in finals:
+                if not fut.done():
+                    exc = failed.pop(run.battle.id, None)
+                    if exc is not None:
+                        fut.set_exception(exc)
+                    else:
+                        fut.set_result(None)
+            # los que siguen en juego se cortan en su próximo turno
+            self._broken.update(failed)
+        try:
+            await sync_to_async(self.emitter.flush)()
+        except Exception:
+            logger.exception("Publicación de eventos del live runner falló")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---- entradas ----
+
+    async def _guarded(self, job: dict):
+        try:
+            await self.play(**job)
+        finally:
+            self._slots.release()
+
+    async def run_many(self, jobs: list[dict]):
+        """Reproduce un conjunto fijo de combates y termina (tests / benchmarks)."""
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            await asyncio.gather(*(self.play(**job) for job in jobs))
+        finally:
+            flusher.cancel()
+            await self.flush()
+
+    async def serve(self):
+        """Consume QUEUE_KEY indefinidamente con hasta max_battles combates simultáneos."""
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(getattr(settings, "REDIS_URL", "redis://redis:6379/0"))
+        flusher = asyncio.create_task(self._flush_loop())
+        running: set[asyncio.Task] = set()
+        try:
+            # SIGTERM (docker stop) para igual que Ctrl+C: cancela y cierra los combates en curso
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+        try:
+            while True:
+                await self._slots.acquire()
+                item = await redis.blpop([QUEUE_KEY], timeout=1)
+                if item is None:
+                    self._slots.release()
+                    continue
+                task = asyncio.create_task(self._guarded(json.loads(item[1])))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        finally:
+            flusher.cancel()
+            # cada combate interrumpido se marca fallido (ver play); los que ya cerraban se guardan abajo
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            await self.flush()
+            await redis.aclose()
@@ -0,0 +1,296 @@
+# battles/management/commands/bench.py
+import json
+import platform
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from battles import catalog, events, outcomes, turnlog
+from battles.engine import Turn, fighter, turn_sequence
+from battles.events import EventEmitter
+from battles.models import Battle, Pokemon, Scenario
+from battles.outcomes import OutcomeCache
+from battles.serializers import BattleDetailSerializer, BattleListSerializer
+from battles.tasks import _emit, run_battle
+from battles.views import PokemonViewSet
+
+
+class _MemoryPipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class _MemoryScript:
+    """Equivale a events._PUBLISH_LUA (XADD acotado + PUBLISH)."""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    def __call__(self, keys, args, client=None):
+        if isinstance(client, _MemoryPipeline):
+            return client._publish_stream(keys, args)
+        return self._redis._publish_stream(keys, args)
+
+
+class _MemoryRedis:
+    """
+    Redis en memoria con lo justo para emitter, outcome cache y catálogo: mide
+    el coste propio del código sin red (al estilo de fakeredis, sin la dependencia).
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.streams = defaultdict(deque)
+        self.published = 0
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+    def register_script(self, script):
+        return _MemoryScript(self)
+
+    def _publish_stream(self, keys, args):
+        stream, _chan = keys
+        maxlen, data, _ttl = args
+        entries = self.streams[stream]
+        entries.append(data)
+        while len(entries) > int(maxlen):
+            entries.popleft()
+        self.published += 1
+        return f"0-{self.published}"
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def delete(self, *keys):
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def sadd(self, key, *values):
+        self.data.setdefault(key, set()).update(values)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def hincrby(self, key, field, amount=1):
+        h = self.data.setdefault(key, {})
+        h[field] = h.get(field, 0) + amount
+        return h[field]
+
+    def hset(self, key, mapping=None, **kwargs):
+        self.data.setdefault(key, {}).update(mapping or {})
+
+    def hgetall(self, key):
+        return {k.encode(): str(v).encode() for k, v in self.data.get(key, {}).items()}
+
+
+def _best(fn, repeat: int) -> float:
+    """Mejor tiempo (s) de `repeat` ejecuciones: el menos afectado por ruido."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+class Command(BaseCommand):
+    help = ("Microbenchmarks de los caminos calientes (run_battle, serializers, listado de "
+            "Pokémon, _emit) sobre datos sembrados y Redis en memoria; compara con un baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--turns", default="10,100,1000", help="Turnos por combate a medir (separados por coma)")
+        parser.add_argument("--battles", type=int, default=20, help="Combates por medición de run_battle")
+        parser.add_argument("--rows", type=int, default=1000, help="Filas para los serializers")
+        parser.add_argument("--pokemons", type=int, default=500, help="Pokémon sembrados para el listado")
+        parser.add_argument("--events", type=int, default=20000, help="Eventos para la tasa de _emit")
+        parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se queda el mejor tiempo)")
+        parser.add_argument("--seed", type=int, default=1234)
+        parser.add_argument("--output", help="Guardar los resultados JSON en este fichero")
+        parser.add_argument("--baseline", help="JSON previo con el que comparar")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Regresión máxima admitida frente al baseline (0.25 = 25%%)")
+
+    def handle(self, *args, **opts):
+        self.rng = random.Random(opts["seed"])
+        self.repeat = max(1, opts["repeat"])
+        metrics = {}
+        with self._sandbox():
+            self.scenario = Scenario.objects.create(name="bench-scenario")
+            metrics.update(self._bench_run_battle([int(t) for t in opts["turns"].split(",") if t.strip()],
+                                                  opts["battles"]))
+            metrics.update(self._bench_serializers(opts["rows"]))
+            metrics.update(self._bench_pokemon_list(opts["pokemons"]))
+            metrics.update(self._bench_emit(opts["events"]))
+
+        result = {
+            "python": platform.python_version(),
+            "seed": opts["seed"],
+            "repeat": self.repeat,
+            "metrics": {k: round(v, 4) for k, v in sorted(metrics.items())},
+        }
+        self.stdout.write(json.dumps(result, indent=2))
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                json.dump(result, fh, indent=2)
+        if opts["baseline"]:
+            self._compare(result["metrics"], opts["baseline"], opts["tolerance"])
+
+    # ---- entorno ----
+
+    @contextmanager
+    def _sandbox(self):
+        """Datos sembrados dentro de una transacción que se deshace; Redis y caché en memoria."""
+        redis = _MemoryRedis()
+        saved = events._emitter, outcomes._cache
+        events._emitter = EventEmitter(flush_interval=0.0, redis=redis)
+        outcomes._cache = OutcomeCache(redis=redis)
+        try:
+            with override_settings(
+                BATTLE_TICK_SLEEP=0,
+                BATTLE_DB_WRITER="inline",
+                BATTLE_OUTCOME_CACHE=False,  # mide el motor completo en cada combate
+                METRICS_ENABLED=False,  # sin volcados a un Redis real
+                CACHES={alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                "LOCATION": f"bench-{alias}"} for alias in ("default", "catalog")},
+            ):
+                with transaction.atomic():
+                    yield
+                    transaction.set_rollback(True)
+        finally:
+            events._emitter, outcomes._cache = saved
+
+    def _pokemon(self, name: str, **stats) -> Pokemon:
+        return Pokemon.objects.create(name=f"bench-{name}", **stats)
+
+    # ---- run_battle ----
+
+    def _bench_run_battle(self, turn_counts: list[int], n: int) -> dict:
+        """Combates por segundo y turnos por segundo, por número de turnos y modo."""
+        out = {}
+        for turns in turn_counts:
+            # daño 1 por golpe y el mismo hp: el combate dura 2*hp - 1 turnos
+            hp = max(1, (turns + 1) // 2)
+            a = self._pokemon(f"a{turns}", hp=hp, attack=50, defense=50, speed=60)
+            b = self._pokemon(f"b{turns}", hp=hp, attack=50, defense=50, speed=40)
+            played = len(list(turn_sequence(fighter(a, self.scenario), fighter(b, self.scenario))))
+            for mode in (Battle.Mode.REALTIME, Battle.Mode.INSTANT):
+                ids = [Battle.objects.create(pokemon_a=a, pokemon_b=b, scenario=self.scenario, mode=mode).id
+                       for _ in range(n)]
+                elapsed = _best(lambda: [run_battle(i) for i in ids], self.repeat)
+                prefix = f"run_battle.{mode.lower()}.turns_{played}"
+                out[f"{prefix}.battles_per_s"] = n / elapsed
+                out[f"{prefix}.turns_per_s"] = n * played / elapsed
+        return out
+
+    # ---- serializers ----
+
+    def _bench_serializers(self, rows: int) -> dict:
+        """Milisegundos por cada 1000 filas en lista y detalle (el detalle pinta el log)."""
+        a = self._pokemon("ser-a", hp=60, attack=70, defense=40, speed=50)
+        b = self._pokemon("ser-b", hp=60, attack=60, defense=45, speed=55)
+        fa, fb = fighter(a, self.scenario), fighter(b, self.scenario)
+        blob = turnlog.encode(fa, fb, turn_sequence(fa, fb))
+        Battle.objects.bulk_create([
+            Battle(pokemon_a=a, pokemon_b=b, scenario=self.scenario, status=Battle.Status.FINISHED,
+                   winner=a, turn_log=blob,
+                   state={"hp_a": self.rng.randint(1, 60), "hp_b": 0})
+            for _ in range(rows)
+        ])
+        qs = Battle.objects.filter(pokemon_a=a).select_related("pokemon_a", "pokemon_b", "scenario", "winner")
+        per_1k = 1000 / rows * 1000
+        list_s = _best(lambda: BattleListSerializer(list(qs.defer("turn_log", "log_text")), many=True).data,
+                       self.repeat)
+        detail_s = _best(lambda: BattleDetailSerializer(list(qs), many=True).data, self.repeat)
+        return {
+            "serializer.list.ms_per_1k": list_s * per_1k,
+            "serializer.detail.ms_per_1k": detail_s * per_1k,
+        }
+
+    # ---- listado de Pokémon ----
+
+    def _bench_pokemon_list(self, count: int) -> dict:
+        """Latencia de PokemonViewSet.list: en frío (recalcula max_stats) y servida de caché."""
+        Pokemon.objects.bulk_create([
+            Pokemon(name=f"bench-list-{i}", hp=self.rng.randint(20, 250), attack=self.rng.randint(5, 190),
+                    defense=self.rng.randint(5, 230), speed=self.rng.randint(5, 180))
+            for i in range(count)
+        ])
+        view = PokemonViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+
+        def request():
+            resp = view(factory.get("/api/pokemons/", {"page": 1, "page_size": 20}))
+            if resp.status_code != 200 or "max_stats" not in resp.data:
+                raise CommandError(f"Listado de Pokémon inesperado: {resp.status_code}")
+
+        def cold():
+            catalog.bump()
+            request()
+
+        return {
+            "pokemon_list.cold_ms": _best(cold, self.repeat * 5) * 1000,
+            "pokemon_list.cached_ms": _best(request, self.repeat * 5) * 1000,
+        }
+
+    # ---- _emit ----
+
+    def _bench_emit(self, count: int) -> dict:
+        """Eventos por segundo por _emit: publicación inmediata y con buffer (un pipeline)."""
+        payload = {"type": "tick", "status": "RUNNING", "hp_a": 10, "hp_b": 20,
+                   "log_append": turnlog.fmt_turn_obj(Turn(1, True, 17, 10, 20), "Pikachu", "Bulbasaur", 9)}
+        out = {}
+        for label, interval in (("immediate", 0.0), ("buffered", None)):
+            events._emitter = EventEmitter(flush_interval=interval, max_buffer=500, redis=_MemoryRedis())
+
+            def run():
+                for i in range(count):
+                    _emit(1 + i % 50, payload)
+                events._emitter.flush()
+
+            out[f"emit.{label}.events_per_s"] = count / _best(run, self.repeat)
+        return out
+
+    # ---- baseline ----
+
+    def _compare(self, metrics: dict, path: str, tolerance: float):
+        """Falla si alguna métrica empeora más de `tolerance` (tasas: *_per_s; tiempos: *_ms...)."""
+        with open(path, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("metrics", {})
+        regressions = []
+        for name, old in sorted(baseline.items()):
+            new = metrics.get(name)
+            if new is None or not old:
+                continue
+            higher_is_better = name.endswith("_per_s")
+            change = (new - old) / old if higher_is_better else (old - new) / old
+            status = "REGRESIÓN" if change < -tolerance else "ok"
+            self.stdout.write(f"{status:>9}  {name}: {old:.4f} -> {new:.4f} ({change:+.1%})")
+            if status != "ok":
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f"{len(regressions)} métrica(s) empeoran más de {tolerance:.0%}: "
+                               + ", ".join(regressions))
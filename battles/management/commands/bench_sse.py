@@ -0,0 +1,105 @@
+# battles/management/commands/bench_sse.py
+import asyncio
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from battles.events import channel, get_redis
+from battles.sse import BattleHub
+
+
+class _LocalPubSub:
+    """Pub/sub sin red: aísla el coste del reparto en el hub del de Redis."""
+
+    async def subscribe(self, *channels):
+        pass
+
+    async def unsubscribe(self, *channels):
+        pass
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        await asyncio.sleep(timeout or 0)
+        return None
+
+
+class _LocalRedis:
+    def pubsub(self):
+        return _LocalPubSub()
+
+
+class Command(BaseCommand):
+    help = "Benchmark del hub SSE async: espectadores concurrentes por proceso y ritmo de reparto."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--viewers", default="100,1000,10000",
+                            help="Lista de espectadores concurrentes a probar (separados por coma)")
+        parser.add_argument("--battles", type=int, default=1, help="Combates entre los que se reparten")
+        parser.add_argument("--events", type=int, default=50, help="Eventos publicados por combate")
+        parser.add_argument("--redis", action="store_true",
+                            help="Publicar por Redis real (REDIS_URL) en vez del reparto local")
+
+    def handle(self, *args, **opts):
+        results = []
+        for n in (int(v) for v in opts["viewers"].split(",") if v.strip()):
+            res = asyncio.run(self._run(n, opts["battles"], opts["events"], opts["redis"]))
+            results.append(res)
+            self.stdout.write(
+                f"{res['viewers']:>7} espectadores · {res['battles']} combates · "
+                f"suscribir {res['subscribe_s']:.3f}s · {res['kb_per_viewer']:.2f} KB/espectador · "
+                f"{res['deliveries_per_s']:,.0f} entregas/s"
+            )
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def _run(self, viewers: int, battles: int, events: int, use_redis: bool) -> dict:
+        hub = BattleHub(redis=None if use_redis else _LocalRedis(), queue_size=events + 1)
+        chans = [channel(900000 + i) for i in range(battles)]
+        remaining = viewers * events
+        done = asyncio.Event()
+
+        async def viewer(queue):
+            nonlocal remaining
+            for _ in range(events):
+                await queue.get()
+                remaining -= 1
+            if remaining == 0:
+                done.set()
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        tasks = []
+        for i in range(viewers):
+            chan = chans[i % battles]
+            queue = await hub.subscribe(chan)
+            tasks.append((chan, queue, asyncio.create_task(viewer(queue))))
+        subscribe_s = time.perf_counter() - t0
+        mem, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        if use_redis:
+            r = get_redis()
+            payload = json.dumps({"type": "tick", "bench": True})
+            await asyncio.to_thread(lambda: [r.publish(c, payload) for _ in range(events) for c in chans])
+        else:
+            for seq in range(events):
+                for chan in chans:
+                    hub.dispatch(chan, f'0-{seq + 1}\n{{"type":"tick"}}')
+                await asyncio.sleep(0)
+        await asyncio.wait_for(done.wait(), timeout=120)
+        deliver_s = time.perf_counter() - t0
+
+        for chan, queue, task in tasks:
+            await hub.unsubscribe(chan, queue)
+            task.cancel()
+        return {
+            "viewers": viewers,
+            "battles": battles,
+            "events": events,
+            "subscriptions": len(chans),
+            "subscribe_s": subscribe_s,
+            "kb_per_viewer": mem / 1024 / viewers,
+            "deliver_s": deliver_s,
+            "deliveries_per_s": viewers * events / deliver_s if deliver_s else 0.0,
+        }
@@ -0,0 +1,38 @@
+# battles/management/commands/import_catalog.py
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from battles import imports
+
+
+class Command(BaseCommand):
+    help = ("Importa Pokémon o Escenarios desde CSV o NDJSON en streaming "
+            "(upsert por nombre en lotes; ver battles.imports).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(imports.KINDS))
+        parser.add_argument("path", help="Fichero a importar ('-' para stdin)")
+        parser.add_argument("--format", dest="fmt", choices=imports.FORMATS,
+                            help="Por defecto se deduce de la extensión")
+        parser.add_argument("--batch", type=int, help="Filas por lote (por defecto CATALOG_IMPORT_BATCH)")
+
+    def handle(self, *args, kind, path, fmt=None, batch=None, **opts):
+        fmt = fmt or imports.detect_format(path)
+        if fmt is None:
+            raise CommandError("No se puede deducir el formato; usa --format csv|ndjson")
+        t0 = time.perf_counter()
+        if path == "-":
+            result = imports.import_catalog(kind, sys.stdin.buffer, fmt, batch_size=batch)
+        else:
+            try:
+                with open(path, "rb") as fh:
+                    result = imports.import_catalog(kind, fh, fmt, batch_size=batch)
+            except OSError as exc:
+                raise CommandError(f"No se puede leer {path}: {exc}")
+        for err in result.errors:
+            self.stderr.write(f"línea {err['line']}: {err['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} creados · {result.updated} actualizados · {result.invalid} inválidos "
+            f"en {time.perf_counter() - t0:.2f}s"))
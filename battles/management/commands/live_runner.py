@@ -0,0 +1,23 @@
+# battles/management/commands/live_runner.py
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from battles.live import LiveRunner
+
+
+class Command(BaseCommand):
+    help = "Runner asyncio: reproduce en un proceso muchos combates en tiempo real (BATTLE_ENGINE=asyncio)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-battles", type=int, default=None, help="Combates simultáneos máximos")
+        parser.add_argument("--flush-interval", type=float, default=None,
+                            help="Segundos entre escrituras agrupadas a DB/Redis")
+
+    def handle(self, *args, **opts):
+        runner = LiveRunner(max_battles=opts["max_battles"], flush_interval=opts["flush_interval"])
+        self.stdout.write(f"Live runner: hasta {runner.max_battles} combates, flush cada {runner.flush_interval}s")
+        try:
+            asyncio.run(runner.serve())
+        except KeyboardInterrupt:
+            pass
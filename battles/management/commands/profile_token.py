@@ -0,0 +1,14 @@
+# battles/management/commands/profile_token.py
+from django.core.management.base import BaseCommand
+
+from battles.profiling import HEADER, MODES, make_token
+
+
+class Command(BaseCommand):
+    help = "Genera un valor firmado para la cabecera X-Profile (perfilado de una petición)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, default="cprofile")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{HEADER}: {make_token(opts['mode'])}")
@@ -0,0 +1,18 @@
+# battles/management/commands/rebuild_counters.py
+from django.core.management.base import BaseCommand
+
+from battles import counters
+from battles.models import PokemonCounter
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de counters (PokemonCounter) a partir del catálogo actual."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", type=int, action="append", dest="scenarios",
+                            help="Solo este escenario (repetible)")
+
+    def handle(self, *args, **opts):
+        changed = counters.rebuild(scenario_ids=opts["scenarios"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{changed} listas reescritas · {PokemonCounter.objects.count()} counters en el índice"))
@@ -0,0 +1,28 @@
+# battles/management/commands/rebuild_ratings.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from battles import ratings
+from battles.models import Battle, BattleResult, PokemonRating
+
+
+class Command(BaseCommand):
+    help = ("Reconstruye PokemonRating (victorias, derrotas, Elo) reproduciendo en orden el histórico "
+            "de ejecuciones (BattleResult), el mismo que aplica ratings.record al cerrar cada combate.")
+
+    def handle(self, *args, **opts):
+        history = BattleResult.objects.order_by("played_at", "id").values_list("winner_id", "loser_id", "played_at")
+        applied = 0
+        with transaction.atomic():
+            PokemonRating.objects.all().delete()
+            for winner_id, loser_id, when in history.iterator(chunk_size=2000):
+                ratings.record(winner_id, loser_id, when=when)
+                applied += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"{applied} ejecuciones aplicadas · {PokemonRating.objects.count()} Pokémon en el ranking"))
+
+        # combates terminados antes de existir el histórico: no hay forma exacta de reproducirlos
+        legacy = Battle.objects.filter(winner__isnull=False, results__isnull=True).count()
+        if legacy:
+            self.stdout.write(self.style.WARNING(
+                f"{legacy} combates con ganador no tienen ejecuciones en BattleResult y no cuentan en el ranking"))
@@ -0,0 +1,301 @@
+# battles/metrics.py
+"""
+Métricas al estilo Prometheus (contadores, gauges, histogramas) agregadas entre
+procesos a través de Redis.
+
+Cada proceso acumula incrementos en memoria y un hilo en segundo plano los vuelca
+en un pipeline cada METRICS_FLUSH_INTERVAL segundos (HINCRBYFLOAT sobre un hash por
+métrica), así que instrumentar un camino caliente no añade una ida y vuelta a Redis
+por llamada y un proceso inactivo no se queda con lo último sin publicar.
+Los gauges no se suman como deltas: cada proceso publica su valor actual con un
+latido (METRICS_GAUGE_TTL), y los de procesos que dejan de latir no cuentan.
+/metrics lee los hashes y los sirve en el formato de texto de Prometheus.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics:"
+# zset proceso -> último volcado (latido de sus gauges)
+PROCS_KEY = KEY_PREFIX + "procs"
+# segundos; cubre desde un UPDATE en SQLite hasta un combate en tiempo real entero
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_registry: dict[str, "_Metric"] = {}
+_pending: dict[tuple[str, str], float] = {}
+_gauges: dict[tuple[str, str], float] = {}  # valor actual de cada gauge en este proceso
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flusher_pid: int | None = None
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels.items()))
+
+
+def _process_id() -> str:
+    # se calcula cada vez: tras el fork de Celery cambia el pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _enabled() -> bool:
+    return getattr(settings, "METRICS_ENABLED", True)
+
+
+def _add(name: str, field: str, amount: float):
+    if not _enabled():
+        return
+    with _lock:
+        _pending[(name, field)] = _pending.get((name, field), 0.0) + amount
+    _ensure_flusher()
+
+
+def _ensure_flusher():
+    """Arranca (una vez por proceso) el hilo que vuelca cada METRICS_FLUSH_INTERVAL."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        # el intervalo se relee en cada vuelta; se duerme como mucho 1 s para notar cambios
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+        time.sleep(max(0.05, min(interval, 1.0)))
+        if time.monotonic() - _last_flush >= interval:
+            try:
+                flush()
+            except Exception:
+                logger.exception("Métricas: fallo en el volcado periódico")
+
+
+def flush(redis=None):
+    """Vuelca a Redis los incrementos acumulados y los gauges de este proceso (best-effort)."""
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        gauges = dict(_gauges)
+        _last_flush = time.monotonic()
+    if not pending and not gauges:
+        return
+    try:
+        if redis is None:
+            from .events import get_redis
+            redis = get_redis()
+        pipe = redis.pipeline(transaction=False)
+        for (name, field), amount in pending.items():
+            pipe.hincrbyfloat(KEY_PREFIX + name, field, amount)
+        if gauges:
+            proc = _process_id()
+            for (name, field), value in gauges.items():
+                pipe.hset(KEY_PREFIX + name, f"{field}|{proc}", value)
+            pipe.zadd(PROCS_KEY, {proc: time.time()})
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Métricas: no se pudieron volcar a Redis: %s", exc)
+
+
+def _shutdown():
+    """Al salir: último volcado y baja de los gauges de este proceso."""
+    flush()
+    with _lock:
+        gauges = list(_gauges)
+    if not gauges:
+        return
+    try:
+        from .events import get_redis
+        proc = _process_id()
+        pipe = get_redis().pipeline(transaction=False)
+        for name, field in gauges:
+            pipe.hdel(KEY_PREFIX + name, f"{field}|{proc}")
+        pipe.zrem(PROCS_KEY, proc)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Métricas: no se pudieron retirar los gauges del proceso: %s", exc)
+
+
+atexit.register(_shutdown)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        _registry[name] = self
+
+    def render(self, values: dict[str, float]) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{{{labels}}} {_num(value)}" if labels else f"{self.name} {_num(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        _add(self.name, _labels(labels), amount)
+
+
+class Gauge(_Metric):
+    """
+    Valor actual por proceso (p. ej. conexiones abiertas); /metrics suma los de los
+    procesos vivos, así que uno que muere con streams abiertos deja de contar tras el TTL.
+    """
+    kind = "gauge"
+
+    def _move(self, amount: float, labels: dict):
+        if not _enabled():
+            return
+        key = (self.name, _labels(labels))
+        with _lock:
+            _gauges[key] = _gauges.get(key, 0.0) + amount
+        _ensure_flusher()
+
+    def inc(self, amount: float = 1, **labels):
+        self._move(amount, labels)
+
+    def dec(self, amount: float = 1, **labels):
+        self._move(-amount, labels)
+
+    def collect(self, values: dict[str, float], live: set[str]) -> tuple[dict[str, float], list[str]]:
+        """Suma por etiquetas los campos "<labels>|<proceso>" de procesos vivos; devuelve también los muertos."""
+        totals: dict[str, float] = {}
+        stale = []
+        for field, value in values.items():
+            labels, sep, proc = field.rpartition("|")
+            if not sep or proc not in live:
+                stale.append(field)
+                continue
+            totals[labels] = totals.get(labels, 0.0) + value
+        return totals, stale
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        base = _labels(labels)
+        # se guarda el bucket propio; los acumulados se calculan al exponer
+        le = next((b for b in self.buckets if value <= b), "+Inf")
+        _add(self.name, f"{base}|le={le}", 1)
+        _add(self.name, f"{base}|sum", value)
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self, values: dict[str, float]) -> list[str]:
+        series: dict[str, dict[str, float]] = {}
+        for field, value in values.items():
+            base, _, part = field.rpartition("|")
+            series.setdefault(base, {})[part] = value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for base, parts in sorted(series.items()):
+            sep = "," if base else ""
+            cumulative = 0.0
+            for b in (*self.buckets, "+Inf"):
+                cumulative += parts.get(f"le={b}", 0.0)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{b}"}} {_num(cumulative)}')
+            lines.append(f"{self.name}_sum{{{base}}} {_num(parts.get('sum', 0.0))}" if base
+                         else f"{self.name}_sum {_num(parts.get('sum', 0.0))}")
+            lines.append(f"{self.name}_count{{{base}}} {_num(cumulative)}" if base
+                         else f"{self.name}_count {_num(cumulative)}")
+        return lines
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def exposition(redis=None) -> str:
+    """Todas las métricas registradas en formato de texto de Prometheus (0.0.4)."""
+    if redis is None:
+        from .events import get_redis
+        redis = get_redis()
+    flush(redis)
+    cutoff = time.time() - getattr(settings, "METRICS_GAUGE_TTL", 30.0)
+    live = {_text(p) for p in redis.zrangebyscore(PROCS_KEY, cutoff, "+inf")}
+    metrics = list(_registry.values())
+    pipe = redis.pipeline(transaction=False)
+    for metric in metrics:
+        pipe.hgetall(KEY_PREFIX + metric.name)
+    lines, stale = [], []
+    for metric, raw in zip(metrics, pipe.execute()):
+        values = {_text(k): float(v) for k, v in (raw or {}).items()}
+        if isinstance(metric, Gauge):
+            values, dead = metric.collect(values, live)
+            stale.extend((metric.name, field) for field in dead)
+        lines.extend(metric.render(values))
+    if stale:
+        # limpieza best-effort de los gauges de procesos que ya no laten
+        try:
+            cleanup = redis.pipeline(transaction=False)
+            for name, field in stale:
+                cleanup.hdel(KEY_PREFIX + name, field)
+            cleanup.zremrangebyscore(PROCS_KEY, "-inf", cutoff)
+            cleanup.execute()
+        except Exception as exc:
+            logger.warning("Métricas: no se pudieron limpiar gauges caducados: %s", exc)
+    return "\n".join(lines) + "\n"
+
+
+# ------- Métricas de la app -------
+
+DB_WRITE_SECONDS = Histogram(
+    "battle_db_write_seconds", "Latencia de escritura en DB de run_battle (encolado hasta commit), por operación")
+EVENT_PUBLISH_SECONDS = Histogram(
+    "battle_event_publish_seconds", "Latencia de cada pipeline de publicación de eventos en Redis")
+EVENTS_PUBLISHED = Counter("battle_events_published_total", "Eventos de combate publicados")
+BATTLE_DURATION_SECONDS = Histogram("battle_duration_seconds", "Duración de un combate desde que arranca hasta el cierre, por modo")
+QUEUE_WAIT_SECONDS = Histogram("battle_queue_wait_seconds", "Espera en cola desde el encolado (API/cron) hasta que run_battle arranca")
+BATTLES = Counter("battles_total", "Combates procesados por resultado")
+SSE_OPEN_STREAMS = Gauge("sse_open_streams", "Streams SSE abiertos")
+API_REQUEST_SECONDS = Histogram("api_request_seconds", "Latencia de los viewsets de la API por vista, acción y código")
+
+
+class TimedViewMixin:
+    """Mide cada petición del viewset en api_request_seconds."""
+
+    def initial(self, request, *args, **kwargs):
+        self._metrics_t0 = time.perf_counter()
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        t0 = getattr(self, "_metrics_t0", None)
+        if t0 is not None:
+            API_REQUEST_SECONDS.observe(
+                time.perf_counter() - t0,
+                view=type(self).__name__, action=getattr(self, "action", None) or request.method.lower(),
+                status=response.status_code,
+            )
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0004_battle_run_count_cron_battle_run_count_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battle',
+            name='mode',
+            field=models.CharField(choices=[('REALTIME', 'Tiempo real'), ('INSTANT', 'Instantáneo')], default='REALTIME', max_length=10),
+        ),
+    ]
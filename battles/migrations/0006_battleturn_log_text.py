@@ -0,0 +1,36 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0005_battle_mode'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='battle',
+            old_name='log',
+            new_name='log_text',
+        ),
+        migrations.AlterField(
+            model_name='battle',
+            name='log_text',
+            field=models.TextField(blank=True, db_column='log', default=''),
+        ),
+        migrations.CreateModel(
+            name='BattleTurn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('turn', models.PositiveIntegerField(blank=True, null=True)),
+                ('line', models.TextField()),
+                ('battle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='battles.battle')),
+            ],
+            options={
+                'ordering': ('battle', 'seq'),
+                'constraints': [models.UniqueConstraint(fields=('battle', 'seq'), name='battleturn_battle_seq_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0006_battleturn_log_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PokemonRating',
+            fields=[
+                ('pokemon', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='battles.pokemon')),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('battles', models.PositiveIntegerField(default=0)),
+                ('rating', models.FloatField(default=1000.0)),
+                ('last_played_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-rating', 'pokemon_id'),
+                'indexes': [models.Index(fields=['-rating', 'pokemon'], name='rating_leaderboard_idx')],
+            },
+        ),
+    ]
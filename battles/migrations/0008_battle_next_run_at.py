@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+def fill_next_run_at(apps, schema_editor):
+    from battles.models.battle import next_run_for
+
+    Battle = apps.get_model("battles", "Battle")
+    for battle in Battle.objects.filter(scheduled_cron__isnull=False).only("id", "scheduled_cron").iterator():
+        Battle.objects.filter(id=battle.id).update(next_run_at=next_run_for(battle.scheduled_cron))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0007_pokemonrating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battle',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(fill_next_run_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0008_battle_next_run_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='battle',
+            index=models.Index(fields=['-created_at', '-id'], name='battle_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='battle',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='battle_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='battle',
+            index=models.Index(fields=['scheduled_cron', 'status'], name='battle_cron_status_idx'),
+        ),
+    ]
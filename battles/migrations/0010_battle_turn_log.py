@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0009_battle_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battle',
+            name='turn_log',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
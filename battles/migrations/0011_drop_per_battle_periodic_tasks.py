@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:02
+
+from django.db import migrations
+
+
+def drop_battle_periodic_tasks(apps, schema_editor):
+    # los combates con cron los lanza ahora battles.tasks.dispatch_due_battles
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name__startswith="battle-", task="battles.tasks.run_battle").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0010_battle_turn_log'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_battle_periodic_tasks, migrations.RunPython.noop),
+    ]
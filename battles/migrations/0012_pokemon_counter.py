@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0011_drop_per_battle_periodic_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PokemonCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('turns', models.PositiveIntegerField()),
+                ('hp_left', models.PositiveIntegerField()),
+                ('opponent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='battles.pokemon')),
+                ('pokemon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='battles.pokemon')),
+                ('scenario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='battles.scenario')),
+            ],
+            options={
+                'ordering': ('pokemon', 'scenario', 'rank'),
+                'constraints': [models.UniqueConstraint(fields=('pokemon', 'scenario', 'rank'), name='counter_pokemon_scenario_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0012_pokemon_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BattleResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played_at', models.DateTimeField()),
+                ('battle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='battles.battle')),
+                ('loser', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='battles.pokemon')),
+                ('winner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='battles.pokemon')),
+            ],
+            options={
+                'ordering': ('played_at', 'id'),
+                'indexes': [models.Index(fields=['played_at', 'id'], name='battleresult_replay_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:30
+
+from django.db import migrations
+
+
+def recompute_next_run_at(apps, schema_editor):
+    # los next_run_at guardados se calcularon en UTC: se recalculan en la hora local
+    from battles.models.battle import next_run_for
+    Battle = apps.get_model("battles", "Battle")
+    for battle_id, cron in (Battle.objects.filter(scheduled_cron__isnull=False)
+                            .values_list("id", "scheduled_cron").iterator(chunk_size=2000)):
+        Battle.objects.filter(id=battle_id).update(next_run_at=next_run_for(cron))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battles', '0013_battle_result'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_next_run_at, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from .pokemon import Pokemon
 from .scenario import Scenario
 from .battle import Battle
+from .turn import BattleTurn
+from .rating import BattleResult, PokemonRating
+from .counter import PokemonCounter
 
-__all__ = ["Pokemon", "Scenario", "Battle"]
+__all__ = ["Pokemon", "Scenario", "Battle", "BattleTurn", "PokemonRating", "BattleResult", "PokemonCounter"]
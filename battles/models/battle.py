@@ -10,6 +10,9 @@ class Battle(models.Model):
         FINISHED  = "FINISHED",  "Finalizado"
         FAILED    = "FAILED",    "Fallido"
 
+    class Mode(models.TextChoices):
+        REALTIME = "REALTIME", "Tiempo real"
+        INSTANT  = "INSTANT",  "Instantáneo"  # fast-forward: sin ritmo por turno
 
     # Nota: usamos strings para evitar import circular entre módulos
     name = models.CharField(max_length=100, unique=True, null=True, blank=True)
@@ -18,9 +21,14 @@ class Battle(models.Model):
     scenario  = models.ForeignKey("Scenario", on_delete=models.PROTECT)
 
     scheduled_cron = models.CharField(max_length=64, blank=True, null=True)
+    next_run_at    = models.DateTimeField(null=True, blank=True, db_index=True)  # derivado de scheduled_cron
     status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDING)
+    mode   = models.CharField(max_length=10, choices=Mode.choices, default=Mode.REALTIME)  # modo por defecto (p. ej. cron)
     winner = models.ForeignKey("Pokemon", on_delete=models.SET_NULL, null=True, blank=True, related_name="wins")
-    log    = models.TextField(blank=True, default="")
+    # Texto fijo (errores / logs antiguos); las líneas por turno viven en BattleTurn
+    log_text = models.TextField(db_column="log", blank=True, default="")
+    # Turnos de la última ejecución terminada, en binario comprimido (ver battles.turnlog)
+    turn_log = models.BinaryField(null=True, blank=True, editable=False)
     state  = models.JSONField(default=dict, blank=True)  # hp_a / hp_b en vivo
 
     run_count_total = models.PositiveIntegerField(default=0) # Manual y por cron
@@ -33,23 +41,81 @@ class Battle(models.Model):
         return f"Battle #{self.id} ({self.pokemon_a} vs {self.pokemon_b})"
 
     @property
-    def next_run_at(self) -> datetime | None:
+    def log(self) -> str:
+        """Log completo, pintado bajo demanda desde turn_log (o desde BattleTurn si está en curso)."""
+        if self.turn_log:
+            from ..turnlog import render
+            lines = render(self)
+        else:
+            lines = list(self.turns.values_list("line", flat=True)) if self.pk else []
+        if self.log_text:
+            lines.append(self.log_text)
+        return "\n".join(lines)
+
+    def log_since(self, since: int) -> tuple[list[str], int]:
+        """
+        Líneas del log posteriores al turno `since` y el último turno visto (o `since` si
+        no hay nuevos). Con since=0 incluye la cabecera; al terminar, el cierre, que solo
+        se repite mientras queden turnos por ver (un sondeo ya al día recibe []).
+        """
+        if self.turn_log:
+            from ..turnlog import render_since
+            lines, last = render_since(self, since)
+        else:
+            # en curso: las filas de cabecera no llevan turno y solo van con since=0
+            qs = self.turns.all() if since <= 0 else self.turns.filter(turn__gt=since)
+            rows = list(qs.values_list("turn", "line")) if self.pk else []
+            lines = [line for _, line in rows]
+            last = max((t for t, _ in rows if t is not None), default=max(since, 0))
+        if self.log_text and (since <= 0 or since < last):
+            lines.append(self.log_text)
+        return lines, last
+
+    def save(self, *args, **kwargs):
+        # next_run_at se recalcula siempre que se guarda el cron
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            # auto_now solo se guarda si está en update_fields; updated_at hace de versión (ETag)
+            update_fields = kwargs["update_fields"] = {*update_fields, "updated_at"}
+        if update_fields is None or "scheduled_cron" in update_fields:
+            self.next_run_at = self.compute_next_run()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "next_run_at"}
+        super().save(*args, **kwargs)
+
+    def compute_next_run(self, base: datetime | None = None) -> datetime | None:
         """Próxima ejecución según scheduled_cron, o None si no aplica / inválido."""
-        if not self.scheduled_cron:
-            return None
-        # Import perezoso para no tumbar el arranque si falta la lib
-        try:
-            from croniter import croniter
-        except Exception:
-            return None
-        try:
-            base = timezone.now()
-            nxt = croniter(self.scheduled_cron, base).get_next(datetime)
-            if timezone.is_naive(nxt):
-                nxt = timezone.make_aware(nxt)
-            return timezone.localtime(nxt)
-        except Exception:
-            return None
+        return next_run_for(self.scheduled_cron, base)
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="battle_created_idx"),
+            # listado filtrado por estado (?status=...)
+            models.Index(fields=["status", "-created_at", "-id"], name="battle_status_created_idx"),
+            # rama SCHEDULED: scheduled_cron no nulo y estado distinto de RUNNING
+            models.Index(fields=["scheduled_cron", "status"], name="battle_cron_status_idx"),
+        ]
+
+
+def next_run_for(cron_expr: str | None, base: datetime | None = None) -> datetime | None:
+    """
+    Próximo datetime (aware) para una expresión CRON de 5 campos; None si no aplica / inválida.
+    Los campos se leen en la hora local (TIME_ZONE), como hacía el CrontabSchedule de beat.
+    """
+    if not cron_expr:
+        return None
+    # Import perezoso para no tumbar el arranque si falta la lib
+    try:
+        from croniter import croniter
+    except Exception:
+        return None
+    try:
+        # croniter evalúa en la zona del datetime base: en UTC "0 9 * * *" saldría 5 h antes en Bogotá
+        base = timezone.localtime(base or timezone.now())
+        nxt = croniter(cron_expr, base).get_next(datetime)
+        if timezone.is_naive(nxt):
+            nxt = timezone.make_aware(nxt)
+        return timezone.localtime(nxt)
+    except Exception:
+        return None
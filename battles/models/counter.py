@@ -0,0 +1,23 @@
+from django.db import models
+
+class PokemonCounter(models.Model):
+    """
+    Índice de counters: los K rivales que ganan más rápido a `pokemon` en `scenario`
+    (ver battles.counters). Se mantiene por filas al cambiar Pokémon o Escenarios.
+    """
+    pokemon  = models.ForeignKey("Pokemon", on_delete=models.CASCADE, related_name="counters")
+    scenario = models.ForeignKey("Scenario", on_delete=models.CASCADE, related_name="+")
+    rank     = models.PositiveSmallIntegerField()  # 0 = el que gana en menos turnos
+    opponent = models.ForeignKey("Pokemon", on_delete=models.CASCADE, related_name="+")
+    turns    = models.PositiveIntegerField()
+    hp_left  = models.PositiveIntegerField()  # hp del rival al terminar
+
+    def __str__(self) -> str:
+        return f"{self.opponent_id} > {self.pokemon_id} @ {self.scenario_id} (#{self.rank})"
+
+    class Meta:
+        ordering = ("pokemon", "scenario", "rank")
+        constraints = [
+            # también es el índice de la consulta (pokemon, scenario) ordenada por rank
+            models.UniqueConstraint(fields=["pokemon", "scenario", "rank"], name="counter_pokemon_scenario_rank_uniq"),
+        ]
@@ -0,0 +1,39 @@
+from django.db import models
+
+class PokemonRating(models.Model):
+    """Agregado por Pokémon que se actualiza al terminar cada combate (leaderboard)."""
+    pokemon = models.OneToOneField("Pokemon", on_delete=models.CASCADE, primary_key=True, related_name="rating")
+    wins    = models.PositiveIntegerField(default=0)
+    losses  = models.PositiveIntegerField(default=0)
+    battles = models.PositiveIntegerField(default=0)
+    rating  = models.FloatField(default=1000.0)  # Elo
+    last_played_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.pokemon_id}: {self.rating:.0f}"
+
+    class Meta:
+        ordering = ("-rating", "pokemon_id")
+        indexes = [
+            models.Index(fields=["-rating", "pokemon"], name="rating_leaderboard_idx"),
+        ]
+
+
+class BattleResult(models.Model):
+    """
+    Una fila por ejecución terminada (cada run de un combate, con su ganador).
+    Es el histórico que reproduce manage.py rebuild_ratings; Battle solo guarda el último ganador.
+    """
+    battle    = models.ForeignKey("Battle", on_delete=models.SET_NULL, null=True, blank=True, related_name="results")
+    winner    = models.ForeignKey("Pokemon", on_delete=models.CASCADE, related_name="+")
+    loser     = models.ForeignKey("Pokemon", on_delete=models.CASCADE, related_name="+")
+    played_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.winner_id} > {self.loser_id} @ {self.played_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ("played_at", "id")
+        indexes = [
+            models.Index(fields=["played_at", "id"], name="battleresult_replay_idx"),
+        ]
@@ -0,0 +1,17 @@
+from django.db import models
+
+class BattleTurn(models.Model):
+    """Línea del log de un combate; solo se inserta (append-only), nunca se reescribe."""
+    battle = models.ForeignKey("Battle", on_delete=models.CASCADE, related_name="turns")
+    seq    = models.PositiveIntegerField()                      # orden dentro de la ejecución
+    turn   = models.PositiveIntegerField(null=True, blank=True)  # None para cabecera / cierre
+    line   = models.TextField()
+
+    def __str__(self) -> str:
+        return f"Battle #{self.battle_id} · {self.seq}"
+
+    class Meta:
+        ordering = ("battle", "seq")
+        constraints = [
+            models.UniqueConstraint(fields=["battle", "seq"], name="battleturn_battle_seq_uniq"),
+        ]
@@ -0,0 +1,167 @@
+# battles/montecarlo.py
+"""
+Monte Carlo vectorizado de un emparejamiento con el modelo estocástico del motor
+(engine.stochastic_sequence): N combates independientes como filas de arrays de NumPy
+que avanzan a la vez.
+
+En lugar de un paso de Python por turno, cada iteración juega un bloque de rondas:
+tira el daño de todos los golpes del bloque, acumula con cumsum y localiza el primer
+golpe que deja a cada rival a 0. Las filas resueltas salen del conjunto activo; el
+resto sigue con el bloque siguiente. El tamaño del bloque se estima a partir del
+daño medio (casi todas las filas terminan en el primero) y las filas se procesan por
+trozos para acotar la memoria a unas MAX_CELLS celdas por array.
+"""
+import math
+
+import numpy as np
+
+from .engine import DAMAGE_ROLL_MIN, MAX_TURNS, Fighter, Outcome, resolve
+
+MAX_CELLS = 1 << 22
+# z de un intervalo de confianza del 95%
+Z_95 = 1.959963984540054
+
+
+def _expected_rounds(a: Fighter, b: Fighter, roll_min: float) -> int:
+    mean_roll = (1.0 + roll_min) / 2
+    hits_a = math.ceil(b.hp / max(1.0, (a.atk - b.deff) * mean_roll))
+    hits_b = math.ceil(a.hp / max(1.0, (b.atk - a.deff) * mean_roll))
+    return min(hits_a, hits_b)
+
+
+def _rolls(rng, base: float, roll_min: float, shape) -> np.ndarray:
+    """Daño de cada golpe: max(1, round(base * U[roll_min, 1])); float32 basta para la tirada."""
+    rolls = rng.random(shape, dtype=np.float32)
+    rolls *= np.float32(base * (1.0 - roll_min))
+    rolls += np.float32(base * roll_min)
+    # np.rint redondea al par igual que round() de Python
+    return np.maximum(1, np.rint(rolls)).astype(np.int32)
+
+
+def _constant_damage(base: float, roll_min: float) -> bool:
+    # el redondeo es monótono: si los extremos coinciden, todas las tiradas dan lo mismo
+    return max(1, round(base * roll_min)) == max(1, round(base))
+
+
+def _play(rng, a: Fighter, b: Fighter, a_first: np.ndarray, roll_min: float, cap: int, block: int):
+    """Juega las filas de `a_first` hasta KO o hasta `cap` turnos; devuelve (turns, hp_a, hp_b)."""
+    m = len(a_first)
+    base_a, base_b = a.atk - b.deff, b.atk - a.deff
+    hp_a = np.full(m, a.hp, dtype=np.int64)
+    hp_b = np.full(m, b.hp, dtype=np.int64)
+    turns = np.full(m, cap, dtype=np.int64)  # las que llegan al tope se quedan en cap
+    active = np.arange(m) if a.hp > 0 and b.hp > 0 else np.arange(0)
+    if not len(active):
+        turns[:] = 0
+    done_rounds = 0
+    while len(active) and 2 * done_rounds < cap:
+        k = len(active)
+        ks = np.arange(block)
+        first_turn = 2 * (done_rounds + ks) + 1
+        af = a_first[active, None]
+        # número de turno de cada golpe del bloque, según quién abre el combate
+        turn_a = np.where(af, first_turn, first_turn + 1)
+        turn_b = np.where(af, first_turn + 1, first_turn)
+        dmg_a = _rolls(rng, base_a, roll_min, (k, block))
+        dmg_b = _rolls(rng, base_b, roll_min, (k, block))
+        dmg_a[turn_a > cap] = 0
+        dmg_b[turn_b > cap] = 0
+        ha, hb = hp_a[active], hp_b[active]
+        ko_a = np.cumsum(dmg_a, axis=1) >= hb[:, None]   # golpes de A que dejan a B a 0
+        ko_b = np.cumsum(dmg_b, axis=1) >= ha[:, None]
+        rows = np.arange(k)
+        t_a = np.where(ko_a.any(axis=1), turn_a[rows, ko_a.argmax(axis=1)], cap + 1)
+        t_b = np.where(ko_b.any(axis=1), turn_b[rows, ko_b.argmax(axis=1)], cap + 1)
+        end = np.minimum(t_a, t_b)  # cap + 1 si nadie cae en este bloque
+        # solo cuentan los golpes anteriores (o iguales) al turno del KO
+        hp_a[active] = np.maximum(0, ha - (dmg_b * (turn_b <= end[:, None])).sum(axis=1))
+        hp_b[active] = np.maximum(0, hb - (dmg_a * (turn_a <= end[:, None])).sum(axis=1))
+        finished = end <= cap
+        turns[active[finished]] = end[finished]
+        active = active[~finished]
+        done_rounds += block
+    return turns, hp_a, hp_b
+
+
+def simulate(a: Fighter, b: Fighter, n: int, seed: int | None = None,
+             roll_min: float = DAMAGE_ROLL_MIN, max_turns: int = MAX_TURNS) -> dict[str, np.ndarray]:
+    """N combates A contra B: arrays (N,) de a_wins, turns, hp_a y hp_b."""
+    rng = np.random.default_rng(seed)
+    if a.spd == b.spd:
+        a_first = rng.random(n) < 0.5
+    else:
+        a_first = np.full(n, a.spd > b.spd)
+    cap = max_turns - 1
+    if _constant_damage(a.atk - b.deff, roll_min) and _constant_damage(b.atk - a.deff, roll_min):
+        # sin varianza de daño solo importa quién abre: dos resultados analíticos
+        return _by_opener(a, b, a_first, max_turns)
+    block = max(4, min(math.ceil((_expected_rounds(a, b, roll_min) + 2) * 1.1), cap // 2 + 1))
+    rows_per_chunk = max(1, MAX_CELLS // block)
+    parts = [_play(rng, a, b, a_first[i:i + rows_per_chunk], roll_min, cap, block)
+             for i in range(0, n, rows_per_chunk)]
+    turns, hp_a, hp_b = (np.concatenate(p) for p in zip(*parts)) if parts else (np.zeros(0, np.int64),) * 3
+    return {"a_wins": hp_a > 0, "turns": turns, "hp_a": hp_a, "hp_b": hp_b}
+
+
+def _by_opener(a: Fighter, b: Fighter, a_first: np.ndarray, max_turns: int) -> dict[str, np.ndarray]:
+    """Resultado de engine.resolve para las filas donde abre A y (intercambiando lados) donde abre B."""
+    # solo hay filas que abre A si a.spd >= b.spd (y al revés), justo cuando resolve las hace abrir
+    a_open = resolve(a, b, max_turns)
+    b_open = _swapped(resolve(b, a, max_turns))
+    turns = np.where(a_first, a_open.turns, b_open.turns).astype(np.int64)
+    hp_a = np.where(a_first, a_open.hp_a, b_open.hp_a).astype(np.int64)
+    hp_b = np.where(a_first, a_open.hp_b, b_open.hp_b).astype(np.int64)
+    return {"a_wins": hp_a > 0, "turns": turns, "hp_a": hp_a, "hp_b": hp_b}
+
+
+def _swapped(o: Outcome) -> Outcome:
+    return Outcome(a_wins=o.hp_b > 0, turns=o.turns, hp_a=o.hp_b, hp_b=o.hp_a)
+
+
+def wilson_interval(successes: int, n: int, z: float = Z_95) -> tuple[float, float]:
+    """Intervalo de Wilson para una proporción (bien definido también con p = 0 o 1)."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def summarize(result: dict[str, np.ndarray], max_bins: int = 100) -> dict:
+    """Probabilidad de victoria de A, distribución de turnos e intervalos de confianza al 95%."""
+    a_wins, turns = result["a_wins"], result["turns"]
+    n = len(turns)
+    wins = int(a_wins.sum())
+    low, high = wilson_interval(wins, n)
+    mean = float(turns.mean()) if n else 0.0
+    std = float(turns.std(ddof=1)) if n > 1 else 0.0
+    half = Z_95 * std / math.sqrt(n) if n else 0.0
+
+    values, counts = np.unique(turns, return_counts=True)
+    if len(values) > max_bins:
+        counts, edges = np.histogram(turns, bins=max_bins)
+        histogram = [{"from": int(math.ceil(lo)), "to": int(hi), "count": int(c)}
+                     for lo, hi, c in zip(edges[:-1], edges[1:], counts) if c]
+    else:
+        histogram = [{"turns": int(v), "count": int(c)} for v, c in zip(values, counts)]
+    pct = np.percentile(turns, [5, 25, 50, 75, 95]) if n else [0.0] * 5
+    return {
+        "simulations": n,
+        "a_wins": wins,
+        "b_wins": n - wins,
+        "a_win_probability": round(wins / n, 6) if n else None,
+        "a_win_ci95": [round(low, 6), round(high, 6)],
+        "turns": {
+            "mean": round(mean, 4),
+            "std": round(std, 4),
+            "mean_ci95": [round(mean - half, 4), round(mean + half, 4)],
+            "percentiles": {f"p{q}": float(v) for q, v in zip((5, 25, 50, 75, 95), pct)},
+            "histogram": histogram,
+        },
+        "avg_hp_left": {
+            "a": round(float(result["hp_a"][a_wins].mean()), 2) if wins else None,
+            "b": round(float(result["hp_b"][~a_wins].mean()), 2) if wins < n else None,
+        },
+    }
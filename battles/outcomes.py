@@ -0,0 +1,235 @@
+# battles/outcomes.py
+"""
+Memoización de resultados de combate por huella del emparejamiento
+(stats de A, stats de B, modificadores del escenario).
+
+Dos niveles: LRU en memoria del proceso y Redis compartido. Cada entrada se
+indexa por los ids de Pokémon/Escenario que la produjeron para invalidarla
+cuando esas filas se guardan o borran (ver battles.signals).
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from . import engine
+from .events import get_redis
+
+logger = logging.getLogger(__name__)
+
+_STATS_KEY = "outcome:stats"
+
+
+@dataclass(frozen=True)
+class Memo:
+    outcome: engine.Outcome
+    turns: tuple[engine.Turn, ...]
+
+    def dumps(self) -> str:
+        o = self.outcome
+        return json.dumps({
+            "o": [o.a_wins, o.turns, o.hp_a, o.hp_b],
+            "t": [[t.n, int(t.a_attacks), t.damage, t.hp_a, t.hp_b] for t in self.turns],
+        }, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw) -> "Memo":
+        data = json.loads(raw)
+        a_wins, turns, hp_a, hp_b = data["o"]
+        return cls(
+            outcome=engine.Outcome(a_wins=bool(a_wins), turns=turns, hp_a=hp_a, hp_b=hp_b),
+            turns=tuple(engine.Turn(n, bool(a), d, ha, hb) for n, a, d, ha, hb in data["t"]),
+        )
+
+
+def fingerprint(a, b, scenario) -> str:
+    """Huella estable del emparejamiento; no incluye nombres ni ids."""
+    key = (
+        (a.hp, a.attack, a.defense, a.speed),
+        (b.hp, b.attack, b.defense, b.speed),
+        (scenario.attack_modifier, scenario.defense_modifier, scenario.speed_modifier),
+    )
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def _entry_key(fp: str) -> str:
+    return f"outcome:fp:{fp}"
+
+
+def _tag_key(kind: str, obj_id: int) -> str:
+    return f"outcome:idx:{kind}:{obj_id}"
+
+
+class OutcomeCache:
+    def __init__(self, max_entries: int = 1024, ttl: int = 24 * 3600, redis=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._redis = redis
+        self._local: OrderedDict[str, Memo] = OrderedDict()
+        self._tags: dict[tuple[str, int], set[str]] = {}
+        self._fp_tags: dict[str, list[tuple[str, int]]] = {}  # inverso de _tags, para podarlo
+        self._lock = threading.Lock()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+        self._pending = {k: 0 for k in self.stats}  # deltas aún no sumados en Redis
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def _remember(self, fp: str, memo: Memo, tags: list[tuple[str, int]]):
+        with self._lock:
+            self._local[fp] = memo
+            self._local.move_to_end(fp)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(fp)
+            self._fp_tags[fp] = tags
+            while len(self._local) > self.max_entries:
+                self._forget(next(iter(self._local)))
+
+    def _forget(self, fp: str):
+        """Saca `fp` del LRU y de los índices por tag (con el lock tomado)."""
+        self._local.pop(fp, None)
+        for tag in self._fp_tags.pop(fp, ()):
+            fps = self._tags.get(tag)
+            if fps is not None:
+                fps.discard(fp)
+                if not fps:
+                    del self._tags[tag]
+
+    def _count(self, field: str, sync_every: int = 100):
+        with self._lock:
+            self.stats[field] += 1
+            self._pending[field] += 1
+            due = sum(self._pending.values()) >= sync_every
+        if due:
+            self._sync()
+
+    def _sync(self, pipe=None):
+        """Vuelca a Redis los contadores acumulados (en el pipeline dado o en uno propio)."""
+        with self._lock:
+            pending, self._pending = self._pending, {k: 0 for k in self.stats}
+        try:
+            own = pipe is None
+            pipe = self.redis.pipeline(transaction=False) if own else pipe
+            for field, delta in pending.items():
+                if delta:
+                    pipe.hincrby(_STATS_KEY, field, delta)
+            if own:
+                pipe.execute()
+        except Exception as exc:
+            logger.warning("Outcome cache: no se pudieron sincronizar contadores: %s", exc)
+
+    def get_or_compute(self, a, b, scenario) -> Memo:
+        fp = fingerprint(a, b, scenario)
+        tags = [("pokemon", a.id), ("pokemon", b.id), ("scenario", scenario.id)]
+        with self._lock:
+            memo = self._local.get(fp)
+            if memo is not None:
+                self._local.move_to_end(fp)
+        if memo is not None:
+            self._count("local_hits")
+            return memo
+
+        # La capa Redis es best-effort: si falla, se calcula igual
+        try:
+            raw = self.redis.get(_entry_key(fp))
+        except Exception as exc:
+            logger.warning("Outcome cache: Redis no disponible: %s", exc)
+            raw = None
+        if raw is not None:
+            memo = Memo.loads(raw)
+            self._remember(fp, memo, tags)
+            self._count("redis_hits", sync_every=1)
+            return memo
+
+        fa, fb = engine.fighter(a, scenario), engine.fighter(b, scenario)
+        memo = Memo(outcome=engine.resolve(fa, fb), turns=tuple(engine.turn_sequence(fa, fb)))
+        self._remember(fp, memo, tags)
+        self._count("misses", sync_every=10**9)  # se sincroniza en el pipeline de abajo
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(_entry_key(fp), memo.dumps(), ex=self.ttl)
+            for kind, obj_id in tags:
+                pipe.sadd(_tag_key(kind, obj_id), fp)
+                pipe.expire(_tag_key(kind, obj_id), self.ttl)
+            self._sync(pipe)
+            pipe.execute()
+        except Exception as exc:
+            logger.warning("Outcome cache: no se pudo guardar en Redis: %s", exc)
+        return memo
+
+    def invalidate(self, kind: str, obj_id: int):
+        """Descarta las entradas producidas por ese Pokémon/Escenario (local y Redis)."""
+        self.invalidate_many(kind, [obj_id])
+
+    def invalidate_many(self, kind: str, obj_ids):
+        """Como invalidate() para muchos ids, con dos pipelines en total (importación masiva)."""
+        obj_ids = list(obj_ids)
+        if not obj_ids:
+            return
+        with self._lock:
+            for obj_id in obj_ids:
+                for fp in list(self._tags.get((kind, obj_id), ())):
+                    self._forget(fp)
+        try:
+            r = self.redis
+            tags = [_tag_key(kind, obj_id) for obj_id in obj_ids]
+            pipe = r.pipeline(transaction=False)
+            for tag in tags:
+                pipe.smembers(tag)
+            members = pipe.execute()
+            pipe = r.pipeline(transaction=False)
+            for tag, fps in zip(tags, members):
+                for fp in fps or ():
+                    pipe.delete(_entry_key(fp.decode() if isinstance(fp, bytes) else fp))
+                pipe.delete(tag)
+            pipe.execute()
+        except Exception as exc:
+            logger.warning("Outcome cache: no se pudo invalidar en Redis: %s", exc)
+
+    def shared_stats(self) -> dict:
+        """Contadores agregados de todos los procesos (Redis) + los de este proceso."""
+        try:
+            raw = self.redis.hgetall(_STATS_KEY)
+            shared = {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()}
+        except Exception:
+            shared = None
+        return {"process": dict(self.stats, entries=len(self._local)), "shared": shared}
+
+
+_cache: OutcomeCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> OutcomeCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OutcomeCache(
+                    max_entries=getattr(settings, "BATTLE_OUTCOME_CACHE_SIZE", 1024),
+                    ttl=getattr(settings, "BATTLE_OUTCOME_CACHE_TTL", 24 * 3600),
+                )
+    return _cache
+
+
+def simulate(a, b, scenario, seed: int | None = None) -> Memo:
+    """
+    Punto de entrada del motor para run_battle: pasa por la caché si está activa.
+    Con `seed` juega el modelo estocástico (reproducible con esa semilla) y no se cachea.
+    """
+    if seed is not None:
+        fa, fb = engine.fighter(a, scenario), engine.fighter(b, scenario)
+        turns = tuple(engine.stochastic_sequence(fa, fb, random.Random(seed)))
+        hp_a, hp_b = (turns[-1].hp_a, turns[-1].hp_b) if turns else (fa.hp, fb.hp)
+        return Memo(outcome=engine.Outcome(a_wins=hp_a > 0, turns=len(turns), hp_a=hp_a, hp_b=hp_b),
+                    turns=turns)
+    if not getattr(settings, "BATTLE_OUTCOME_CACHE", True):
+        fa, fb = engine.fighter(a, scenario), engine.fighter(b, scenario)
+        return Memo(outcome=engine.resolve(fa, fb), turns=tuple(engine.turn_sequence(fa, fb)))
+    return get_cache().get_or_compute(a, b, scenario)
@@ -1,7 +1,18 @@
 # backend/battles/pagination.py (nuevo)
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 class DefaultPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class BattleCursorPagination(CursorPagination):
+    """
+    Keyset sobre (created_at, id): sin COUNT(*) y coste constante en páginas profundas.
+    El id desempata los combates creados en el mismo instante (el cursor exige orden único).
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
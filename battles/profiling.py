@@ -0,0 +1,286 @@
+# battles/profiling.py
+"""
+Perfilado opcional por petición (middleware) y por ejecución de run_battle (señales de Celery).
+
+Se activa con PROFILING ("sql" o "cprofile") para todas las peticiones, o por petición
+con la cabecera X-Profile firmada (ver make_token / manage.py profile_token). Registra
+número y tiempo de consultas SQL, tiempo de serializers y, en modo "cprofile", un perfil
+completo que se guarda en PROFILING_DIR (se conservan los PROFILING_KEEP más recientes).
+El resumen vuelve en la cabecera Server-Timing.
+
+Las consultas se cuentan en las conexiones del hilo que atiende la petición o el task;
+con BATTLE_DB_WRITER="batched" las escrituras de run_battle ocurren en el hilo escritor.
+
+cProfile admite un solo perfil activo por proceso (en 3.12 el segundo enable() falla):
+las sesiones "cprofile" se turnan con un lock y, si está ocupado, la sesión baja a "sql".
+"""
+import cProfile
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sql", "cprofile")
+HEADER = "X-Profile"
+_SALT = "battles.profiling"
+
+_current: contextvars.ContextVar["Session | None"] = contextvars.ContextVar("battles_profile", default=None)
+# un solo cProfile activo por proceso (hilos de runserver, worker --pool=threads, executor async)
+_cprofile_lock = threading.Lock()
+
+
+def make_token(mode: str = "cprofile") -> str:
+    """Valor firmado para la cabecera X-Profile (caduca a los PROFILING_TOKEN_MAX_AGE segundos)."""
+    if mode not in MODES:
+        raise ValueError(f"Modo de perfilado inválido: {mode}")
+    return signing.TimestampSigner(salt=_SALT).sign(mode)
+
+
+def mode_from_token(token: str) -> str | None:
+    try:
+        mode = signing.TimestampSigner(salt=_SALT).unsign(
+            token, max_age=getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600))
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+@contextmanager
+def section(name: str):
+    """Suma el tiempo del bloque a `name` si hay un perfilado activo (si no, no cuesta nada)."""
+    session = _current.get()
+    if session is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.sections[name] += time.perf_counter() - t0
+
+
+class Session:
+    def __init__(self, mode: str, label: str):
+        self.mode = mode
+        self.label = label
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.total_seconds = 0.0
+        self.sections: dict[str, float] = defaultdict(float)
+        self.profiler: cProfile.Profile | None = None
+        self.dump_path: Path | None = None
+        self._stack: ExitStack | None = None
+        self._token = None
+        self._t0 = 0.0
+        self._started = False
+
+    def _execute(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - t0
+
+    def _enable_profiler(self):
+        """cProfile si queda libre; si otra sesión (u otra herramienta) lo tiene, modo "sql"."""
+        if self.mode != "cprofile":
+            return
+        if _cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as exc:
+                # otro perfilador ajeno ya está activo (3.12+)
+                _cprofile_lock.release()
+                logger.info("Perfilado: cProfile no disponible (%s); %s en modo sql", exc, self.label)
+            else:
+                self.profiler = profiler
+                return
+        else:
+            logger.info("Perfilado: cProfile ocupado; %s en modo sql", self.label)
+        self.mode = "sql"
+
+    def _disable_profiler(self):
+        if self.profiler is not None:
+            try:
+                self.profiler.disable()
+            finally:
+                _cprofile_lock.release()
+
+    def start(self):
+        """Instala los contadores y el perfil; si algo falla, deshace lo hecho y relanza."""
+        self._enable_profiler()
+        stack = ExitStack()
+        try:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(self._execute))
+            self._token = _current.set(self)
+        except BaseException:
+            stack.close()
+            self._disable_profiler()
+            self.profiler = None
+            raise
+        self._stack = stack
+        self._t0 = time.perf_counter()
+        self._started = True
+
+    def stop(self):
+        """Cierra la sesión; no hace nada si start() no llegó a completarse."""
+        if not self._started:
+            return
+        self._started = False
+        self.total_seconds = time.perf_counter() - self._t0
+        try:
+            self._disable_profiler()
+        finally:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # start() corrió en otro contexto (vía sync_to_async en el middleware async)
+                _current.set(None)
+            self._stack.close()
+        if self.profiler is not None:
+            self.dump_path = _dump(self.profiler, self.label)
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        parts += [f"{name};dur={secs * 1000:.2f}" for name, secs in sorted(self.sections.items())]
+        parts.append(f"total;dur={self.total_seconds * 1000:.2f}")
+        return ", ".join(parts)
+
+    def summary(self) -> dict:
+        return {
+            "label": self.label,
+            "queries": self.queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "total_ms": round(self.total_seconds * 1000, 2),
+            **{f"{name}_ms": round(secs * 1000, 2) for name, secs in self.sections.items()},
+            "profile": str(self.dump_path) if self.dump_path else None,
+        }
+
+
+def _dump(profiler: cProfile.Profile, label: str) -> Path | None:
+    """Guarda el perfil (.prof, legible con pstats/snakeviz) y rota el directorio."""
+    directory = Path(getattr(settings, "PROFILING_DIR", Path(settings.BASE_DIR) / "profiles"))
+    keep = getattr(settings, "PROFILING_KEEP", 50)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "profile"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}.prof"
+        profiler.dump_stats(path)
+        old = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)[keep:]
+        for stale in old:
+            stale.unlink(missing_ok=True)
+        return path
+    except OSError as exc:
+        logger.warning("Perfilado: no se pudo guardar el perfil: %s", exc)
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Sin coste si no está activo: solo mira PROFILING y la cabecera X-Profile.
+    Es síncrono y asíncrono a la vez: bajo ASGI no obliga a Django a adaptar la cadena
+    (ni el SSE async ni la exportación pasan por sync_to_async por su culpa).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _mode(request) -> str | None:
+        mode = getattr(settings, "PROFILING", "") or None
+        token = request.headers.get(HEADER)
+        if token:
+            mode = mode_from_token(token) or mode
+        return mode if mode in MODES else None
+
+    @staticmethod
+    def _annotate(response, session: Session):
+        response["Server-Timing"] = session.server_timing()
+        if session.dump_path is not None:
+            response["X-Profile-File"] = session.dump_path.name
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = self._mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        session = Session(mode, f"{request.method} {request.path}")
+        try:
+            session.start()
+            response = self.get_response(request)
+        finally:
+            session.stop()
+        return self._annotate(response, session)
+
+    async def __acall__(self, request):
+        mode = self._mode(request)
+        if mode is None:
+            return await self.get_response(request)
+
+        # el ORM de las vistas síncronas corre en el hilo thread_sensitive: los wrappers de
+        # conexión y cProfile se instalan ahí (las vistas async solo cuentan su parte síncrona)
+        session = Session(mode, f"{request.method} {request.path}")
+        try:
+            await sync_to_async(session.start)()
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(session.stop)()
+        return self._annotate(response, session)
+
+
+# ------- run_battle (señales de Celery) -------
+
+_task_sessions: dict[str, Session] = {}
+
+
+def _task_prerun(sender=None, task_id=None, task=None, args=None, **kwargs):
+    mode = getattr(settings, "PROFILING_TASKS", "") or None
+    if mode not in MODES or getattr(task, "name", "") != "battles.tasks.run_battle":
+        return
+    battle_id = (args or [None])[0] if args else (kwargs.get("kwargs") or {}).get("battle_id")
+    session = Session(mode, f"run_battle {battle_id}")
+    try:
+        session.start()
+    except Exception:
+        # el perfilado nunca tumba el task; start() ya deshizo lo que hubiera instalado
+        logger.exception("Perfilado: no se pudo iniciar la sesión de %s", session.label)
+        return
+    _task_sessions[task_id] = session
+
+
+def _task_postrun(sender=None, task_id=None, **kwargs):
+    session = _task_sessions.pop(task_id, None)
+    if session is None:
+        return
+    session.stop()
+    logger.info("Perfil de %s: %s", session.label, session.summary())
+
+
+def connect_task_signals():
+    from celery.signals import task_postrun, task_prerun
+    task_prerun.connect(_task_prerun, weak=False, dispatch_uid="battles.profiling.prerun")
+    task_postrun.connect(_task_postrun, weak=False, dispatch_uid="battles.profiling.postrun")
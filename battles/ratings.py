@@ -0,0 +1,45 @@
+# battles/ratings.py
+"""
+Elo incremental: se aplica dentro de la misma transacción que cierra el combate.
+Cada ejecución queda además en BattleResult, de donde rebuild_ratings lo reconstruye.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from .models import BattleResult, PokemonRating
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+
+def record(winner_id: int, loser_id: int, when=None):
+    """
+    Suma un resultado (una ejecución) a ambos Pokémon. Debe llamarse dentro de
+    transaction.atomic(); las filas se bloquean en orden de id para no provocar
+    deadlocks entre combates. Cada ejecución se registra por separado (record_result).
+    """
+    k = getattr(settings, "ELO_K_FACTOR", 32)
+    when = when or timezone.now()
+    for pokemon_id in sorted((winner_id, loser_id)):
+        PokemonRating.objects.get_or_create(pokemon_id=pokemon_id)
+    rows = {r.pokemon_id: r for r in PokemonRating.objects.select_for_update().filter(
+        pokemon_id__in=(winner_id, loser_id)).order_by("pokemon_id")}
+    winner, loser = rows[winner_id], rows[loser_id]
+
+    delta = k * (1.0 - expected_score(winner.rating, loser.rating))
+    winner.rating += delta
+    loser.rating -= delta
+    winner.wins += 1
+    loser.losses += 1
+    for row in (winner, loser):
+        row.battles += 1
+        row.last_played_at = when
+        row.save(update_fields=["wins", "losses", "battles", "rating", "last_played_at"])
+
+
+def record_result(battle_id: int | None, winner_id: int, loser_id: int, when=None):
+    """Guarda la ejecución en el histórico y la aplica al ranking (misma transacción)."""
+    when = when or timezone.now()
+    BattleResult.objects.create(battle_id=battle_id, winner_id=winner_id, loser_id=loser_id, played_at=when)
+    record(winner_id, loser_id, when=when)
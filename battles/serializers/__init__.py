@@ -1,15 +1,19 @@
-from .pokemon import PokemonSerializer
-from .scenario import ScenarioSerializer
+from .pokemon import PokemonSerializer, PokemonImportSerializer
+from .scenario import ScenarioSerializer, ScenarioImportSerializer
 from .battle import (
     BattleListSerializer, BattleDetailSerializer, BattleWriteSerializer
 )
 from .schedule import ScheduleSerializer
+from .rating import PokemonRatingSerializer
 
 __all__ = [
     "PokemonSerializer",
     "ScenarioSerializer",
+    "PokemonImportSerializer",
+    "ScenarioImportSerializer",
     "BattleListSerializer",
     "BattleDetailSerializer",
     "BattleWriteSerializer",
     "ScheduleSerializer",
+    "PokemonRatingSerializer",
 ]
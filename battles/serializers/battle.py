@@ -3,12 +3,12 @@ from django.utils import timezone
 from celery.schedules import crontab
 from ..models import Battle
 from .mixins import (
-    StateFieldsMixin, StatusPresentationMixin, NextRunMixin,
+    StateFieldsMixin, StatusPresentationMixin, NextRunMixin, ProfiledMixin,
     validate_cron_5
 )
 
 
-class BattleBaseSerializer(serializers.ModelSerializer):
+class BattleBaseSerializer(ProfiledMixin, serializers.ModelSerializer):
     pokemon_a_name = serializers.ReadOnlyField(source="pokemon_a.name")
     pokemon_b_name = serializers.ReadOnlyField(source="pokemon_b.name")
     scenario_name  = serializers.ReadOnlyField(source="scenario.name")
@@ -21,7 +21,7 @@ class BattleBaseSerializer(serializers.ModelSerializer):
             "pokemon_a", "pokemon_a_name",
             "pokemon_b", "pokemon_b_name",
             "scenario", "scenario_name",
-            "scheduled_cron",
+            "scheduled_cron", "mode",
             "status", "winner", "winner_name",
             "created_at", "updated_at", "run_count_total", "run_count_cron",
         ]
@@ -64,7 +64,7 @@ class BattleWriteSerializer(serializers.ModelSerializer):
         model = Battle
         fields = [
             "pokemon_a", "pokemon_b", "scenario",
-            "scheduled_cron", "name",
+            "scheduled_cron", "name", "mode",
         ]
 
     def validate(self, attrs):
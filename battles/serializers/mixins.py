@@ -3,6 +3,7 @@ from django.utils import timezone
 from rest_framework import serializers
 from croniter import croniter
 from ..models import Battle
+from ..profiling import section
 
 # ---- Helpers reutilizables ----
 
@@ -28,6 +29,13 @@ def validate_cron_5(cron_str: str):
 
 # ---- Mixins de presentación / campos calculados ----
 
+class ProfiledMixin:
+    """Suma el tiempo de serialización al perfilado activo (battles.profiling)."""
+    def to_representation(self, instance):
+        with section("serialize"):
+            return super().to_representation(instance)
+
+
 class StateFieldsMixin(serializers.Serializer):
     hp_a = serializers.SerializerMethodField()
     hp_b = serializers.SerializerMethodField()
@@ -73,10 +81,8 @@ class NextRunMixin(serializers.Serializer):
     next_run = serializers.SerializerMethodField()
 
     def get_next_run(self, obj):
-        # Si el modelo ya expone next_run_at, úsalo
+        # Columna persistida (se recalcula al programar y al terminar cada ejecución)
         dt = getattr(obj, "next_run_at", None)
-        if dt is None and getattr(obj, "scheduled_cron", None):
-            dt = next_run_from_cron(obj.scheduled_cron)
         if not dt:
             return None
         # Devuelve ISO en tz local del servidor (frontend lo mostrará en local del navegador)
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from ..models import Pokemon
+from .mixins import ProfiledMixin
 
-class PokemonSerializer(serializers.ModelSerializer):
+class PokemonSerializer(ProfiledMixin, serializers.ModelSerializer):
     class Meta:
         model = Pokemon
         fields = "__all__"
+
+
+class PokemonImportSerializer(PokemonSerializer):
+    """Fila de importación masiva: sin id y sin el UniqueValidator (el upsert es por nombre)."""
+    class Meta:
+        model = Pokemon
+        fields = ["name", "hp", "attack", "defense", "speed"]
+        extra_kwargs = {"name": {"validators": []}}
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from ..models import PokemonRating
+from .mixins import ProfiledMixin
+
+class PokemonRatingSerializer(ProfiledMixin, serializers.ModelSerializer):
+    pokemon_name = serializers.ReadOnlyField(source="pokemon.name")
+    rating = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PokemonRating
+        fields = ["pokemon", "pokemon_name", "rating", "wins", "losses", "battles", "last_played_at"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["rating"] = round(data["rating"], 1)
+        return data
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from ..models import Scenario
+from .mixins import ProfiledMixin
 
-class ScenarioSerializer(serializers.ModelSerializer):
+class ScenarioSerializer(ProfiledMixin, serializers.ModelSerializer):
     class Meta:
         model = Scenario
         fields = "__all__"
+
+
+class ScenarioImportSerializer(ScenarioSerializer):
+    """Fila de importación masiva: sin id y sin el UniqueValidator (el upsert es por nombre)."""
+    class Meta:
+        model = Scenario
+        fields = ["name", "attack_modifier", "defense_modifier", "speed_modifier"]
+        extra_kwargs = {"name": {"validators": []}}
@@ -0,0 +1,50 @@
+# battles/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import catalog
+from .models import Pokemon, PokemonCounter, Scenario
+from .outcomes import get_cache
+
+
+def _counters():
+    # Import perezoso: NumPy solo se carga cuando hay que recalcular el índice
+    from . import counters
+    return counters
+
+
+@receiver([post_save, post_delete], sender=Pokemon)
+def _pokemon_changed(sender, instance, **kwargs):
+    # tras el commit: que otro proceso no recalcule con la fila vieja.
+    # El id se lee ya: tras post_delete Django pone pk a None antes del commit
+    pk = instance.pk
+    transaction.on_commit(lambda: get_cache().invalidate("pokemon", pk))
+    transaction.on_commit(catalog.bump)
+
+
+@receiver(post_save, sender=Pokemon)
+def _pokemon_saved(sender, instance, **kwargs):
+    _counters().schedule(pokemon_id=instance.id)
+
+
+@receiver(pre_delete, sender=Pokemon)
+def _pokemon_deleting(sender, instance, **kwargs):
+    # antes del CASCADE: las listas donde aparecía como counter pierden una entrada
+    affected = list(PokemonCounter.objects.filter(opponent_id=instance.id)
+                    .values_list("pokemon_id", flat=True).distinct())
+    if affected:
+        _counters().schedule(rows=affected)
+
+
+@receiver([post_save, post_delete], sender=Scenario)
+def _scenario_changed(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: get_cache().invalidate("scenario", pk))
+    transaction.on_commit(catalog.bump)
+
+
+@receiver(post_save, sender=Scenario)
+def _scenario_saved(sender, instance, **kwargs):
+    # el borrado no hace falta: el CASCADE se lleva sus filas del índice
+    _counters().schedule(scenario_id=instance.id)
@@ -1,35 +1,209 @@
-from django.http import StreamingHttpResponse
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from redis.exceptions import ConnectionError as RedisConnectionError
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-from redis import Redis
+from . import metrics
+from .events import (
+    get_redis, get_stream_redis, channel, split_message, parse_event_id, replay, replay_args, decode_entries,
+)
+
+logger = logging.getLogger(__name__)
+
+def _sse_response(stream) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(stream, content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+def _decode(data) -> str:
+    return data.decode("utf-8") if isinstance(data, bytes) else data
+
+def _last_event_id(request) -> tuple[int, int] | None:
+    # EventSource reenvía Last-Event-ID al reconectar; el query param sirve para la 1ª conexión
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    return parse_event_id(raw) if raw else None
 
-def _redis():
-    return Redis.from_url(getattr(settings, "REDIS_URL", "redis://redis:6379/0"),
-                          decode_responses=True)
+def _frame(event_id: str | None, data: str) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}data: {data}\n\n"
+
+class _Dedup:
+    """Descarta los eventos en vivo que ya salieron en la reproducción."""
+    def __init__(self, last: tuple[int, int] | None):
+        self.last = last
+
+    def fresh(self, event_id: str | None) -> bool:
+        parsed = parse_event_id(event_id) if event_id else None
+        if parsed is None:
+            return True
+        if self.last is not None and parsed <= self.last:
+            return False
+        self.last = parsed
+        return True
 
 @require_GET
 @csrf_exempt
 def battle_stream(request, battle_id: int):
-    chan = f"battle:{battle_id}:events"
-    r = _redis()
-    pubsub = r.pubsub()
-    pubsub.subscribe(chan)
+    chan = channel(battle_id)
+    last = _last_event_id(request)
+    # suscribirse antes de reproducir: lo que llegue entre medias se deduplica por id
+    pubsub = get_stream_redis().pubsub()
+    try:
+        pubsub.subscribe(chan)
+    except RedisConnectionError as exc:
+        # SSE_MAX_STREAMS alcanzado (o Redis caído): solo se rechaza este espectador
+        pubsub.close()
+        logger.warning("SSE: no se pudo suscribir a %s: %s", chan, exc)
+        return JsonResponse({"detail": "Demasiados streams abiertos, reintenta más tarde."}, status=503)
 
     def gen():
         yield "event: ping\ndata: {}\n\n"
+        dedup = _Dedup(last)
+        metrics.SSE_OPEN_STREAMS.inc(variant="sync")
         try:
+            if last is not None:
+                for event_id, data in replay(get_redis(), battle_id, "%d-%d" % last):
+                    if dedup.fresh(event_id):
+                        yield _frame(event_id, data)
             for msg in pubsub.listen():
                 if msg.get("type") != "message":
                     continue
-                yield f"data: {msg['data']}\n\n"
+                event_id, data = split_message(_decode(msg["data"]))
+                if dedup.fresh(event_id):
+                    yield _frame(event_id, data)
         finally:
+            metrics.SSE_OPEN_STREAMS.dec(variant="sync")
             try:
                 pubsub.close()
             except Exception:
                 pass
 
-    resp = StreamingHttpResponse(gen(), content_type="text/event-stream")
-    resp["Cache-Control"] = "no-cache"
-    resp["X-Accel-Buffering"] = "no"
-    return resp
+    return _sse_response(gen())
+
+# ------- Variante async (ASGI): una suscripción por combate y proceso -------
+
+class BattleHub:
+    """
+    Mantiene una sola conexión pub/sub por proceso y una suscripción por canal,
+    y reparte cada mensaje a las colas en memoria de los espectadores locales.
+    """
+
+    def __init__(self, redis=None, queue_size: int | None = None):
+        self._redis = redis
+        self.queue_size = queue_size or getattr(settings, "SSE_VIEWER_QUEUE_SIZE", 256)
+        self._viewers: dict[str, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from redis.asyncio import Redis
+            self._redis = Redis.from_url(getattr(settings, "REDIS_URL", "redis://redis:6379/0"))
+        return self._redis
+
+    @property
+    def viewer_count(self) -> int:
+        return sum(len(v) for v in self._viewers.values())
+
+    @property
+    def channel_count(self) -> int:
+        return len(self._viewers)
+
+    async def subscribe(self, chan: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            viewers = self._viewers.setdefault(chan, set())
+            if not viewers:
+                if self._pubsub is None:
+                    self._pubsub = self.redis.pubsub()
+                await self._pubsub.subscribe(chan)
+                if self._reader is None or self._reader.done():
+                    self._reader = asyncio.create_task(self._read())
+            viewers.add(queue)
+        return queue
+
+    async def unsubscribe(self, chan: str, queue: asyncio.Queue):
+        async with self._lock:
+            viewers = self._viewers.get(chan)
+            if viewers is None:
+                return
+            viewers.discard(queue)
+            if not viewers:
+                del self._viewers[chan]
+                try:
+                    await self._pubsub.unsubscribe(chan)
+                except Exception:
+                    logger.warning("No se pudo desuscribir %s", chan, exc_info=True)
+
+    def dispatch(self, chan: str, data: str):
+        for queue in self._viewers.get(chan, ()):
+            if queue.full():
+                # espectador lento: se descarta el evento más antiguo
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _read(self):
+        while True:
+            try:
+                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # redis-py vuelve a suscribir los canales al reconectar
+                logger.warning("Fallo leyendo pub/sub; reintentando", exc_info=True)
+                await asyncio.sleep(1.0)
+                continue
+            if msg and msg.get("type") == "message":
+                self.dispatch(_decode(msg["channel"]), _decode(msg["data"]))
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BattleHub]" = weakref.WeakKeyDictionary()
+
+def get_hub() -> BattleHub:
+    """Hub del event loop actual (uno por proceso ASGI)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = BattleHub()
+    return hub
+
+@require_GET
+@csrf_exempt
+async def battle_stream_async(request, battle_id: int):
+    chan = channel(battle_id)
+    last = _last_event_id(request)
+    hub = get_hub()
+    queue = await hub.subscribe(chan)
+    keepalive = getattr(settings, "SSE_KEEPALIVE_SECONDS", 15)
+
+    async def gen():
+        yield "event: ping\ndata: {}\n\n"
+        dedup = _Dedup(last)
+        metrics.SSE_OPEN_STREAMS.inc(variant="async")
+        try:
+            if last is not None:
+                entries = await hub.redis.xrange(**replay_args(battle_id, "%d-%d" % last))
+                for event_id, data in decode_entries(entries):
+                    if dedup.fresh(event_id):
+                        yield _frame(event_id, data)
+            while True:
+                try:
+                    raw = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                event_id, data = split_message(raw)
+                if dedup.fresh(event_id):
+                    yield _frame(event_id, data)
+        finally:
+            metrics.SSE_OPEN_STREAMS.dec(variant="async")
+            await hub.unsubscribe(chan, queue)
+
+    return _sse_response(gen())
@@ -1,157 +1,292 @@
 # battles/tasks.py
-import json, time
+import time
+from dataclasses import dataclass
 from celery import shared_task
 from django.db import transaction
 from django.conf import settings
-from redis import Redis
-from .models import Battle
+from .models import Battle, BattleTurn
+from .models.battle import next_run_for
+from . import bulk, engine, events, metrics, outcomes, ratings, turnlog
+from .writer import get_writer
 from django.utils import timezone
 from django.db.models import F
 
-def _redis():
-    return Redis.from_url(getattr(settings, "REDIS_URL", "redis://redis:6379/0"))
+def _emit(battle_id: int, payload: dict, flush: bool = False):
+    # Pool compartido + pipeline; los eventos finales fuerzan el flush del buffer
+    events.emit(battle_id, payload, flush=flush)
 
-def _channel(battle_id: int) -> str:
-    return f"battle:{battle_id}:events"
+# Formato del log (solo UX) en battles.turnlog; el texto se pinta bajo demanda
+START_APPEND = turnlog.START_APPEND
 
-def _emit(battle_id: int, payload: dict):
-    _redis().publish(_channel(battle_id), json.dumps(payload, ensure_ascii=False))
+def _normalize_mode(mode: str | None, default: str) -> str:
+    mode = (mode or default or Battle.Mode.REALTIME).strip().upper()
+    if mode not in Battle.Mode.values:
+        raise ValueError(f"Modo de ejecución inválido: {mode}")
+    return mode
 
-# ------- Helpers de formateo de log (solo UX) -------
-def _fmt_stats(side: str, name: str, atk: float, deff: float, spd: float) -> str:
-    # ⚙️ A(Pikachu)  ⚔️ 66.0  🛡️ 40.0  ⚡ 90.0
-    return (f"⚙️  Estadísticas {side}({name})  "
-            f"⚔️ {atk:.1f}  🛡️ {deff:.1f}  ⚡ {spd:.1f}")
+class _TurnWriter:
+    """
+    Acumula las líneas del log en vivo y las inserta en lote como BattleTurn (append-only),
+    junto con los campos del Battle que toque actualizar. Son provisionales: al terminar,
+    _Run.finalize las sustituye por el turn_log compacto.
+    """
+    def __init__(self, battle_id: int, batch_size: int):
+        self.battle_id = battle_id
+        self.batch_size = max(1, batch_size)
+        self.seq = 0
+        self.pending: list[BattleTurn] = []
 
-def _fmt_turn(n: int, attacker: str, defender: str, damage: int, hp_defender: int, name_w: int) -> str:
-    # # 01 │ Pikachu → Bulbasaur   💥  17   ❤️  28
-    num = f"{n:>2}"
-    atk = f"{attacker:<{name_w}}"
-    dfn = f"{defender:<{name_w}}"
-    dmg = f"{damage:>3}"
-    hp  = f"{hp_defender:>3}"
-    return f"Turno #{num} │ {atk} → {dfn}   💥 {dmg}   ❤️ {hp}"
+    def add(self, line: str, turn: int | None = None):
+        self.pending.append(BattleTurn(battle_id=self.battle_id, seq=self.seq, turn=turn, line=line))
+        self.seq += 1
 
-def _sep(width: int = 64) -> str:
-    return "─" * width
-# -----------------------------------------------------
+    @property
+    def full(self) -> bool:
+        return len(self.pending) >= self.batch_size
 
-@shared_task(name="battles.tasks.run_battle")
-def run_battle(battle_id: int, source: str = "manual"):
-    # Carga y “lock” para evitar concurrentes
-    with transaction.atomic():
-        battle = (Battle.objects
-                  .select_related("pokemon_a","pokemon_b","scenario")
-                  .select_for_update()
-                  .get(id=battle_id))
-        if battle.status == Battle.Status.RUNNING:
-            return f"Battle {battle_id} already RUNNING"
+    def flush(self, **fields):
+        # sin esperar: el escritor del proceso lo agrupa con las escrituras de otros tasks
+        if self.pending or fields:
+            t0 = time.perf_counter()
+            fut = get_writer().submit(self._write, self.battle_id, self.pending, fields)
+            fut.add_done_callback(
+                lambda _: metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - t0, op="turns"))
+        self.pending = []
 
-        # Init combate
-        A, B, S = battle.pokemon_a, battle.pokemon_b, battle.scenario
-        atkA = A.attack * S.attack_modifier
-        defA = A.defense * S.defense_modifier
-        spdA = A.speed * S.speed_modifier
-        atkB = B.attack * S.attack_modifier
-        defB = B.defense * S.defense_modifier
-        spdB = B.speed * S.speed_modifier
-        hpA, hpB = A.hp, B.hp
+    @staticmethod
+    def _write(battle_id: int, turns: list[BattleTurn], fields: dict):
+        if turns:
+            BattleTurn.objects.bulk_create(turns, batch_size=500)
+        if fields:
+            # updated_at es la versión del combate (ETag del detalle / listado)
+            Battle.objects.filter(id=battle_id).update(**fields, updated_at=timezone.now())
 
-        battle.status = Battle.Status.RUNNING
-        battle.log = ""
-        battle.winner = None
-        battle.state = {"hp_a": hpA, "hp_b": hpB}
-        battle.save(update_fields=["status","log","winner","state"])
-
-    # Ancho para columnas de nombres
-    name_w = max(len(A.name or "A"), len(B.name or "B"), 3)
-
-    # Primer snapshot con formato UX
-    lines = [
-        f"🗺️  Escenario: {S.name}",
-        _fmt_stats("A", A.name, atkA, defA, spdA),
-        _fmt_stats("B", B.name, atkB, defB, spdB),
-        _sep(),
-        "🚀  ¡Comienza el combate!",
-    ]
-    Battle.objects.filter(id=battle_id).update(
-        log="\n".join(lines),
-        state={"hp_a": hpA, "hp_b": hpB},
-    )
-    _emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":"🚀  ¡Comienza el combate!      daño     hp"})
-
-    # Bucle de turnos (ritmo pequeño para “tiempo real”)
-    attacker_is_A = True if spdA >= spdB else False  # empate comienza A
-    turn = 1
-    try:
-        while hpA > 0 and hpB > 0 and turn < 10000:
-            if attacker_is_A:
-                damage = max(1, round(atkA - defB))
-                hpB = max(0, hpB - damage)
-                line = _fmt_turn(turn, A.name, B.name, damage, hpB, name_w)
-            else:
-                damage = max(1, round(atkB - defA))
-                hpA = max(0, hpA - damage)
-                line = _fmt_turn(turn, B.name, A.name, damage, hpA, name_w)
-
-            # Actualiza DB y emite evento
-            lines.append(line)
-            Battle.objects.filter(id=battle_id).update(
-                log="\n".join(lines),
-                state={"hp_a": hpA, "hp_b": hpB},
-            )
-            _emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":line})
-
-            if hpA == 0 or hpB == 0:
-                break
-
-            attacker_is_A = not attacker_is_A
-            turn += 1
-            tick_sleep = getattr(settings, "BATTLE_TICK_SLEEP", 0.4)
-            time.sleep(tick_sleep)
-
-        winner = A if hpA > 0 else B
-        lines.append(_sep())
-        lines.append(f"🏆  Ganador: {winner.name}")
+@dataclass
+class _Run:
+    """Combate ya marcado RUNNING: stats efectivas y formato de su log."""
+    battle: Battle
+    mode: str
+    fa: engine.Fighter
+    fb: engine.Fighter
 
-        # si el combate tiene cron, tras terminar vuelve a "SCHEDULED"
-        new_status = Battle.Status.SCHEDULED if battle.scheduled_cron else Battle.Status.FINISHED
-        now = timezone.now()
+    @property
+    def name_w(self) -> int:
+        return turnlog.name_width(self.fa.name, self.fb.name)
 
-        Battle.objects.filter(id=battle_id).update(
+    def header(self) -> list[str]:
+        fa, fb = self.fa, self.fb
+        return turnlog.header_lines(self.battle.scenario.name, fa.name, fb.name,
+                                    (fa.atk, fa.deff, fa.spd, fb.atk, fb.deff, fb.spd))
+
+    def line(self, t: engine.Turn) -> str:
+        return turnlog.fmt_turn_obj(t, self.fa.name, self.fb.name, self.name_w)
+
+    def winner(self, hpA: int):
+        return self.battle.pokemon_a if hpA > 0 else self.battle.pokemon_b
+
+    def finish(self, hpA: int, hpB: int, source: str, turns) -> tuple[list[str], dict, dict]:
+        """Líneas de cierre, campos del update final (con el log compacto) y evento "done"."""
+        winner = self.winner(hpA)
+        # si el combate tiene cron, tras terminar vuelve a "SCHEDULED"
+        new_status = Battle.Status.SCHEDULED if self.battle.scheduled_cron else Battle.Status.FINISHED
+        fields = dict(
             status=new_status,
             winner=winner,
-            log="\n".join(lines),
             state={"hp_a": max(hpA, 0), "hp_b": max(hpB, 0)},
             updated_at=timezone.now(),
             run_count_total=F("run_count_total") + 1,
             run_count_cron =F("run_count_cron")  + (1 if source == "cron" else 0),
+            next_run_at=self.battle.compute_next_run(),
+            turn_log=turnlog.encode(self.fa, self.fb, turns),
         )
-
-        _emit(battle_id, {
+        done = {
             "type": "done",
             "status": "SCHEDULED" if new_status == Battle.Status.SCHEDULED else "FINISHED",
             "hp_a": max(hpA, 0),
             "hp_b": max(hpB, 0),
             "winner": winner.name,
             "log_append": f"🏆  Ganador: {winner.name}",
-        })
+        }
+        return turnlog.footer_lines(winner.name), fields, done
 
-        return f"Battle {battle_id} {new_status}"
+    def finalize(self, fields: dict):
+        """Update final del combate + leaderboard; llamar dentro de la misma transacción."""
+        # el log queda en turn_log: las filas provisionales del modo en vivo sobran
+        BattleTurn.objects.filter(battle_id=self.battle.id).delete()
+        Battle.objects.filter(id=self.battle.id).update(**fields)
+        winner = fields["winner"]
+        loser = self.battle.pokemon_b if winner.id == self.battle.pokemon_a_id else self.battle.pokemon_a
+        ratings.record_result(self.battle.id, winner.id, loser.id, when=fields["updated_at"])
 
-    except Exception as exc:
-        # si hay cron, queda “SCHEDULED” para reintentos futuros; si no, “FAILED”
-        new_status = Battle.Status.SCHEDULED if Battle.objects.filter(
-            id=battle_id, scheduled_cron__isnull=False
-        ).exists() else Battle.Status.FAILED
+def _begin(battle_id: int, mode: str | None) -> _Run | None:
+    """Carga y “lock” para evitar concurrentes; None si ya estaba RUNNING."""
+    with transaction.atomic():
+        battle = (Battle.objects
+                  .select_related("pokemon_a","pokemon_b","scenario")
+                  .select_for_update()
+                  .get(id=battle_id))
+        if battle.status == Battle.Status.RUNNING:
+            return None
+        mode = _normalize_mode(mode, battle.mode)
+
+        # Init combate
+        A, B, S = battle.pokemon_a, battle.pokemon_b, battle.scenario
+        run = _Run(battle=battle, mode=mode, fa=engine.fighter(A, S), fb=engine.fighter(B, S))
+
+        # cada ejecución arranca con un log vacío
+        BattleTurn.objects.filter(battle_id=battle_id).delete()
+        battle.status = Battle.Status.RUNNING
+        battle.log_text = ""
+        battle.turn_log = None
+        battle.winner = None
+        battle.state = {"hp_a": run.fa.hp, "hp_b": run.fb.hp}
+        battle.save(update_fields=["status","log_text","turn_log","winner","state"])
+    return run
+
+def _mark_failed(battle_id: int, exc: Exception) -> str:
+    # si hay cron, queda “SCHEDULED” para reintentos futuros; si no, “FAILED”
+    cron = Battle.objects.filter(id=battle_id).values_list("scheduled_cron", flat=True).first()
+    new_status = Battle.Status.SCHEDULED if cron else Battle.Status.FAILED
+    with transaction.atomic():
+        # como en finalize: las filas provisionales sobran; el log queda solo con el error
+        BattleTurn.objects.filter(battle_id=battle_id).delete()
         Battle.objects.filter(id=battle_id).update(
             status=new_status,
-            log=f"ERROR: {exc}",
+            log_text=f"ERROR: {exc}",
             updated_at=timezone.now(),
+            next_run_at=next_run_for(cron),
         )
-        _emit(battle_id, {
-            "type": "error",
-            "status": "SCHEDULED" if new_status == Battle.Status.SCHEDULED else "FAILED",
-            "error": str(exc),
-        })
+    return new_status
+
+def _write(op: str, fn, *args):
+    """Escritura síncrona a través del escritor del proceso, medida en battle_db_write_seconds."""
+    with metrics.DB_WRITE_SECONDS.time(op=op):
+        return get_writer().call(fn, *args)
+
+def _fail(battle_id: int, exc: Exception):
+    new_status = _write("fail", _mark_failed, battle_id, exc)
+    _emit(battle_id, {
+        "type": "error",
+        "status": "SCHEDULED" if new_status == Battle.Status.SCHEDULED else "FAILED",
+        "error": str(exc),
+    }, flush=True)
+
+@shared_task(name="battles.tasks.run_battle")
+def run_battle(battle_id: int, source: str = "manual", mode: str | None = None,
+               enqueued_at: float | None = None, seed: int | None = None):
+    if enqueued_at:
+        metrics.QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - enqueued_at), source=source)
+    # con semilla (modelo estocástico) se juega aquí: el runner asyncio usa el motor determinista
+    if getattr(settings, "BATTLE_ENGINE", "sync") == "asyncio" and seed is None:
+        # Motor alternativo: los combates en tiempo real se ceden al runner asyncio
+        from . import live
+        mode = _normalize_mode(mode, Battle.objects.filter(id=battle_id).values_list("mode", flat=True).first())
+        if mode == Battle.Mode.REALTIME:
+            live.enqueue(battle_id, source=source, mode=mode, group=run_battle.request.group)
+            return f"Battle {battle_id} queued for live runner"
+
+    run = _write("begin", _begin, battle_id, mode)
+    if run is None:
+        metrics.BATTLES.inc(status="skipped")
+        bulk.mark(run_battle.request.group, "skipped")
+        return f"Battle {battle_id} already RUNNING"
+    started = time.perf_counter()
+    A, B, S = run.battle.pokemon_a, run.battle.pokemon_b, run.battle.scenario
+    hpA, hpB = run.fa.hp, run.fb.hp
+
+    try:
+        # Secuencia de turnos memoizada por huella del emparejamiento (o estocástica con seed)
+        memo = outcomes.simulate(A, B, S, seed=seed)
+        if run.mode == Battle.Mode.INSTANT:
+            # Fast-forward: resultado analítico, una escritura (turn_log) y un evento
+            hpA, hpB = memo.outcome.hp_a, memo.outcome.hp_b
+        else:
+            # En vivo las líneas van a BattleTurn para que el detalle muestre el progreso
+            turns = _TurnWriter(battle_id, getattr(settings, "BATTLE_TURN_BATCH", 10))
+            for line in run.header():
+                turns.add(line)
+            turns.flush(state={"hp_a": hpA, "hp_b": hpB})
+            _emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":START_APPEND})
+
+            # Bucle de turnos (ritmo pequeño para “tiempo real”)
+            for t in memo.turns:
+                hpA, hpB = t.hp_a, t.hp_b
+                line = run.line(t)
+
+                # Persiste por lotes y emite evento en cada turno
+                turns.add(line, turn=t.n)
+                if turns.full:
+                    turns.flush(state={"hp_a": hpA, "hp_b": hpB})
+                _emit(battle_id, {"type":"tick","status":"RUNNING","hp_a":hpA,"hp_b":hpB,"log_append":line})
+
+                if hpA == 0 or hpB == 0:
+                    break
+
+                tick_sleep = getattr(settings, "BATTLE_TICK_SLEEP", 0.4)
+                time.sleep(tick_sleep)
+
+        footer, fields, done = run.finish(hpA, hpB, source, memo.turns)
+        # espera al commit (va detrás de los lotes de turnos en la cola) antes del "done"
+        _write("finalize", run.finalize, fields)
+
+        if run.mode == Battle.Mode.INSTANT:
+            # no hubo ticks: el cliente recibe el log completo en el único evento
+            lines = run.header() + [run.line(t) for t in memo.turns] + footer
+            done["log"] = "\n".join(lines)
+        _emit(battle_id, done, flush=True)
+        metrics.BATTLE_DURATION_SECONDS.observe(time.perf_counter() - started, mode=run.mode)
+        metrics.BATTLES.inc(status="finished", mode=run.mode)
+        bulk.mark(run_battle.request.group, "finished")
+
+        return f"Battle {battle_id} {fields['status']}"
+
+    except Exception as exc:
+        _fail(battle_id, exc)
+        metrics.BATTLES.inc(status="failed", mode=run.mode)
+        bulk.mark(run_battle.request.group, "failed")
         raise
+
+def _claim_due(now, limit: int) -> tuple[list[int], int]:
+    """
+    Avanza next_run_at de los combates vencidos (un UPDATE por expresión CRON distinta)
+    y devuelve (ids a lanzar, vencidos reclamados). Los que siguen RUNNING pierden
+    esta ejecución, igual que con el PeriodicTask por combate.
+    """
+    with transaction.atomic():
+        due = list(Battle.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(next_run_at__lte=now)
+                   .order_by("next_run_at")
+                   .values_list("id", "scheduled_cron", "status")[:limit])
+        by_cron: dict[str, list[int]] = {}
+        for battle_id, cron, _ in due:
+            by_cron.setdefault(cron, []).append(battle_id)
+        for cron, ids in by_cron.items():
+            Battle.objects.filter(id__in=ids).update(next_run_at=next_run_for(cron, now), updated_at=timezone.now())
+    return [battle_id for battle_id, _, st in due if st != Battle.Status.RUNNING], len(due)
+
+@shared_task(name="battles.tasks.dispatch_due_battles")
+def dispatch_due_battles(limit: int | None = None):
+    """
+    Barrido periódico (CELERY_BEAT_SCHEDULE): lanza en lotes los combates con
+    next_run_at <= ahora, leídos por índice. Sustituye al PeriodicTask por combate.
+    """
+    now = timezone.now()
+    batch = limit or getattr(settings, "BATTLE_SWEEP_BATCH", 1000)
+    dispatched = 0
+    while True:
+        ids, claimed = _claim_due(now, batch)
+        if ids:
+            bulk.dispatch(ids, source="cron")
+            dispatched += len(ids)
+        if claimed < batch:
+            break
+    return f"{dispatched} battles dispatched"
+
+@shared_task(name="battles.tasks.refresh_counters")
+def refresh_counters(pokemon_id: int | None = None, scenario_id: int | None = None,
+                     rows: list[int] | None = None, full: bool = False):
+    """Actualiza el índice de counters tras un cambio del catálogo (ver battles.counters)."""
+    from . import counters  # NumPy solo en el worker que lo necesita
+    changed = counters.apply(pokemon_id=pokemon_id, scenario_id=scenario_id, rows=rows, full=full)
+    return f"{changed} counter lists rewritten"
@@ -1,11 +1,29 @@
+import asyncio
+import io
 import re
+import time
+from concurrent.futures import Future
+from unittest import mock
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
-from .models import Pokemon, Scenario, Battle
+from .models import Pokemon, Scenario, Battle, BattleTurn, PokemonRating, PokemonCounter
 from .tasks import run_battle
+from .events import EventEmitter
+from .sse import BattleHub
+from . import engine, tournament
+from .outcomes import OutcomeCache
+from .live import LiveRunner
+from asgiref.sync import async_to_sync
+
+# caché por defecto y la del catálogo en memoria (la de catálogo es Redis fuera de los tests)
+LOCMEM_CACHES = {alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+                 for alias in ("default", "catalog")}
 
 
 @override_settings(BATTLE_TICK_SLEEP=0.0)  # si agregas esta setting en tu app
+@override_settings(BATTLE_DB_WRITER="inline")  # el hilo escritor no ve la transacción del test
+@override_settings(COUNTERS_REFRESH="sync")  # sin Celery: el índice se actualiza en el on_commit
 class BattleTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -59,6 +77,18 @@ class BattleTests(TestCase):
         battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
         resp = self.client.post(f"/api/battles/{battle.id}/schedule/", {"cron": "*/1 * * * *"}, format="json")
         self.assertEqual(resp.status_code, 200)
+        battle.refresh_from_db()
+        self.assertIsNotNone(battle.next_run_at)
+        self.assertIsNotNone(resp.data["next_run"])
+
+        resp = self.client.get("/api/battles/", {"ordering": "next_run_at", "next_run_before": battle.next_run_at.isoformat()})
+        self.assertEqual([b["id"] for b in resp.data["results"]], [battle.id])
+        for raw in ("mañana", "2026-02-30"):
+            self.assertEqual(self.client.get("/api/battles/", {"next_run_after": raw}).status_code, 400)
+
+        self.client.post(f"/api/battles/{battle.id}/schedule/", {"cron": ""}, format="json")
+        battle.refresh_from_db()
+        self.assertIsNone(battle.next_run_at)
 
     def test_create_without_cron_sets_pending(self):
         resp = self.client.post("/api/battles/", {
@@ -68,4 +98,686 @@ class BattleTests(TestCase):
         }, format="json")
         self.assertEqual(resp.status_code, 201)
         self.assertEqual(resp.data["status"], "PENDING")
-        
\ No newline at end of file
+
+    def test_battle_list_cursor_pagination(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        ids = [Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S).id for _ in range(5)]
+        # creados en el mismo instante (bulk/importación): el id desempata
+        tick = timezone.now()
+        Battle.objects.filter(id__in=ids[1:4]).update(created_at=tick)
+        Battle.objects.filter(id=ids[4]).update(created_at=tick + timedelta(seconds=1))
+        Battle.objects.filter(id=ids[0]).update(created_at=tick - timedelta(seconds=1))
+        seen, url, params = [], "/api/battles/", {"pagination": "cursor", "page_size": 2}
+        while url:
+            resp = self.client.get(url, params)
+            self.assertNotIn("count", resp.data)
+            seen += [b["id"] for b in resp.data["results"]]
+            url, params = resp.data["next"], None
+        self.assertEqual(seen, ids[::-1])
+        # sin el parámetro se mantiene la paginación por número de página
+        self.assertEqual(self.client.get("/api/battles/").data["count"], 5)
+
+    @override_settings(TIME_ZONE="America/Bogota")
+    def test_cron_hours_are_local_time(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .models.battle import next_run_for
+        base = datetime(2026, 3, 1, 12, 0, tzinfo=dt_timezone.utc)  # 07:00 en Bogotá
+        nxt = next_run_for("0 9 * * *", base)
+        self.assertEqual((nxt.hour, nxt.minute, nxt.utcoffset().total_seconds()), (9, 0, -5 * 3600))
+        self.assertEqual(nxt.astimezone(dt_timezone.utc).hour, 14)
+
+    @mock.patch("battles.bulk.dispatch")
+    def test_sweeper_dispatches_due_battles_and_advances_next_run(self, dispatch):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .tasks import dispatch_due_battles
+        due = [Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S, scheduled_cron="*/5 * * * *")
+               for _ in range(3)]
+        later = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S, scheduled_cron="0 0 1 1 *")
+        past = timezone.now() - timedelta(minutes=1)
+        Battle.objects.filter(id__in=[b.id for b in due]).update(next_run_at=past)
+        Battle.objects.filter(id=due[2].id).update(status=Battle.Status.RUNNING)
+
+        dispatch_due_battles(limit=2)
+        dispatched = [i for c in dispatch.call_args_list for i in c.args[0]]
+        self.assertEqual(sorted(dispatched), [due[0].id, due[1].id])
+        self.assertEqual({c.kwargs["source"] for c in dispatch.call_args_list}, {"cron"})
+        self.assertFalse(Battle.objects.filter(next_run_at__lte=timezone.now()).exists())
+        later.refresh_from_db()
+        self.assertGreater(later.next_run_at, timezone.now())
+
+    @mock.patch("battles.tasks._emit")
+    def test_instant_mode_matches_realtime(self, emit):
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        run_battle(battle.id)
+        battle.refresh_from_db()
+        realtime = (battle.winner_id, battle.state, battle.log)
+
+        emit.reset_mock()
+        run_battle(battle.id, mode="instant")
+        battle.refresh_from_db()
+        self.assertEqual((battle.winner_id, battle.state, battle.log), realtime)
+        # un único evento para todo el combate
+        self.assertEqual(emit.call_count, 1)
+        self.assertEqual(emit.call_args.args[1]["type"], "done")
+        self.assertEqual(battle.run_count_total, 2)
+
+    @mock.patch("battles.tasks._emit")
+    @override_settings(BATTLE_TURN_BATCH=3)
+    def test_turns_are_appended_and_log_rebuilt_for_detail(self, emit):
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        with mock.patch.object(BattleTurn.objects, "bulk_create", wraps=BattleTurn.objects.bulk_create) as bulk_create:
+            run_battle(battle.id)
+        self.assertGreater(bulk_create.call_count, 1)  # en vivo, por lotes
+        # las filas provisionales del modo en vivo se sustituyen por el turn_log compacto
+        self.assertFalse(BattleTurn.objects.filter(battle=battle).exists())
+        battle.refresh_from_db()
+        self.assertTrue(battle.turn_log)
+
+        resp = self.client.get(f"/api/battles/{battle.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNotNone(self._find_turn_line(resp.data["log"], 1))
+        self.assertIn("Ganador", resp.data["log"].splitlines()[-1])
+
+    @mock.patch("battles.tasks._emit")
+    def test_turn_log_is_compact_and_rendered_on_demand(self, emit):
+        tank = Pokemon.objects.create(name="Shuckle", hp=1000, attack=40, defense=40, speed=5)
+        wall = Pokemon.objects.create(name="Blissey", hp=1000, attack=40, defense=40, speed=55)
+        battle = Battle.objects.create(pokemon_a=tank, pokemon_b=wall, scenario=self.S, mode=Battle.Mode.INSTANT)
+        run_battle(battle.id)
+        battle = Battle.objects.get(id=battle.id)
+        log = battle.log
+        self.assertEqual(len(log.splitlines()), 5 + 1999 + 2)
+        self.assertIn("Turno #1999", log)
+        self.assertLess(len(battle.turn_log) * 10, len(log.encode()))
+        # el texto coincide con el que llega en el evento final
+        self.assertEqual(emit.call_args.args[1]["log"], log)
+
+        with self.assertNumQueries(2):  # count + página (el ETag sale de ella), sin leer el log
+            resp = self.client.get("/api/battles/")
+        self.assertNotIn("log", resp.data["results"][0])
+
+    def test_batch_writer_isolates_failing_writes(self):
+        from .writer import BatchWriter
+        writer = BatchWriter()
+        ops = [
+            (Pokemon.objects.create, (), {"name": "Eevee", "hp": 55, "attack": 55, "defense": 50, "speed": 55}),
+            (Pokemon.objects.create, (), {"name": "Pikachu", "hp": 1, "attack": 1, "defense": 1, "speed": 1}),  # nombre repetido
+            (Pokemon.objects.create, (), {"name": "Ditto", "hp": 48, "attack": 48, "defense": 48, "speed": 48}),
+        ]
+        futures = [Future() for _ in ops]
+        writer._apply([(fn, args, kwargs, fut) for (fn, args, kwargs), fut in zip(ops, futures)])
+        self.assertEqual(futures[0].result().name, "Eevee")
+        self.assertIsNotNone(futures[1].exception())
+        self.assertEqual(futures[2].result().name, "Ditto")
+        self.assertEqual(Pokemon.objects.filter(name__in=["Eevee", "Ditto"]).count(), 2)
+
+    def test_bench_command_reports_json_and_fails_on_regression(self):
+        import json, os, tempfile
+        from django.core.management.base import CommandError
+        opts = dict(turns="3", battles=1, rows=5, pokemons=5, events=10, repeat=1)
+        out = io.StringIO()
+        call_command("bench", stdout=out, **opts)
+        metrics = json.loads(out.getvalue())["metrics"]
+        self.assertIn("run_battle.realtime.turns_3.turns_per_s", metrics)
+        self.assertIn("pokemon_list.cold_ms", metrics)
+        self.assertFalse(Pokemon.objects.filter(name__startswith="bench-").exists())  # se deshace
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fh:
+            json.dump({"metrics": {"emit.immediate.events_per_s": 1e12}}, fh)
+        self.addCleanup(os.unlink, fh.name)
+        with self.assertRaises(CommandError):
+            call_command("bench", stdout=io.StringIO(), baseline=fh.name, **opts)
+
+    @override_settings(METRICS_FLUSH_INTERVAL=3600)
+    def test_metrics_aggregate_through_redis_and_expose_text_format(self):
+        from . import metrics
+        metrics.flush(mock.MagicMock())  # descarta lo acumulado por otros tests
+        for seconds in (0.003, 0.004, 0.2):
+            metrics.DB_WRITE_SECONDS.observe(seconds, op="turns")
+        self.client.get("/api/pokemons/")
+
+        metrics.SSE_OPEN_STREAMS.inc(variant="sync")
+        store: dict[str, dict[str, float]] = {}
+        procs: dict[str, float] = {"muerto:1": 0.0}
+        store[metrics.KEY_PREFIX + "sse_open_streams"] = {'variant="sync"|muerto:1': 7.0}
+        redis = mock.MagicMock()
+        pipe = redis.pipeline.return_value
+        pipe.hincrbyfloat.side_effect = \
+            lambda key, field, amount: store.setdefault(key, {}).__setitem__(field, store.get(key, {}).get(field, 0) + amount)
+        pipe.hset.side_effect = lambda key, field, value: store.setdefault(key, {}).__setitem__(field, value)
+        pipe.zadd.side_effect = lambda key, mapping: procs.update(mapping)
+        redis.zrangebyscore.side_effect = lambda key, low, high: [p for p, ts in procs.items() if ts >= low]
+        metrics.flush(redis)
+
+        pipe.execute.side_effect = \
+            lambda: [store.get(metrics.KEY_PREFIX + m.name, {}) for m in metrics._registry.values()]
+        with mock.patch("battles.events.get_redis", return_value=redis):
+            resp = self.client.get("/metrics")
+        metrics.SSE_OPEN_STREAMS.dec(variant="sync")
+        self.assertEqual(resp.status_code, 200)
+        text = resp.content.decode()
+        self.assertIn('battle_db_write_seconds_bucket{op="turns",le="0.005"} 2', text)
+        self.assertIn('battle_db_write_seconds_count{op="turns"} 3', text)
+        # gauge por proceso: el del proceso que dejó de latir no suma
+        self.assertIn('sse_open_streams{variant="sync"} 1', text)
+        pipe.hdel.assert_any_call(metrics.KEY_PREFIX + "sse_open_streams", 'variant="sync"|muerto:1')
+        self.assertRegex(text, r'api_request_seconds_count\{action="list",status="200",view="PokemonViewSet"\} 1')
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0.05)
+    def test_metrics_flush_in_background_when_idle(self):
+        from . import metrics
+        with mock.patch.object(metrics, "flush") as flush:
+            metrics._flusher_pid = None
+            metrics.BATTLES.inc(status="finished")
+            time.sleep(0.3)
+        self.assertTrue(flush.called)
+
+    def test_profiling_header_reports_server_timing_and_dumps_profile(self):
+        import os, tempfile
+        from .profiling import make_token
+        Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        self.assertNotIn("Server-Timing", self.client.get("/api/battles/"))
+        self.assertNotIn("Server-Timing", self.client.get("/api/battles/", HTTP_X_PROFILE="forged"))
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PROFILING_DIR=tmp, PROFILING_KEEP=1):
+            for _ in range(2):
+                resp = self.client.get("/api/battles/", HTTP_X_PROFILE=make_token("cprofile"))
+            self.assertRegex(resp["Server-Timing"], r'db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=')
+            self.assertEqual(os.listdir(tmp), [resp["X-Profile-File"]])  # rotado a PROFILING_KEEP
+
+    def test_overlapping_cprofile_sessions_fall_back_to_sql(self):
+        import cProfile, os, tempfile
+        from . import profiling
+        from .models import Pokemon as P
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PROFILING_DIR=tmp):
+            first = profiling.Session("cprofile", "primera")
+            second = profiling.Session("cprofile", "segunda")
+            try:
+                first.start()
+                second.start()  # solapada: no puede tener su propio cProfile
+                list(P.objects.all())
+            finally:
+                second.stop()
+                first.stop()
+            self.assertEqual((first.mode, second.mode), ("cprofile", "sql"))
+            self.assertEqual((first.queries, second.queries), (1, 1))
+            self.assertIsNone(second.dump_path)
+            self.assertEqual(os.listdir(tmp), [first.dump_path.name])
+
+            # enable() ajeno que falla (3.12: otro perfilador activo): modo sql y lock libre
+            with mock.patch.object(cProfile.Profile, "enable", side_effect=ValueError("ocupado")):
+                third = profiling.Session("cprofile", "tercera")
+                third.start()
+                third.stop()
+            self.assertEqual(third.mode, "sql")
+            self.assertFalse(profiling._cprofile_lock.locked())
+
+        # si start() falla a medias, no deja wrappers ni la sesión actual puestos
+        broken = profiling.Session("sql", "rota")
+        failing = mock.Mock(**{"set.side_effect": RuntimeError("boom")})
+        with mock.patch.object(profiling, "_current", failing):
+            with self.assertRaises(RuntimeError):
+                broken.start()
+        broken.stop()
+        self.assertIsNone(profiling._current.get())
+        list(P.objects.all())
+        self.assertEqual(broken.queries, 0)
+
+    def test_profiling_middleware_stays_async_under_asgi(self):
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .models import Pokemon as P
+        from .profiling import ProfilingMiddleware
+
+        async def view(request):
+            from asgiref.sync import sync_to_async
+            await sync_to_async(lambda: list(P.objects.all()))()
+            return HttpResponse("ok")
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get("/api/pokemons/")
+        self.assertNotIn("Server-Timing", async_to_sync(middleware)(request))
+        with override_settings(PROFILING="sql"):
+            resp = async_to_sync(middleware)(request)
+        self.assertIn('desc="1 queries"', resp["Server-Timing"])
+
+    def test_emitter_buffers_events_into_one_pipeline(self):
+        redis = mock.Mock()
+        emitter = EventEmitter(flush_interval=60, redis=redis)
+        emitter.emit(1, {"type": "tick"})
+        emitter.emit(2, {"type": "tick"})
+        redis.pipeline.assert_not_called()
+
+        emitter.emit(1, {"type": "done"}, flush=True)
+        redis.pipeline.assert_called_once_with(transaction=False)
+        pipe = redis.pipeline.return_value
+        script = redis.register_script.return_value
+        self.assertEqual([c.kwargs["keys"] for c in script.call_args_list],
+                         [["battle:1:stream", "battle:1:events"],
+                          ["battle:2:stream", "battle:2:events"],
+                          ["battle:1:stream", "battle:1:events"]])
+        self.assertTrue(all(c.kwargs["client"] is pipe for c in script.call_args_list))
+        pipe.execute.assert_called_once()
+
+    def test_hub_subscribes_once_per_battle_and_fans_out(self):
+        redis = mock.Mock()
+        pubsub = redis.pubsub.return_value
+        pubsub.subscribe = mock.AsyncMock()
+        pubsub.unsubscribe = mock.AsyncMock()
+        pubsub.get_message = mock.AsyncMock(return_value=None)
+
+        async def scenario():
+            hub = BattleHub(redis=redis)
+            q1 = await hub.subscribe("battle:1:events")
+            q2 = await hub.subscribe("battle:1:events")
+            hub.dispatch("battle:1:events", "{}")
+            received = [q1.get_nowait(), q2.get_nowait()]
+            await hub.unsubscribe("battle:1:events", q1)
+            await hub.unsubscribe("battle:1:events", q2)
+            hub._reader.cancel()
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), ["{}", "{}"])
+        pubsub.subscribe.assert_awaited_once_with("battle:1:events")
+        pubsub.unsubscribe.assert_awaited_once_with("battle:1:events")
+
+    @mock.patch("battles.sse.get_stream_redis")
+    @mock.patch("battles.sse.get_redis")
+    def test_stream_replays_after_last_event_id(self, get_redis, get_stream_redis):
+        redis = get_redis.return_value
+        redis.xrange.return_value = [(b"5-1", {b"data": b'{"n":1}'}), (b"5-2", {b"data": b'{"n":2}'})]
+        # la suscripción sale del pool de streams, no del compartido
+        pubsub = get_stream_redis.return_value.pubsub.return_value
+        pubsub.listen.return_value = iter([
+            {"type": "subscribe", "data": 1},
+            {"type": "message", "data": b'5-2\n{"n":2}'},
+            {"type": "message", "data": b'5-3\n{"n":3}'},
+        ])
+        resp = self.client.get("/api/battles/7/stream/", HTTP_LAST_EVENT_ID="5-0")
+        body = b"".join(resp.streaming_content).decode()
+
+        self.assertEqual(re.findall(r"^id: (\S+)$", body, re.MULTILINE), ["5-1", "5-2", "5-3"])
+        self.assertEqual(redis.xrange.call_args.kwargs["min"], "(5-0")
+        self.assertEqual(redis.xrange.call_args.kwargs["name"], "battle:7:stream")
+        redis.pubsub.assert_not_called()
+
+        from redis.exceptions import ConnectionError as RedisConnectionError
+        pubsub.subscribe.side_effect = RedisConnectionError("Too many connections")
+        self.assertEqual(self.client.get("/api/battles/7/stream/").status_code, 503)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_tournament_tensor_matches_engine(self):
+        Pokemon.objects.create(name="Snorlax", hp=160, attack=110, defense=65, speed=30)
+        Pokemon.objects.create(name="Shuckle", hp=20, attack=10, defense=230, speed=90)
+        # hp en el tope de PositiveIntegerField con daño 1: 2*ko desborda int32
+        Pokemon.objects.create(name="Wall", hp=2**31 - 1, attack=1, defense=300, speed=1)
+        Scenario.objects.create(name="Volcano", attack_modifier=1.3, defense_modifier=0.8, speed_modifier=1.1)
+        cat = tournament.load_catalog()
+        tensor = tournament.outcome_tensor(cat)
+
+        pokemons, scenarios = list(Pokemon.objects.order_by("id")), list(Scenario.objects.order_by("id"))
+        for s, scenario in enumerate(scenarios):
+            for i, a in enumerate(pokemons):
+                for j, b in enumerate(pokemons):
+                    expected = engine.resolve(engine.fighter(a, scenario), engine.fighter(b, scenario))
+                    got = (bool(tensor["a_wins"][s, i, j]), int(tensor["turns"][s, i, j]),
+                           int(tensor["hp_a"][s, i, j]), int(tensor["hp_b"][s, i, j]))
+                    self.assertEqual(got, (expected.a_wins, expected.turns, expected.hp_a, expected.hp_b))
+
+        resp = self.client.get("/api/tournaments/", {"scenario": self.S.id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["count"], 5)
+        self.assertTrue(all(r["played"] == 8 for r in resp.data["results"]))
+        # la clasificación queda cacheada hasta que cambie el catálogo
+        with mock.patch("battles.tournament.standings") as standings:
+            self.assertEqual(self.client.get("/api/tournaments/", {"scenario": self.S.id}).data, resp.data)
+        standings.assert_not_called()
+
+    def test_outcome_cache_reuses_and_invalidates(self):
+        cache = OutcomeCache(redis=mock.MagicMock(**{"get.return_value": None, "smembers.return_value": set()}))
+        first = cache.get_or_compute(self.A, self.B, self.S)
+        self.assertIs(cache.get_or_compute(self.A, self.B, self.S), first)
+        self.assertEqual((cache.stats["misses"], cache.stats["local_hits"]), (1, 1))
+
+        cache.invalidate("pokemon", self.A.id)
+        cache.get_or_compute(self.A, self.B, self.S)
+        self.assertEqual(cache.stats["misses"], 2)
+
+        # el LRU desalojado también sale del índice por tags
+        small = OutcomeCache(max_entries=1, redis=cache._redis)
+        small.get_or_compute(self.A, self.B, self.S)
+        small.get_or_compute(self.B, self.A, self.S)
+        self.assertEqual(sum(len(fps) for fps in small._tags.values()), 3)
+
+        # post_delete: se invalida el id que tenía, no el pk ya puesto a None
+        with mock.patch("battles.signals.get_cache") as get_cache, self.captureOnCommitCallbacks(execute=True):
+            pk = self.B.id
+            self.B.delete()
+        get_cache.return_value.invalidate.assert_any_call("pokemon", pk)
+
+    @mock.patch("battles.views.battle.bulk.dispatch", return_value="g-1")
+    def test_execute_bulk_validates_set_and_dispatches_one_group(self, dispatch):
+        b1 = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        b2 = Battle.objects.create(pokemon_a=self.B, pokemon_b=self.A, scenario=self.S,
+                                   status=Battle.Status.RUNNING)
+        resp = self.client.post("/api/battles/execute-bulk/",
+                                {"ids": [b1.id, b2.id, 999], "mode": "instant"}, format="json")
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual((resp.data["group_id"], resp.data["running"], resp.data["not_found"]),
+                         ("g-1", [b2.id], [999]))
+        dispatch.assert_called_once_with([b1.id], mode="INSTANT")
+
+        resp = self.client.post("/api/battles/execute-bulk/", {}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        for body in ({"scenario": "abc"}, {"ids": [True]}):
+            self.assertEqual(self.client.post("/api/battles/execute-bulk/", body, format="json").status_code, 400)
+
+        # por filtros se lanzan como mucho BATTLE_BULK_MAX, los primeros por id
+        dispatch.reset_mock()
+        b3 = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        with override_settings(BATTLE_BULK_MAX=1):
+            resp = self.client.post("/api/battles/execute-bulk/", {"scenario": str(self.S.id)}, format="json")
+            self.assertEqual(self.client.post("/api/battles/execute-bulk/", {"ids": [b1.id, b3.id]},
+                                              format="json").status_code, 400)
+        self.assertTrue(resp.data["truncated"])
+        dispatch.assert_called_once_with([b1.id], mode=None)
+
+    @mock.patch("battles.tasks._emit")
+    def test_live_runner_plays_many_battles_concurrently(self, emit):
+        battles = [Battle.objects.create(pokemon_a=a, pokemon_b=b, scenario=self.S)
+                   for a, b in [(self.A, self.B), (self.B, self.A), (self.A, self.B)]]
+        redis = mock.MagicMock()
+        runner = LiveRunner(tick=0.001, flush_interval=0.005, redis=redis)
+        async_to_sync(runner.run_many)([{"battle_id": b.id} for b in battles])
+
+        run_battle(Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S).id)
+        for b in battles:
+            b.refresh_from_db()
+            self.assertEqual(b.status, Battle.Status.FINISHED)
+            self.assertIsNotNone(self._find_turn_line(b.log, 1))
+            self.assertIn("Ganador", b.log.splitlines()[-1])
+        self.assertEqual(battles[0].log, Battle.objects.latest("id").log)
+        self.assertTrue(redis.pipeline.return_value.execute.called)
+
+    @mock.patch("battles.tasks._emit")
+    def test_live_runner_isolates_failed_writes_and_fails_interrupted_battles(self, emit):
+        good, bad = (Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S) for _ in range(2))
+        real_bulk_create = BattleTurn.objects.bulk_create
+
+        def bulk_create(turns, **kwargs):
+            if any(t.battle_id == bad.id for t in turns):
+                raise ValueError("fila inválida")
+            return real_bulk_create(turns, **kwargs)
+
+        runner = LiveRunner(tick=0.02, flush_interval=0.002, redis=mock.MagicMock())  # flush antes del siguiente turno
+        with mock.patch.object(BattleTurn.objects, "bulk_create", side_effect=bulk_create):
+            async_to_sync(runner.run_many)([{"battle_id": good.id}, {"battle_id": bad.id}])
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual((good.status, bad.status), (Battle.Status.FINISHED, Battle.Status.FAILED))
+        # el combate fallido no conserva un log a medias: solo el error
+        self.assertFalse(BattleTurn.objects.filter(battle=bad).exists())
+        self.assertEqual(bad.log_since(0), (["ERROR: fila inválida"], 0))
+
+        # cancelar a medio combate (runner detenido) no lo deja RUNNING
+        async def interrupted():
+            runner = LiveRunner(tick=10, redis=mock.MagicMock())
+            task = asyncio.ensure_future(runner.play(good.id))
+            while not runner.active:  # ya arrancado (_begin hecho), esperando el siguiente tick
+                await asyncio.sleep(0.005)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.flush()  # el último flush no reescribe las líneas del combate fallido
+        async_to_sync(interrupted)()
+        good.refresh_from_db()
+        self.assertEqual(good.status, Battle.Status.FAILED)
+        self.assertEqual(good.log_since(0), (["ERROR: Runner detenido con el combate en curso"], 0))
+
+    @mock.patch("battles.tasks._emit")
+    def test_failed_run_replaces_provisional_log_with_error(self, emit):
+        from .tasks import _fail
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S,
+                                       status=Battle.Status.RUNNING)
+        BattleTurn.objects.bulk_create([
+            BattleTurn(battle=battle, seq=0, line="cabecera"),
+            BattleTurn(battle=battle, seq=1, turn=1, line="t1"),
+        ])
+        _fail(battle.id, RuntimeError("boom"))
+        battle.refresh_from_db()
+        self.assertEqual(battle.status, Battle.Status.FAILED)
+        self.assertEqual(battle.log_since(0), (["ERROR: boom"], 0))
+        self.assertEqual(self.client.get(f"/api/battles/{battle.id}/log/").data["lines"], ["ERROR: boom"])
+
+    @mock.patch("battles.tasks._emit")
+    def test_finishing_battle_updates_leaderboard(self, emit):
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        run_battle(battle.id, mode="instant")
+        battle.refresh_from_db()
+        winner = PokemonRating.objects.get(pokemon=battle.winner)
+        self.assertEqual((winner.wins, winner.battles), (1, 1))
+        self.assertAlmostEqual(winner.rating, 1016.0)
+
+        resp = self.client.get("/api/leaderboard/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["results"][0]["pokemon"], battle.winner_id)
+        self.assertEqual(resp.data["results"][1]["rating"], 984.0)
+
+        # el rebuild reproduce cada ejecución con su ganador, también las estocásticas
+        run_battle(battle.id, mode="instant", seed=3)
+        run_battle(battle.id, mode="instant", seed=11)
+        # una última ejecución fallida deja winner=None, pero las anteriores siguen contando
+        with mock.patch("battles.tasks.outcomes.simulate", side_effect=RuntimeError("boom")), \
+                self.assertRaises(RuntimeError):
+            run_battle(battle.id, mode="instant")
+        incremental = {r.pokemon_id: (r.wins, r.losses, r.rating) for r in PokemonRating.objects.all()}
+        PokemonRating.objects.all().delete()
+        call_command("rebuild_ratings", stdout=io.StringIO())
+        rebuilt = {r.pokemon_id: (r.wins, r.losses, r.rating) for r in PokemonRating.objects.all()}
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for pokemon_id, (wins, losses, rating) in incremental.items():
+            self.assertEqual(rebuilt[pokemon_id][:2], (wins, losses))
+            self.assertAlmostEqual(rebuilt[pokemon_id][2], rating)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_catalog_lists_are_cached_until_catalog_changes(self):
+        from django.core.cache import caches
+        caches["catalog"].clear()
+        first = self.client.get("/api/pokemons/", {"page_size": 1}).data
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/pokemons/", {"page_size": 1}).data
+            self.client.get("/api/pokemons/", {"page_size": 1})
+        self.assertEqual(again, first)
+        self.assertEqual(first["max_stats"]["hp"], 45)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pokemon.objects.create(name="Snorlax", hp=160, attack=110, defense=65, speed=30)
+        fresh = self.client.get("/api/pokemons/", {"page_size": 1}).data
+        self.assertEqual((fresh["count"], fresh["max_stats"]["hp"]), (3, 160))
+
+        self.client.get("/api/scenarios/")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/scenarios/").data["count"], 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_battle_etag_answers_304_until_battle_changes(self):
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S)
+        url = f"/api/battles/{battle.id}/"
+        first = self.client.get(url)
+        etag = first["ETag"]
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((cached.status_code, cached["ETag"]), (304, etag))
+
+        listed = self.client.get("/api/battles/")
+        self.assertEqual(self.client.get("/api/battles/", HTTP_IF_NONE_MATCH=listed["ETag"]).status_code, 304)
+        # con cursor el ETag sale de la propia página: una sola consulta y sin COUNT
+        by_cursor = self.client.get("/api/battles/", {"pagination": "cursor"})
+        with self.assertNumQueries(1):
+            again = self.client.get("/api/battles/", {"pagination": "cursor"}, HTTP_IF_NONE_MATCH=by_cursor["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        battle.name = "Revancha"
+        battle.save(update_fields=["name"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get("/api/battles/", HTTP_IF_NONE_MATCH=listed["ETag"]).status_code, 200)
+        self.assertEqual(self.client.get("/api/battles/", {"pagination": "cursor"},
+                                         HTTP_IF_NONE_MATCH=by_cursor["ETag"]).status_code, 200)
+
+    def test_log_endpoint_returns_only_new_turns(self):
+        battle = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S,
+                                       status=Battle.Status.RUNNING, state={"hp_a": 35, "hp_b": 30})
+        BattleTurn.objects.bulk_create([
+            BattleTurn(battle=battle, seq=0, line="cabecera"),
+            BattleTurn(battle=battle, seq=1, turn=1, line="t1"),
+            BattleTurn(battle=battle, seq=2, turn=2, line="t2"),
+        ])
+        url = f"/api/battles/{battle.id}/log/"
+        live = self.client.get(url, {"since": 1}).data
+        self.assertEqual((live["lines"], live["next_since"], live["hp_b"]), (["t2"], 2, 30))
+        self.assertEqual(self.client.get(url).data["lines"], ["cabecera", "t1", "t2"])
+        self.assertEqual(self.client.get(url, {"since": 2}).data["lines"], [])
+        self.assertEqual(self.client.get(url, {"since": "x"}).status_code, 400)
+
+        battle.status = Battle.Status.PENDING
+        battle.save(update_fields=["status"])
+        with mock.patch("battles.tasks._emit"):
+            run_battle(battle.id, mode=Battle.Mode.INSTANT)
+        battle.refresh_from_db()
+        full = self.client.get(url).data
+        self.assertEqual("\n".join(full["lines"]), battle.log)
+        tail = self.client.get(url, {"since": full["next_since"] - 1}).data
+        self.assertEqual(tail["lines"], full["lines"][-3:])
+        self.assertEqual((tail["status"], tail["winner_name"]), (Battle.Status.FINISHED, battle.winner.name))
+        # al día: ni turnos ni cierre repetido
+        done = self.client.get(url, {"since": full["next_since"]}).data
+        self.assertEqual((done["lines"], done["next_since"]), ([], full["next_since"]))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_catalog_bulk_import_upserts_csv_and_ndjson(self):
+        csv_body = "name,hp,attack,defense,speed\nPikachu,50,55,40,90\nMew,100,100,100,100\nRoto,0,1,1,1\n"
+        with mock.patch("battles.imports.get_cache") as outcome_cache, \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.generic("POST", "/api/pokemons/import/", csv_body, content_type="text/csv")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data["created"], resp.data["updated"], resp.data["invalid"]), (1, 1, 1))
+        self.assertEqual(resp.data["errors"][0]["line"], 4)
+        self.assertEqual(Pokemon.objects.get(name="Pikachu").hp, 50)
+        outcome_cache.return_value.invalidate_many.assert_called_once_with("pokemon", [self.A.id])
+
+        ndjson = io.BytesIO(b'{"name": "Forest", "attack_modifier": 2}\n\n{"name": "Cave"}\nnope\n')
+        ndjson.name = "escenarios.ndjson"
+        with mock.patch("battles.imports.get_cache"):
+            data = self.client.post("/api/scenarios/import/", {"file": ndjson}, format="multipart").data
+        self.assertEqual((data["created"], data["updated"], data["invalid"]), (1, 1, 1))
+        self.assertEqual(Scenario.objects.get(name="Forest").attack_modifier, 2.0)
+        self.assertEqual(self.client.post("/api/pokemons/import/", {"x": 1}, format="json").status_code, 415)
+
+    @mock.patch("battles.tasks._emit")
+    def test_export_streams_filtered_history(self, emit):
+        import json
+        done = Battle.objects.create(pokemon_a=self.A, pokemon_b=self.B, scenario=self.S, mode=Battle.Mode.INSTANT)
+        run_battle(done.id)
+        done.refresh_from_db()
+        Battle.objects.create(pokemon_a=self.B, pokemon_b=self.A, scenario=self.S)
+
+        resp = self.client.get("/api/battles/export/")
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([r["id"] for r in rows], sorted(r["id"] for r in rows))
+        first = rows[0]
+        self.assertEqual((first["pokemon_a"], first["status"], first["winner"]), ("Pikachu", "FINISHED", done.winner.name))
+        self.assertEqual(first["turns"], len(done.log_since(0)[0]) - 5 - 2)
+        self.assertIsNone(rows[1]["turns"])
+
+        resp = self.client.get("/api/battles/export/", {"format": "csv", "status": "pending",
+                                                         "created_after": done.created_at.date().isoformat()})
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual((lines[0].split(",")[:3], len(lines)), (["id", "name", "status"], 2))
+        self.assertEqual(len(self.client.get("/api/battles/export/", {"created_before": "2000-01-01"}).getvalue()), 0)
+        self.assertEqual(self.client.get("/api/battles/export/", {"created_after": "ayer"}).status_code, 400)
+        # bien formada pero inexistente: 400, no 500
+        self.assertEqual(self.client.get("/api/battles/export/", {"created_after": "2026-02-30"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/battles/export/", {"created_before": "2026-01-01T25:00"}).status_code, 400)
+
+    def test_monte_carlo_matches_engine_without_variance_and_is_seeded(self):
+        from . import montecarlo
+        fa, fb = engine.fighter(self.A, self.S), engine.fighter(self.B, self.S)
+        exact = montecarlo.simulate(fa, fb, 50, seed=1, roll_min=1.0)
+        outcome = engine.resolve(fa, fb)
+        self.assertTrue((exact["turns"] == outcome.turns).all())
+        self.assertTrue((exact["hp_b"] == outcome.hp_b).all())
+
+        params = {"pokemon_a": self.A.id, "pokemon_b": self.B.id, "scenario": self.S.id, "n": 5000, "seed": 42}
+        first = self.client.get("/api/tournaments/simulate/", params).data
+        self.assertEqual(self.client.get("/api/tournaments/simulate/", params).data, first)
+        low, high = first["a_win_ci95"]
+        self.assertTrue(low <= first["a_win_probability"] <= high)
+        self.assertEqual(sum(bin["count"] for bin in first["turns"]["histogram"]), 5000)
+        self.assertEqual(self.client.get("/api/tournaments/simulate/", {**params, "n": 0}).status_code, 400)
+
+    @mock.patch("battles.tasks._emit")
+    def test_seeded_battle_is_reproducible(self, emit):
+        tank = Pokemon.objects.create(name="Snorlax", hp=300, attack=80, defense=40, speed=30)
+        logs = []
+        for _ in range(2):
+            battle = Battle.objects.create(pokemon_a=tank, pokemon_b=self.B, scenario=self.S, mode=Battle.Mode.INSTANT)
+            run_battle(battle.id, seed=7)
+            battle.refresh_from_db()
+            logs.append(battle.log)
+        self.assertEqual(logs[0], logs[1])
+        damages = {int(m) for m in re.findall(r"💥\s+(\d+)", logs[0])}
+        self.assertGreater(len(damages), 2)  # hay tirada de daño, no un valor fijo por lado
+
+    @override_settings(COUNTERS_INDEX_K=4)
+    def test_counters_index_matches_engine_and_updates_incrementally(self):
+        from . import counters
+        Pokemon.objects.create(name="Snorlax", hp=160, attack=110, defense=65, speed=30)
+        Pokemon.objects.create(name="Mewtwo", hp=106, attack=110, defense=90, speed=130)
+        Pokemon.objects.create(name="Onix", hp=35, attack=45, defense=160, speed=70)
+        call_command("rebuild_counters", stdout=io.StringIO())
+
+        def expected(target):
+            me = engine.fighter(target, self.S)
+            wins = []
+            for rival in Pokemon.objects.exclude(id=target.id):
+                o = engine.resolve(me, engine.fighter(rival, self.S))
+                if not o.a_wins:
+                    wins.append((o.turns, -o.hp_b, rival.id))
+            return [rid for _, _, rid in sorted(wins)[:4]]
+
+        url = f"/api/pokemons/{self.A.id}/counters/"
+        resp = self.client.get(url, {"scenario": self.S.id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([c["opponent"] for c in resp.data["counters"]], expected(self.A))
+        self.assertEqual(len(self.client.get(url, {"scenario": self.S.id, "k": 1}).data["counters"]), 1)
+        self.assertEqual(self.client.get(url, {"scenario": self.S.id, "k": 5}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {"scenario": 999}).status_code, 404)
+
+        # un Pokémon editado: solo se reescriben las listas afectadas y quedan como un rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.patch(f"/api/pokemons/{self.B.id}/", {"attack": 200, "speed": 200}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        incremental = set(PokemonCounter.objects.values_list("pokemon_id", "scenario_id", "rank", "opponent_id",
+                                                             "turns", "hp_left"))
+        counters_a = [c["opponent"] for c in self.client.get(url, {"scenario": self.S.id}).data["counters"]]
+        self.assertEqual(counters_a, expected(self.A))
+        self.assertIn(self.B.id, counters_a)
+        self.assertEqual(counters.rebuild(), 5)
+        self.assertEqual(set(PokemonCounter.objects.values_list("pokemon_id", "scenario_id", "rank", "opponent_id",
+                                                                "turns", "hp_left")), incremental)
+        self.assertEqual(counters.apply(pokemon_id=self.B.id), 0)
+
+        # borrar un counter recompacta las listas donde estaba (los rangos no quedan con huecos)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.B.delete()
+        after_delete = set(PokemonCounter.objects.values_list("pokemon_id", "scenario_id", "rank", "opponent_id",
+                                                              "turns", "hp_left"))
+        counters.rebuild()
+        self.assertEqual(set(PokemonCounter.objects.values_list("pokemon_id", "scenario_id", "rank", "opponent_id",
+                                                                "turns", "hp_left")), after_delete)
@@ -0,0 +1,167 @@
+# battles/tournament.py
+"""
+Round-robin vectorizado: todos los Pokémon contra todos en cada escenario.
+Aplica las mismas reglas que engine.resolve (daño, orden por velocidad, tope de turnos)
+pero sobre arrays de NumPy, por bloques de filas para acotar la memoria.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .engine import MAX_TURNS
+from .models import Pokemon, Scenario
+
+
+@dataclass
+class Catalog:
+    pokemon_ids: np.ndarray  # (N,)
+    names: list[str]
+    hp: np.ndarray           # (N,)
+    attack: np.ndarray
+    defense: np.ndarray
+    speed: np.ndarray
+    scenario_ids: np.ndarray  # (S,)
+    scenario_names: list[str]
+    attack_mod: np.ndarray    # (S,)
+    defense_mod: np.ndarray
+    speed_mod: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.pokemon_ids)
+
+    def scenario_index(self, scenario_id: int) -> int:
+        idx = np.flatnonzero(self.scenario_ids == scenario_id)
+        if not len(idx):
+            raise KeyError(scenario_id)
+        return int(idx[0])
+
+    def pokemon_index(self, pokemon_id: int) -> int:
+        idx = np.flatnonzero(self.pokemon_ids == pokemon_id)
+        if not len(idx):
+            raise KeyError(pokemon_id)
+        return int(idx[0])
+
+
+@dataclass
+class Block:
+    """Resultados de las filas [start, stop) como A contra todas las columnas como B."""
+    scenario: int
+    start: int
+    stop: int
+    a_wins: np.ndarray  # (rows, N) bool
+    turns: np.ndarray   # (rows, N) int
+    hp_a: np.ndarray
+    hp_b: np.ndarray
+
+
+def load_catalog(pokemons=None, scenarios=None) -> Catalog:
+    pokemons = Pokemon.objects.order_by("id") if pokemons is None else pokemons
+    scenarios = Scenario.objects.order_by("id") if scenarios is None else scenarios
+    p = list(pokemons.values_list("id", "name", "hp", "attack", "defense", "speed"))
+    s = list(scenarios.values_list("id", "name", "attack_modifier", "defense_modifier", "speed_modifier"))
+    pcols = list(zip(*p)) or [()] * 6
+    scols = list(zip(*s)) or [()] * 5
+    return Catalog(
+        pokemon_ids=np.array(pcols[0], dtype=np.int64),
+        names=list(pcols[1]),
+        hp=np.array(pcols[2], dtype=np.int64),
+        attack=np.array(pcols[3], dtype=np.float64),
+        defense=np.array(pcols[4], dtype=np.float64),
+        speed=np.array(pcols[5], dtype=np.float64),
+        scenario_ids=np.array(scols[0], dtype=np.int64),
+        scenario_names=list(scols[1]),
+        attack_mod=np.array(scols[2], dtype=np.float64),
+        defense_mod=np.array(scols[3], dtype=np.float64),
+        speed_mod=np.array(scols[4], dtype=np.float64),
+    )
+
+
+def resolve_block(cat: Catalog, s: int, start: int, stop: int, max_turns: int = MAX_TURNS) -> Block:
+    """Versión vectorizada de engine.resolve para las filas [start, stop) en el escenario s."""
+    a_wins, turns, hp_a, hp_b = _resolve(cat, s, slice(start, stop), slice(None), max_turns)
+    return Block(scenario=s, start=start, stop=stop, a_wins=a_wins, turns=turns, hp_a=hp_a, hp_b=hp_b)
+
+
+def resolve_pairs(cat: Catalog, s: int, rows, cols, max_turns: int = MAX_TURNS) -> dict[str, np.ndarray]:
+    """Como resolve_block con índices arbitrarios: filas `rows` como A contra columnas `cols` como B."""
+    a_wins, turns, hp_a, hp_b = _resolve(cat, s, rows, cols, max_turns)
+    return {"a_wins": a_wins, "turns": turns, "hp_a": hp_a, "hp_b": hp_b}
+
+
+def _resolve(cat: Catalog, s: int, rows, cols, max_turns: int):
+    atk = cat.attack * cat.attack_mod[s]
+    deff = cat.defense * cat.defense_mod[s]
+    spd = cat.speed * cat.speed_mod[s]
+
+    # np.rint redondea al par igual que round() de Python; int64: hp admite hasta 2^31-1 y 2*ko lo duplica
+    dmg_a = np.maximum(1, np.rint(atk[rows, None] - deff[None, cols])).astype(np.int64)
+    dmg_b = np.maximum(1, np.rint(atk[None, cols] - deff[rows, None])).astype(np.int64)
+    hp_a0 = cat.hp[rows, None]
+    hp_b0 = cat.hp[None, cols]
+
+    ko_by_a = -(-hp_b0 // dmg_a)
+    ko_by_b = -(-hp_a0 // dmg_b)
+    a_first = spd[rows, None] >= spd[None, cols]
+    turns = np.where(
+        a_first,
+        np.where(ko_by_a <= ko_by_b, 2 * ko_by_a - 1, 2 * ko_by_b),
+        np.where(ko_by_b <= ko_by_a, 2 * ko_by_b - 1, 2 * ko_by_a),
+    )
+    turns = np.where((hp_a0 <= 0) | (hp_b0 <= 0), 0, turns)
+    turns = np.minimum(turns, max_turns - 1)
+
+    first_hits, second_hits = (turns + 1) // 2, turns // 2
+    hits_a = np.where(a_first, first_hits, second_hits)
+    hits_b = np.where(a_first, second_hits, first_hits)
+    hp_a = np.maximum(0, hp_a0 - hits_b * dmg_b)
+    hp_b = np.maximum(0, hp_b0 - hits_a * dmg_a)
+    return hp_a > 0, turns, hp_a, hp_b
+
+
+def iter_blocks(cat: Catalog, scenarios=None, block_rows: int = 512):
+    """Recorre el tensor (S, N, N) por bloques de filas; nunca lo materializa entero."""
+    for s in (range(len(cat.scenario_ids)) if scenarios is None else scenarios):
+        for start in range(0, cat.size, block_rows):
+            yield resolve_block(cat, s, start, min(start + block_rows, cat.size))
+
+
+def outcome_tensor(cat: Catalog) -> dict[str, np.ndarray]:
+    """Tensor completo (S, N, N); solo para catálogos pequeños."""
+    shape = (len(cat.scenario_ids), cat.size, cat.size)
+    out = {
+        "a_wins": np.zeros(shape, dtype=bool),
+        "turns": np.zeros(shape, dtype=np.int64),
+        "hp_a": np.zeros(shape, dtype=np.int64),
+        "hp_b": np.zeros(shape, dtype=np.int64),
+    }
+    for block in iter_blocks(cat):
+        for key in out:
+            out[key][block.scenario, block.start:block.stop] = getattr(block, key)
+    return out
+
+
+def standings(cat: Catalog, scenarios=None, block_rows: int = 512) -> dict[str, np.ndarray]:
+    """
+    Victorias y derrotas por Pokémon sumando todos los emparejamientos ordenados
+    (cada par se juega como A-B y como B-A; los espejos i == i no cuentan).
+    """
+    n = cat.size
+    wins = np.zeros(n, dtype=np.int64)
+    played = np.zeros(n, dtype=np.int64)
+    turns_to_win = np.zeros(n, dtype=np.int64)
+    for block in iter_blocks(cat, scenarios, block_rows):
+        rows = np.arange(block.start, block.stop)
+        valid = np.ones_like(block.a_wins)
+        valid[rows - block.start, rows] = False
+        a_wins = block.a_wins & valid
+        b_wins = ~block.a_wins & valid
+        # como A (filas)
+        wins[block.start:block.stop] += a_wins.sum(axis=1)
+        turns_to_win[block.start:block.stop] += np.where(a_wins, block.turns, 0).sum(axis=1)
+        # como B (columnas)
+        wins += b_wins.sum(axis=0)
+        turns_to_win += np.where(b_wins, block.turns, 0).sum(axis=0)
+        played[block.start:block.stop] += valid.sum(axis=1)
+        played += valid.sum(axis=0)
+    return {"wins": wins, "losses": played - wins, "played": played, "turns_to_win": turns_to_win}
@@ -0,0 +1,116 @@
+# battles/turnlog.py
+"""
+Log de combate compacto: los turnos se guardan como registros binarios de ancho fijo
+(turno, lado atacante, daño, hp del defensor) comprimidos con zlib en Battle.turn_log.
+El texto con emojis solo se genera al pedirlo (detalle, SSE, endpoint de log).
+"""
+import struct
+import zlib
+
+from . import engine
+
+VERSION = 1
+# versión + stats efectivas (atk, def, spd) de A y de B, tal como se jugaron
+_HEADER = struct.Struct("<B6d")
+# n, ataca A (0/1), daño, hp del defensor tras el golpe
+_RECORD = struct.Struct("<HBii")
+
+START_APPEND = "🚀  ¡Comienza el combate!      daño     hp"
+
+
+# ------- Helpers de formateo de log (solo UX) -------
+def fmt_stats(side: str, name: str, atk: float, deff: float, spd: float) -> str:
+    # ⚙️ A(Pikachu)  ⚔️ 66.0  🛡️ 40.0  ⚡ 90.0
+    return (f"⚙️  Estadísticas {side}({name})  "
+            f"⚔️ {atk:.1f}  🛡️ {deff:.1f}  ⚡ {spd:.1f}")
+
+
+def fmt_turn(n: int, attacker: str, defender: str, damage: int, hp_defender: int, name_w: int) -> str:
+    # # 01 │ Pikachu → Bulbasaur   💥  17   ❤️  28
+    num = f"{n:>2}"
+    atk = f"{attacker:<{name_w}}"
+    dfn = f"{defender:<{name_w}}"
+    dmg = f"{damage:>3}"
+    hp  = f"{hp_defender:>3}"
+    return f"Turno #{num} │ {atk} → {dfn}   💥 {dmg}   ❤️ {hp}"
+
+
+def fmt_turn_obj(t, name_a: str, name_b: str, name_w: int) -> str:
+    attacker, defender = (name_a, name_b) if t.a_attacks else (name_b, name_a)
+    return fmt_turn(t.n, attacker, defender, t.damage, t.hp_defender, name_w)
+
+
+def sep(width: int = 64) -> str:
+    return "─" * width
+
+
+def name_width(name_a: str, name_b: str) -> int:
+    # Ancho para columnas de nombres
+    return max(len(name_a or "A"), len(name_b or "B"), 3)
+# -----------------------------------------------------
+
+
+class Record:
+    """Turno decodificado del blob; lo justo para volver a pintar la línea."""
+    __slots__ = ("n", "a_attacks", "damage", "hp_defender")
+
+    def __init__(self, n: int, a_attacks: bool, damage: int, hp_defender: int):
+        self.n, self.a_attacks, self.damage, self.hp_defender = n, a_attacks, damage, hp_defender
+
+
+def encode(fa: engine.Fighter, fb: engine.Fighter, turns) -> bytes:
+    parts = [_HEADER.pack(VERSION, fa.atk, fa.deff, fa.spd, fb.atk, fb.deff, fb.spd)]
+    parts.extend(_RECORD.pack(t.n, int(t.a_attacks), t.damage, t.hp_defender) for t in turns)
+    return zlib.compress(b"".join(parts), 6)
+
+
+def decode(blob: bytes) -> tuple[tuple[float, ...], list[Record]]:
+    """(stats de A y B, registros) a partir de Battle.turn_log."""
+    raw = zlib.decompress(bytes(blob))
+    version, *stats = _HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise ValueError(f"Versión de turn_log desconocida: {version}")
+    records = [Record(n, bool(a), d, hp) for n, a, d, hp in _RECORD.iter_unpack(raw[_HEADER.size:])]
+    return tuple(stats), records
+
+
+def turn_count(blob: bytes) -> int:
+    """Número de turnos guardados, sin construir los registros."""
+    return (len(zlib.decompress(bytes(blob))) - _HEADER.size) // _RECORD.size
+
+
+def header_lines(scenario_name: str, name_a: str, name_b: str, stats) -> list[str]:
+    atk_a, def_a, spd_a, atk_b, def_b, spd_b = stats
+    return [
+        f"🗺️  Escenario: {scenario_name}",
+        fmt_stats("A", name_a, atk_a, def_a, spd_a),
+        fmt_stats("B", name_b, atk_b, def_b, spd_b),
+        sep(),
+        "🚀  ¡Comienza el combate!",
+    ]
+
+
+def footer_lines(winner_name: str) -> list[str]:
+    return [sep(), f"🏆  Ganador: {winner_name}"]
+
+
+def render(battle) -> list[str]:
+    """Líneas del log de un combate terminado, pintadas a partir de su turn_log."""
+    return render_since(battle, 0)[0]
+
+
+def render_since(battle, since: int) -> tuple[list[str], int]:
+    """
+    Líneas de los turnos posteriores a `since` (la cabecera solo con since=0; el cierre
+    solo si hay turnos nuevos, para no repetirlo en cada sondeo) y el número del último turno.
+    """
+    stats, records = decode(battle.turn_log)
+    name_a, name_b = battle.pokemon_a.name, battle.pokemon_b.name
+    w = name_width(name_a, name_b)
+    lines = header_lines(battle.scenario.name, name_a, name_b, stats) if since <= 0 else []
+    lines.extend(fmt_turn_obj(r, name_a, name_b, w) for r in records if r.n > since)
+    last = records[-1].n if records else 0
+    if since <= 0 or since < last:
+        winner = name_a if (battle.state or {}).get("hp_a", 0) > 0 else name_b
+        lines.extend(footer_lines(winner))
+    return lines, last
@@ -1,9 +1,17 @@
+from django.urls import path
 from rest_framework import routers
-from .views import PokemonViewSet, ScenarioViewSet, BattleViewSet
+from .views import (
+    PokemonViewSet, ScenarioViewSet, BattleViewSet, TournamentViewSet, OutcomeCacheStatsView,
+    LeaderboardViewSet,
+)
 
 router = routers.DefaultRouter()
 router.register(r"pokemons", PokemonViewSet)
 router.register(r"scenarios", ScenarioViewSet)
 router.register(r"battles", BattleViewSet)
+router.register(r"tournaments", TournamentViewSet, basename="tournament")
+router.register(r"leaderboard", LeaderboardViewSet, basename="leaderboard")
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path("outcome-cache/", OutcomeCacheStatsView.as_view(), name="outcome-cache"),
+]
@@ -1,5 +1,9 @@
 from .pokemon import PokemonViewSet
 from .scenario import ScenarioViewSet
 from .battle import BattleViewSet
+from .tournament import TournamentViewSet
+from .cache import OutcomeCacheStatsView
+from .leaderboard import LeaderboardViewSet
+from .metrics import metrics_view
 
-__all__ = ["PokemonViewSet", "ScenarioViewSet", "BattleViewSet"]
+__all__ = ["PokemonViewSet", "ScenarioViewSet", "BattleViewSet", "TournamentViewSet", "OutcomeCacheStatsView", "LeaderboardViewSet", "metrics_view"]
@@ -1,11 +1,17 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.pagination import PageNumberPagination
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from croniter import croniter
-from django.conf import settings
-import json
 
 from ..models import Battle
 from ..serializers import (
@@ -14,43 +20,83 @@ from ..serializers import (
     BattleWriteSerializer,
 )
 from ..tasks import run_battle
+from ..pagination import BattleCursorPagination
+from .. import bulk, etags, export
+from ..metrics import TimedViewMixin
+
+def _filter_status(qs, status: str):
+    status = (status or "").strip().upper()
+    if status == Battle.Status.SCHEDULED:
+        return qs.filter(scheduled_cron__isnull=False).exclude(status=Battle.Status.RUNNING)
+    if status in dict(Battle.Status.choices):
+        return qs.filter(status=status)
+    return qs
+
+def _parse_when(raw: str, end: bool = False):
+    """
+    Fecha/hora ISO; una fecha sola cubre el día entero (inicio, o fin si `end`).
+    None si no es válida, también si tiene buen formato pero no existe (2026-02-30).
+    """
+    try:
+        dt = parse_datetime(raw)
+        if dt is None and (day := parse_date(raw)) is not None:
+            dt = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    except ValueError:
+        return None
+    if dt is not None and timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+def _requested_mode(request, default: str | None):
+    """Modo pedido en el body (o `default`); "" si no hay ninguno y None si no es válido."""
+    raw = request.data.get("mode") or default or ""
+    if not isinstance(raw, str):
+        return None
+    mode = raw.strip().upper()
+    return mode if mode == "" or mode in Battle.Mode.values else None
 
-# helper para crear/actualizar el PeriodicTask
-def _upsert_periodic_task_for_battle(battle):
-    from django_celery_beat.models import CrontabSchedule, PeriodicTask
-
-    minute, hour, dom, month, dow = battle.scheduled_cron.split()
-    schedule, _ = CrontabSchedule.objects.get_or_create(
-        minute=minute, hour=hour, day_of_week=dow,
-        day_of_month=dom, month_of_year=month,
-        timezone=getattr(settings, "TIME_ZONE", "UTC"),
-    )
-    PeriodicTask.objects.update_or_create(
-        name=f"battle-{battle.id}",
-        defaults={
-            "crontab": schedule,
-            "task": "battles.tasks.run_battle",
-            "args": json.dumps([battle.id]),
-            "kwargs": json.dumps({"source": "cron"}), 
-            "enabled": True,
-        },
-    )
-
-class BattleViewSet(ModelViewSet):
-    queryset = Battle.objects.select_related("pokemon_a","pokemon_b","scenario","winner").order_by("-created_at")
-    filter_backends = [SearchFilter]
+def _invalid_mode():
+    return Response({"mode": [f"Modo inválido; usa uno de {', '.join(Battle.Mode.values)}"]}, status=400)
+
+class BattleViewSet(TimedViewMixin, ModelViewSet):
+    queryset = Battle.objects.select_related("pokemon_a","pokemon_b","scenario","winner").order_by("-created_at", "-id")
+    filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ["status"]
+    # ?ordering=next_run_at → "próximos a ejecutarse" por índice
+    ordering_fields = ["created_at", "next_run_at"]
 
     def get_queryset(self):
         qs = super().get_queryset()
-        status = (self.request.query_params.get("status") or "").strip().upper()
-        if status:
-            if status == Battle.Status.SCHEDULED:
-                qs = qs.filter(scheduled_cron__isnull=False).exclude(status=Battle.Status.RUNNING)
-            elif status in dict(Battle.Status.choices):
-                qs = qs.filter(status=status)
+        if self.action == "list":
+            # el listado no usa el log: no se lee de la DB
+            qs = qs.defer("turn_log", "log_text")
+        qs = _filter_status(qs, self.request.query_params.get("status"))
+        # ?next_run_before=<iso> / ?next_run_after=<iso>
+        for param, lookup in (("next_run_before", "next_run_at__lte"), ("next_run_after", "next_run_at__gte")):
+            raw = self.request.query_params.get(param)
+            if raw:
+                dt = _parse_when(raw, end=param == "next_run_before")
+                if dt is None:
+                    raise ValidationError({param: "Fecha inválida (ISO 8601)"})
+                qs = qs.filter(**{lookup: dt})
+        if self.request.query_params.get("ordering", "").lstrip("-") == "next_run_at":
+            qs = qs.filter(next_run_at__isnull=False)
         return qs
 
+    @property
+    def paginator(self):
+        """
+        Paginación por número de página (por defecto) o por cursor con
+        ?pagination=cursor (o al seguir un enlace con ?cursor=...).
+        """
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if "cursor" in params or params.get("pagination") == "cursor":
+                self._paginator = BattleCursorPagination()
+            else:
+                self._paginator = PageNumberPagination()
+        return self._paginator
+
     def create(self, request, *args, **kwargs):
         write = BattleWriteSerializer(data=request.data)
         write.is_valid(raise_exception=True)
@@ -58,8 +104,7 @@ class BattleViewSet(ModelViewSet):
 
         if battle.scheduled_cron:  # si vino cron
             battle.status = Battle.Status.SCHEDULED
-            battle.save(update_fields=["status"])
-            _upsert_periodic_task_for_battle(battle)
+            battle.save(update_fields=["status"])  # lo lanza dispatch_due_battles
 
         else:
             battle.status = Battle.Status.PENDING
@@ -67,6 +112,27 @@ class BattleViewSet(ModelViewSet):
 
         return Response(BattleDetailSerializer(battle).data, status=status.HTTP_201_CREATED)
 
+    def list(self, request, *args, **kwargs):
+        # GET condicional: la versión sale de las filas de la página, antes de serializar
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        # con página por número el total va en la respuesta; con cursor no hay COUNT
+        counted = getattr(getattr(self.paginator, "page", None), "paginator", None)
+        total = counted.count if page is not None and counted is not None else None
+        etag = etags.for_list(rows, request, total)
+        if etags.matches(request, etag):
+            return etags.not_modified(etag)
+        data = self.get_serializer(rows, many=True).data
+        response = Response(data) if page is None else self.get_paginated_response(data)
+        return etags.tag(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = etags.for_battle(Battle.objects.all(), kwargs["pk"])
+        if etags.matches(request, etag):
+            return etags.not_modified(etag)
+        return etags.tag(super().retrieve(request, *args, **kwargs), etag)
+
     def get_serializer_class(self):
         if self.action == "list":
             return BattleListSerializer
@@ -79,8 +145,125 @@ class BattleViewSet(ModelViewSet):
         battle = self.get_object()
         if battle.status == Battle.Status.RUNNING:
             return Response({"detail": "Battle ya en ejecución"}, status=409)
-        task = run_battle.delay(battle.id, source="manual")
-        return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+        mode = _requested_mode(request, battle.mode)
+        if mode is None:
+            return _invalid_mode()
+        # "seed" (entero) juega con el modelo estocástico, reproducible con esa semilla
+        seed = request.data.get("seed")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            return Response({"seed": ["Debe ser un entero"]}, status=400)
+        task = run_battle.delay(battle.id, source="manual", mode=mode, enqueued_at=time.time(), seed=seed)
+        return Response({"task_id": task.id, "seed": seed}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"], url_path="log")
+    def log(self, request, pk=None):
+        """
+        Log incremental para sondeos sin SSE: ?since=<turno> devuelve solo las líneas
+        posteriores, el estado y hp actuales, y `next_since` para la siguiente llamada.
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            since = -1
+        if since < 0:
+            return Response({"since": ["Debe ser un entero >= 0"]}, status=400)
+
+        battle = self.get_object()
+        lines, last = battle.log_since(since)
+        state = battle.state or {}
+        return Response({
+            "id": battle.id,
+            "status": battle.status,
+            "hp_a": state.get("hp_a"),
+            "hp_b": state.get("hp_b"),
+            "winner_name": battle.winner.name if battle.winner_id else None,
+            "since": since,
+            "next_since": last,
+            "lines": lines,
+        })
+
+    @action(detail=False, methods=["get"], url_path="export",
+            renderer_classes=[export.NDJSONRenderer, export.CSVRenderer])
+    def export_battles(self, request):
+        """
+        Histórico completo en streaming, NDJSON (por defecto) o CSV con ?format=csv.
+        Filtros: status, scenario, created_after / created_before (ISO; una fecha sola = día entero).
+        """
+        qs = _filter_status(Battle.objects.all(), request.query_params.get("status"))
+        scenario = request.query_params.get("scenario")
+        if scenario:
+            if not scenario.isdigit():
+                return Response({"scenario": "Debe ser un id"}, status=400)
+            qs = qs.filter(scenario_id=int(scenario))
+        for param, lookup in (("created_after", "created_at__gte"), ("created_before", "created_at__lt")):
+            raw = request.query_params.get(param)
+            if raw:
+                dt = _parse_when(raw, end=param == "created_before")
+                if dt is None:
+                    return Response({param: "Fecha inválida (ISO 8601)"}, status=400)
+                qs = qs.filter(**{lookup: dt})
+        return export.stream(request._request, qs, request.accepted_renderer.format)
+
+    @action(detail=False, methods=["post"], url_path="execute-bulk")
+    def execute_bulk(self, request):
+        """
+        Lanza muchos combates en un único group de Celery.
+        Body: {"ids": [...]} o filtros {"status": ..., "scenario": ...}; opcional "mode"
+        (si no viene, cada combate usa su modo por defecto). Como mucho BATTLE_BULK_MAX
+        combates por llamada: con filtros se lanzan los primeros por id y se indica
+        `truncated`.
+        """
+        limit = getattr(settings, "BATTLE_BULK_MAX", 10000)
+        ids = request.data.get("ids")
+        qs = Battle.objects.all()
+        if ids is not None:
+            # bool es subclase de int: true/false no son ids
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return Response({"ids": ["Debe ser una lista de enteros"]}, status=400)
+            if len(ids) > limit:
+                return Response({"ids": [f"Como mucho {limit} ids por llamada"]}, status=400)
+            qs = qs.filter(id__in=ids)
+        else:
+            flt_status, scenario = request.data.get("status"), request.data.get("scenario")
+            if not flt_status and not scenario:
+                return Response({"detail": "Indica ids o algún filtro (status, scenario)"}, status=400)
+            qs = _filter_status(qs, flt_status)
+            if scenario:
+                if isinstance(scenario, bool) or not (isinstance(scenario, int) or str(scenario).isdigit()):
+                    return Response({"scenario": "Debe ser un id"}, status=400)
+                qs = qs.filter(scenario_id=int(scenario))
+            qs = qs.order_by("id")[:limit + 1]
+
+        mode = _requested_mode(request, None)
+        if mode is None:
+            return _invalid_mode()
+
+        # Validación de todo el lote en una sola consulta
+        rows = list(qs.values_list("id", "status"))
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+        runnable = [bid for bid, st in rows if st != Battle.Status.RUNNING]
+        running = [bid for bid, st in rows if st == Battle.Status.RUNNING]
+        not_found = sorted(set(ids) - {bid for bid, _ in rows}) if ids is not None else []
+        if not runnable:
+            return Response({"detail": "Ningún combate ejecutable", "running": running,
+                             "not_found": not_found}, status=409)
+
+        group_id = bulk.dispatch(runnable, mode=mode or None)
+        return Response({
+            "group_id": group_id,
+            "total": len(runnable),
+            "running": running,
+            "not_found": not_found,
+            "truncated": truncated,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path=r"execute-bulk/(?P<group_id>[0-9a-f-]+)")
+    def execute_bulk_progress(self, request, group_id=None):
+        data = bulk.progress(group_id)
+        if data is None:
+            return Response({"detail": "Lote desconocido o expirado"}, status=404)
+        return Response({"group_id": group_id, **data})
 
     @action(detail=True, methods=["post"], url_path="schedule")
     def schedule(self, request, pk=None):
@@ -95,9 +278,6 @@ class BattleViewSet(ModelViewSet):
             if battle.status == Battle.Status.SCHEDULED:
                 battle.status = Battle.Status.PENDING
             battle.save(update_fields=["scheduled_cron", "status"])
-            if getattr(settings, "USE_DJANGO_CELERY_BEAT", False):
-                from django_celery_beat.models import PeriodicTask
-                PeriodicTask.objects.filter(name=f"battle-{battle.id}").delete()
             return Response(BattleDetailSerializer(battle).data, status=200)
 
         try:
@@ -107,9 +287,7 @@ class BattleViewSet(ModelViewSet):
 
         battle.scheduled_cron = expr
         battle.status = Battle.Status.SCHEDULED
+        # save() recalcula next_run_at; el barrido por minuto hace el resto
         battle.save(update_fields=["scheduled_cron", "status"])
 
-        if getattr(settings, "USE_DJANGO_CELERY_BEAT", False):
-            _upsert_periodic_task_for_battle(battle)
-
         return Response(BattleDetailSerializer(battle).data, status=200)
@@ -0,0 +1,12 @@
+# battles/views/cache.py
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..outcomes import get_cache
+
+
+class OutcomeCacheStatsView(APIView):
+    """Aciertos / fallos de la caché de resultados (este proceso y agregado en Redis)."""
+
+    def get(self, request):
+        return Response(get_cache().shared_stats())
@@ -0,0 +1,14 @@
+# battles/views/leaderboard.py
+from rest_framework import mixins, viewsets
+
+from ..models import PokemonRating
+from ..serializers import PokemonRatingSerializer
+from ..pagination import DefaultPagination
+from ..metrics import TimedViewMixin
+
+
+class LeaderboardViewSet(TimedViewMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Ranking Elo leído del agregado PokemonRating (índice por rating), sin recorrer Battle."""
+    queryset = PokemonRating.objects.select_related("pokemon").order_by("-rating", "pokemon_id")
+    serializer_class = PokemonRatingSerializer
+    pagination_class = DefaultPagination
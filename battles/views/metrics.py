@@ -0,0 +1,15 @@
+# battles/views/metrics.py
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .. import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """Métricas agregadas de todos los procesos, en formato de texto de Prometheus."""
+    try:
+        body = metrics.exposition()
+    except Exception as exc:
+        return HttpResponse(f"# metrics unavailable: {exc}\n", status=503, content_type="text/plain")
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,25 @@
+# battles/views/params.py
+"""Lectura de query params numéricos compartida por los viewsets (errores como 400 de DRF)."""
+from rest_framework.exceptions import ValidationError
+
+
+def int_param(request, name: str, required: bool = False) -> int | None:
+    raw = (request.query_params.get(name) or "").strip()
+    if not raw:
+        if required:
+            raise ValidationError({name: ["Este parámetro es obligatorio."]})
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValidationError({name: ["Debe ser un entero."]})
+
+
+def float_param(request, name: str, default: float) -> float:
+    raw = (request.query_params.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValidationError({name: ["Debe ser un número."]})
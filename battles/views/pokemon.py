@@ -1,41 +1,94 @@
 # battles/views/pokemon.py
+from django.conf import settings
 from django.db.models import Max
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.filters import SearchFilter
 from rest_framework.response import Response
 
+from .. import catalog
+from ..models import PokemonCounter, Scenario
 from ..models.pokemon import Pokemon
 from ..serializers import PokemonSerializer
 from ..pagination import DefaultPagination
+from ..metrics import TimedViewMixin
+from ..imports import ImportViewMixin
+from .params import int_param
 
 
-class PokemonViewSet(viewsets.ModelViewSet):
+class PokemonViewSet(TimedViewMixin, ImportViewMixin, viewsets.ModelViewSet):
     queryset = Pokemon.objects.all().order_by("id")
     serializer_class = PokemonSerializer
     pagination_class = DefaultPagination
     filter_backends = [SearchFilter]
     search_fields = ["name"]
+    import_kind = "pokemon"  # POST /import/ (CSV o NDJSON, ver battles.imports)
 
     def list(self, request, *args, **kwargs):
         """
         Pagina el queryset filtrado y añade máximos globales (hp/atk/def/spd)
         para que el front pinte barras a escala del conjunto actual.
+        La respuesta se cachea por versión del catálogo + query params.
         """
+        return Response(catalog.cached("pokemons", request, lambda: self._build_list(request)))
+
+    def _max_stats(self, queryset) -> dict:
+        # el agregado depende solo del filtro (search), no de la página
+        search = self.request.query_params.get("search", "")
+        key = f"pokemons:max_stats:{search}"
+
+        def build():
+            agg = queryset.aggregate(
+                max_hp=Max("hp"),
+                max_attack=Max("attack"),
+                max_defense=Max("defense"),
+                max_speed=Max("speed"),
+            )
+            return {
+                "hp": agg["max_hp"] or 1,
+                "attack": agg["max_attack"] or 1,
+                "defense": agg["max_defense"] or 1,
+                "speed": agg["max_speed"] or 1,
+            }
+        return catalog.cached_value(key, build)
+
+    def _build_list(self, request) -> dict:
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
-
-        agg = queryset.aggregate(
-            max_hp=Max("hp"),
-            max_attack=Max("attack"),
-            max_defense=Max("defense"),
-            max_speed=Max("speed"),
-        )
         paginated = self.get_paginated_response(serializer.data).data
-        paginated["max_stats"] = {
-            "hp": agg["max_hp"] or 1,
-            "attack": agg["max_attack"] or 1,
-            "defense": agg["max_defense"] or 1,
-            "speed": agg["max_speed"] or 1,
-        }
-        return Response(paginated)
+        paginated["max_stats"] = self._max_stats(queryset)
+        return paginated
+
+    @action(detail=True, methods=["get"], url_path="counters")
+    def counters(self, request, pk=None):
+        """
+        GET /api/pokemons/<id>/counters/?scenario=<id>&k=<n>
+        Los k rivales que más rápido le ganan en ese escenario, leídos del índice
+        precalculado (battles.counters); k no puede pasar de COUNTERS_INDEX_K.
+        """
+        pokemon = self.get_object()
+        scenario_id = int_param(request, "scenario", required=True)
+        limit = getattr(settings, "COUNTERS_INDEX_K", 20)
+        k = int_param(request, "k")
+        k = limit if k is None else k
+        if not 1 <= k <= limit:
+            raise ValidationError({"k": [f"Debe estar entre 1 y {limit}."]})
+        if not Scenario.objects.filter(id=scenario_id).exists():
+            raise NotFound(f"Escenario {scenario_id} no existe")
+
+        rows = (PokemonCounter.objects
+                .filter(pokemon_id=pokemon.id, scenario_id=scenario_id, rank__lt=k)
+                .order_by("rank")
+                .values_list("rank", "opponent_id", "opponent__name", "turns", "hp_left"))
+        return Response({
+            "pokemon": pokemon.id,
+            "pokemon_name": pokemon.name,
+            "scenario": scenario_id,
+            "k": k,
+            "counters": [
+                {"rank": rank, "opponent": opp, "opponent_name": name, "turns": turns, "hp_left": hp}
+                for rank, opp, name, turns, hp in rows
+            ],
+        })
@@ -1,15 +1,25 @@
 # battles/views/scenario.py
 from rest_framework import viewsets
 from rest_framework.filters import SearchFilter
+from rest_framework.response import Response
 
+from .. import catalog
 from ..models import Scenario
 from ..serializers import ScenarioSerializer
 from ..pagination import DefaultPagination
+from ..metrics import TimedViewMixin
+from ..imports import ImportViewMixin
 
 
-class ScenarioViewSet(viewsets.ModelViewSet):
+class ScenarioViewSet(TimedViewMixin, ImportViewMixin, viewsets.ModelViewSet):
     queryset = Scenario.objects.all().order_by("id")
     serializer_class = ScenarioSerializer
     pagination_class = DefaultPagination
     filter_backends = [SearchFilter]
     search_fields = ["name"]
+    import_kind = "scenario"  # POST /import/ (CSV o NDJSON, ver battles.imports)
+
+    def list(self, request, *args, **kwargs):
+        # Cacheado por versión del catálogo + query params (cambia casi nunca)
+        return Response(catalog.cached("scenarios", request,
+                                       lambda: super(ScenarioViewSet, self).list(request, *args, **kwargs).data))
@@ -0,0 +1,139 @@
+# battles/views/tournament.py
+import secrets
+
+from django.conf import settings
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+
+from .. import catalog
+from ..pagination import DefaultPagination
+from ..metrics import TimedViewMixin
+from .params import float_param, int_param
+
+
+class TournamentViewSet(TimedViewMixin, viewsets.ViewSet):
+    """
+    Round-robin de todo el catálogo calculado en bloque (NumPy) con las reglas de run_battle.
+    - GET /api/tournaments/?scenario=<id>           → clasificación (paginada; cacheada por versión del catálogo)
+    - GET /api/tournaments/matchups/?pokemon=<id>   → resultado de <id> como A contra cada rival
+    - GET /api/tournaments/simulate/?pokemon_a=&pokemon_b=&scenario=&n=&seed=&roll_min=
+                                                    → Monte Carlo del emparejamiento (modelo estocástico)
+    """
+    pagination_class = DefaultPagination
+
+    def _load(self, request):
+        # Import perezoso: NumPy solo hace falta en estos endpoints
+        from .. import tournament
+        cat = tournament.load_catalog()
+        scenario_id = int_param(request, "scenario")
+        if scenario_id is None:
+            return tournament, cat, None
+        try:
+            return tournament, cat, [cat.scenario_index(scenario_id)]
+        except KeyError:
+            raise NotFound(f"Escenario {scenario_id} no existe")
+
+    def list(self, request):
+        # el tensor S×N×N es caro: la clasificación se cachea por versión del catálogo
+        scenario_id = int_param(request, "scenario")
+        data = catalog.cached_value(f"tournament:standings:{scenario_id or 'all'}",
+                                    lambda: self._standings(request))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(data["rows"], request, view=self)
+        response = paginator.get_paginated_response(page).data
+        response["scenarios"] = data["scenarios"]
+        return Response(response)
+
+    def _standings(self, request) -> dict:
+        tournament, cat, scenarios = self._load(request)
+        table = tournament.standings(cat, scenarios)
+        rows = []
+        for i in range(cat.size):
+            wins, played = int(table["wins"][i]), int(table["played"][i])
+            rows.append({
+                "pokemon": int(cat.pokemon_ids[i]),
+                "pokemon_name": cat.names[i],
+                "wins": wins,
+                "losses": int(table["losses"][i]),
+                "played": played,
+                "win_rate": round(wins / played, 4) if played else 0.0,
+                "avg_turns_to_win": round(int(table["turns_to_win"][i]) / wins, 2) if wins else None,
+            })
+        rows.sort(key=lambda r: (-r["wins"], r["pokemon"]))
+        return {
+            "rows": rows,
+            "scenarios": [
+                {"id": int(cat.scenario_ids[s]), "name": cat.scenario_names[s]}
+                for s in (scenarios if scenarios is not None else range(len(cat.scenario_ids)))
+            ],
+        }
+
+    @action(detail=False, methods=["get"], url_path="matchups")
+    def matchups(self, request):
+        tournament, cat, scenarios = self._load(request)
+        pokemon_id = int_param(request, "pokemon", required=True)
+        try:
+            i = cat.pokemon_index(pokemon_id)
+        except KeyError:
+            raise NotFound(f"Pokémon {pokemon_id} no existe")
+
+        results = []
+        for s in (scenarios if scenarios is not None else range(len(cat.scenario_ids))):
+            block = tournament.resolve_block(cat, s, i, i + 1)
+            for j in range(cat.size):
+                if j == i:
+                    continue
+                a_wins = bool(block.a_wins[0, j])
+                results.append({
+                    "scenario": int(cat.scenario_ids[s]),
+                    "scenario_name": cat.scenario_names[s],
+                    "opponent": int(cat.pokemon_ids[j]),
+                    "opponent_name": cat.names[j],
+                    "winner": pokemon_id if a_wins else int(cat.pokemon_ids[j]),
+                    "turns": int(block.turns[0, j]),
+                    "hp_a": int(block.hp_a[0, j]),
+                    "hp_b": int(block.hp_b[0, j]),
+                })
+        return Response({"pokemon": pokemon_id, "pokemon_name": cat.names[i], "results": results})
+
+    @action(detail=False, methods=["get"], url_path="simulate")
+    def simulate(self, request):
+        from .. import engine, montecarlo
+        from ..models import Pokemon, Scenario
+
+        ids = {name: int_param(request, name, required=True) for name in ("pokemon_a", "pokemon_b", "scenario")}
+        n = int_param(request, "n")
+        n = getattr(settings, "MONTECARLO_DEFAULT_SIMULATIONS", 10_000) if n is None else n
+        limit = getattr(settings, "MONTECARLO_MAX_SIMULATIONS", 200_000)
+        if not 1 <= n <= limit:
+            raise ValidationError({"n": [f"Debe estar entre 1 y {limit}."]})
+        roll_min = float_param(request, "roll_min", engine.DAMAGE_ROLL_MIN)
+        if not 0.0 < roll_min <= 1.0:
+            raise ValidationError({"roll_min": ["Debe estar en (0, 1]."]})
+        seed = int_param(request, "seed")
+        if seed is not None and seed < 0:
+            raise ValidationError({"seed": ["Debe ser >= 0."]})
+        if seed is None:
+            # se devuelve para poder repetir exactamente la simulación
+            seed = secrets.randbits(32)
+
+        pokemons = Pokemon.objects.in_bulk([ids["pokemon_a"], ids["pokemon_b"]])
+        scenario = Scenario.objects.filter(id=ids["scenario"]).first()
+        for name in ("pokemon_a", "pokemon_b"):
+            if ids[name] not in pokemons:
+                raise NotFound(f"Pokémon {ids[name]} no existe")
+        if scenario is None:
+            raise NotFound(f"Escenario {ids['scenario']} no existe")
+
+        a, b = pokemons[ids["pokemon_a"]], pokemons[ids["pokemon_b"]]
+        result = montecarlo.simulate(engine.fighter(a, scenario), engine.fighter(b, scenario),
+                                     n, seed=seed, roll_min=roll_min)
+        return Response({
+            "pokemon_a": a.id, "pokemon_a_name": a.name,
+            "pokemon_b": b.id, "pokemon_b_name": b.name,
+            "scenario": scenario.id, "scenario_name": scenario.name,
+            "seed": seed, "roll_min": roll_min,
+            **montecarlo.summarize(result),
+        })
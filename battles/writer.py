@@ -0,0 +1,151 @@
+# battles/writer.py
+"""
+Escritor único por proceso: las escrituras de run_battle (lotes de turnos, estado,
+cierre) se encolan y un hilo las aplica agrupadas en pocas transacciones.
+
+Con SQLite solo puede escribir una conexión a la vez; en lugar de que cada task
+compita por el lock (y acabe en "database is locked"), los tasks de un worker
+--pool threads comparten este hilo. BATTLE_DB_WRITER="inline" ejecuta cada
+escritura en el hilo que la pide (tests, depuración).
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class InlineWriter:
+    """Misma interfaz que BatchWriter, sin hilo ni agrupación."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        fut = Future()
+        try:
+            with transaction.atomic():
+                fut.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    def call(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        pass
+
+
+class BatchWriter:
+    """
+    Cola FIFO de escrituras aplicada por un único hilo. Cada ciclo toma hasta
+    `max_batch` operaciones (o las que lleguen en `flush_interval` segundos) y las
+    ejecuta en una sola transacción; si una falla, el lote se repite operación a
+    operación para que el error solo afecte a quien la pidió.
+    """
+
+    def __init__(self, max_batch: int = 200, flush_interval: float = 0.02):
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Encola la escritura; el Future se resuelve cuando su transacción hace commit."""
+        fut = Future()
+        self._ensure_thread()
+        self._queue.put((fn, args, kwargs, fut))
+        return fut
+
+    def call(self, fn, *args, **kwargs):
+        """Encola y espera el resultado (o la excepción) de la escritura."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self, timeout: float = 5.0):
+        """Vacía lo pendiente y detiene el hilo."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="battle-db-writer", daemon=True)
+                    self._thread.start()
+
+    def _take(self) -> tuple[list, bool]:
+        """Bloquea hasta la primera operación y junta las que lleguen a continuación."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch, deadline = [first], time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                op = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is None:
+                return batch, True
+            batch.append(op)
+        return batch, False
+
+    def _loop(self):
+        stop = False
+        while not stop:
+            batch, stop = self._take()
+            if batch:
+                self._apply(batch)
+                close_old_connections()
+
+    def _apply(self, batch: list):
+        results = []
+        try:
+            with transaction.atomic():
+                for fn, args, kwargs, _ in batch:
+                    results.append(fn(*args, **kwargs))
+        except Exception:
+            # repetir una a una: los demás tasks no pagan el error de uno
+            for fn, args, kwargs, fut in batch:
+                try:
+                    with transaction.atomic():
+                        fut.set_result(fn(*args, **kwargs))
+                except Exception as exc:
+                    logger.warning("Escritura de combate falló: %s", exc)
+                    fut.set_exception(exc)
+        else:
+            for (_, _, _, fut), result in zip(batch, results):
+                fut.set_result(result)
+        self.batches += 1
+
+
+_writer: BatchWriter | None = None
+_writer_pid: int | None = None
+_writer_lock = threading.Lock()
+_inline = InlineWriter()
+
+
+def get_writer() -> BatchWriter | InlineWriter:
+    """Escritor del proceso según BATTLE_DB_WRITER ("batched" o "inline")."""
+    global _writer, _writer_pid
+    if getattr(settings, "BATTLE_DB_WRITER", "batched") == "inline":
+        return _inline
+    # tras un fork (prefork de Celery) el hilo del padre no existe en el hijo
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = BatchWriter(
+                    max_batch=getattr(settings, "BATTLE_DB_WRITER_BATCH", 200),
+                    flush_interval=getattr(settings, "BATTLE_DB_WRITER_INTERVAL", 0.02),
+                )
+                _writer_pid = os.getpid()
+                atexit.register(_writer.close)
+    return _writer
@@ -12,5 +12,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pokeleague.settings')
+# Servido por ASGI: el stream SSE usa la variante async (redis.asyncio + hub por proceso)
+os.environ.setdefault('SSE_ASYNC', '1')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402  (tras get_asgi_application, con Django ya configurado)
+
+if settings.DEBUG:
+    # uvicorn no sirve estáticos: en desarrollo, como runserver (admin, DRF browsable API)
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
@@ -30,6 +30,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Perfilado opcional (PROFILING o cabecera X-Profile firmada); sin coste si está inactivo (WSGI y ASGI)
+    "battles.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "pokeleague.urls"
@@ -52,7 +54,20 @@ DATABASES = {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
         # Evita "database is locked" en picos: aumenta timeout
-        "OPTIONS": {"timeout": 20},
+        "OPTIONS": {
+            "timeout": 20,
+            # WAL: lectores y el escritor no se bloquean entre sí; el resto, ajustes para WAL
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA busy_timeout=20000;"
+                "PRAGMA temp_store=MEMORY;"
+                "PRAGMA cache_size=-20000;"
+                "PRAGMA mmap_size=134217728;"
+            ),
+            # toma el lock de escritura al empezar la transacción (sin fallos al "subir" de lectura a escritura)
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
@@ -78,12 +93,30 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # CORS (dev)
 CORS_ALLOW_ALL_ORIGINS = True
+# el front lee ETag / Server-Timing en sus sondeos
+CORS_EXPOSE_HEADERS = ["ETag", "Server-Timing"]
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
 ]
 
+# Caché compartida (versión del catálogo y respuestas cacheadas); Redis por defecto
+CACHES = {
+    # la de Django por defecto (locmem): cache.* no sale a la red
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # versión del catálogo y listados cacheados (battles.catalog), compartidos entre procesos
+    "catalog": {
+        "BACKEND": os.getenv("CATALOG_CACHE_BACKEND", "django.core.cache.backends.redis.RedisCache"),
+        "LOCATION": os.getenv("CATALOG_CACHE_LOCATION", os.getenv("REDIS_URL", "redis://redis:6379/0")),
+    },
+}
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "3600"))
+# Filas por lote (validación + upsert) en la importación masiva del catálogo
+CATALOG_IMPORT_BATCH = int(os.getenv("CATALOG_IMPORT_BATCH", "2000"))
+
 # DRF pagination
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
@@ -97,8 +130,73 @@ CELERY_TIMEZONE = "America/Bogota"
 CELERY_ENABLE_UTC = False 
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 60 * 5
+# Un único barrido por minuto lanza los combates con cron vencido (next_run_at indexado)
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-due-battles": {
+        "task": "battles.tasks.dispatch_due_battles",
+        "schedule": float(os.getenv("BATTLE_SWEEP_INTERVAL", "60")),
+    },
+}
+# Combates reclamados por transacción en cada barrido
+BATTLE_SWEEP_BATCH = int(os.getenv("BATTLE_SWEEP_BATCH", "1000"))
+# Monte Carlo (/api/tournaments/simulate/): simulaciones por defecto y máximo por petición
+MONTECARLO_DEFAULT_SIMULATIONS = int(os.getenv("MONTECARLO_DEFAULT_SIMULATIONS", "10000"))
+MONTECARLO_MAX_SIMULATIONS = int(os.getenv("MONTECARLO_MAX_SIMULATIONS", "200000"))
+# Filas por lote de lectura (y por trozo enviado) en /api/battles/export/
+BATTLE_EXPORT_CHUNK = int(os.getenv("BATTLE_EXPORT_CHUNK", "2000"))
+# Índice de counters (/api/pokemons/<id>/counters/): rivales guardados por Pokémon y escenario,
+# y cómo se actualiza tras cambiar el catálogo ("async" en Celery, "sync" u "off")
+COUNTERS_INDEX_K = int(os.getenv("COUNTERS_INDEX_K", "20"))
+COUNTERS_REFRESH = os.getenv("COUNTERS_REFRESH", "async")
+# Redis para eventos en vivo (un pool por proceso, compartido por tasks y SSE)
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# Segundos que se espera una conexión libre del pool compartido antes de fallar
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+# Streams SSE síncronos por proceso (pool pub/sub propio); vacío = sin límite
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS")) if os.getenv("SSE_MAX_STREAMS") else None
+# Segundos que un evento puede esperar en el buffer antes del pipeline (0 = publicar en el acto)
+BATTLE_EVENTS_FLUSH_INTERVAL = float(os.getenv("BATTLE_EVENTS_FLUSH_INTERVAL", "0.05"))
+# Stream acotado por combate para reproducir eventos perdidos (Last-Event-ID)
+BATTLE_EVENTS_STREAM_MAXLEN = int(os.getenv("BATTLE_EVENTS_STREAM_MAXLEN", "20000"))
+BATTLE_EVENTS_STREAM_TTL = int(os.getenv("BATTLE_EVENTS_STREAM_TTL", str(24 * 3600)))
+# Memoización de resultados por huella del emparejamiento (LRU local + Redis)
+BATTLE_OUTCOME_CACHE = os.getenv("BATTLE_OUTCOME_CACHE", "true") in ("1","true","True","yes","on")
+BATTLE_OUTCOME_CACHE_SIZE = int(os.getenv("BATTLE_OUTCOME_CACHE_SIZE", "1024"))
+BATTLE_OUTCOME_CACHE_TTL = int(os.getenv("BATTLE_OUTCOME_CACHE_TTL", str(24 * 3600)))
+# Segundos que se conserva el progreso de un execute-bulk
+BATTLE_BULK_PROGRESS_TTL = int(os.getenv("BATTLE_BULK_PROGRESS_TTL", str(24 * 3600)))
+# Combates como mucho por llamada a /api/battles/execute-bulk/
+BATTLE_BULK_MAX = int(os.getenv("BATTLE_BULK_MAX", "10000"))
+# Motor de combates en tiempo real: "sync" (un combate por task) o "asyncio" (battles.live)
+BATTLE_ENGINE = os.getenv("BATTLE_ENGINE", "sync")
+BATTLE_LIVE_MAX_BATTLES = int(os.getenv("BATTLE_LIVE_MAX_BATTLES", "500"))
+BATTLE_LIVE_FLUSH_INTERVAL = float(os.getenv("BATTLE_LIVE_FLUSH_INTERVAL", "0.2"))
+# Métricas Prometheus (/metrics): cada proceso vuelca sus incrementos a Redis como mucho cada N segundos
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true") in ("1","true","True","yes","on")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+# Segundos sin latido tras los que los gauges de un proceso dejan de contar
+METRICS_GAUGE_TTL = float(os.getenv("METRICS_GAUGE_TTL", "30"))
+# Perfilado: "" (apagado), "sql" o "cprofile" para todas las peticiones / para run_battle
+PROFILING = os.getenv("PROFILING", "")
+PROFILING_TASKS = os.getenv("PROFILING_TASKS", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles"))
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "50"))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600"))
+# Factor K del Elo del leaderboard
+ELO_K_FACTOR = float(os.getenv("ELO_K_FACTOR", "32"))
+# SSE async (lo activa pokeleague.asgi); tamaño de la cola por espectador y keepalive
+SSE_ASYNC = os.getenv("SSE_ASYNC", "0") in ("1","true","True","yes","on")
+SSE_VIEWER_QUEUE_SIZE = int(os.getenv("SSE_VIEWER_QUEUE_SIZE", "256"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
 # Habilitar integración con django-celery-beat desde .env
 USE_DJANGO_CELERY_BEAT = os.getenv("USE_DJANGO_CELERY_BEAT", "false") in ("1","true","True","yes","on")
 
 
-BATTLE_TICK_SLEEP = 0.0 if DEBUG else 0.9  # o controlar con TESTING
\ No newline at end of file
+BATTLE_TICK_SLEEP = 0.0 if DEBUG else 0.9  # o controlar con TESTING
+# Escritor de combates por proceso: "batched" (un hilo agrupa las escrituras de todos los tasks) o "inline"
+BATTLE_DB_WRITER = os.getenv("BATTLE_DB_WRITER", "batched")
+BATTLE_DB_WRITER_BATCH = int(os.getenv("BATTLE_DB_WRITER_BATCH", "200"))
+BATTLE_DB_WRITER_INTERVAL = float(os.getenv("BATTLE_DB_WRITER_INTERVAL", "0.02"))
+# Líneas del log que se acumulan antes de insertarlas (BattleTurn) en modo tiempo real
+BATTLE_TURN_BATCH = int(os.getenv("BATTLE_TURN_BATCH", "10"))
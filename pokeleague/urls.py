@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from battles.sse import battle_stream
+from battles.sse import battle_stream, battle_stream_async
+from battles.views import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("battles.urls")),
-    path("api/battles/<int:battle_id>/stream/", battle_stream),
-]
\ No newline at end of file
+    # Prometheus (formato de texto), agregado entre procesos vía Redis
+    path("metrics", metrics_view, name="metrics"),
+    # Bajo ASGI (pokeleague.asgi) el stream es async y comparte una suscripción por combate
+    path("api/battles/<int:battle_id>/stream/", battle_stream_async if settings.SSE_ASYNC else battle_stream),
+]